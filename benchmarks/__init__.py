@@ -0,0 +1,3 @@
+"""
+Бенчмарки пайплайна chain_pattern и модели regression на синтетических данных hh.ru.
+"""
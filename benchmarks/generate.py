@@ -0,0 +1,234 @@
+"""
+Генератор синтетического CSV-файла в формате выгрузки резюме hh.ru.
+
+Столбцы и формат значений совпадают с тем, что ожидают обработчики chain_pattern
+(«Пол, возраст», «ЗП», «Город», «Занятость», «График», «Авто»,
+«Ищет работу на должность:»), включая безымянный столбец индекса выгрузки.
+Строки генерируются блоками, поэтому память не зависит от размера файла.
+
+Интерфейс: python -m benchmarks.generate путь/к/файлу.csv --rows 100000 [--seed 0]
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from regression.cli import ArgumentParser
+
+BLOCK_ROWS = 200_000
+
+COLUMNS = [
+    "",
+    "Пол, возраст",
+    "ЗП",
+    "Ищет работу на должность:",
+    "Город",
+    "Занятость",
+    "График",
+    "Опыт (двойное нажатие для полной версии)",
+    "Последенее/нынешнее место работы",
+    "Образование и ВУЗ",
+    "Обновление резюме",
+    "Авто",
+]
+
+CITIES = np.array([
+    "Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань",
+    "Нижний Новгород", "Челябинск", "Самара", "Омск", "Ростов-на-Дону",
+    "Уфа", "Красноярск", "Воронеж", "Пермь", "Волгоград", "Благовещенск",
+])
+CITY_WEIGHTS = np.array([30, 12, 5, 5, 5, 4, 4, 4, 3, 4, 3, 3, 3, 3, 3, 1], dtype=float)
+RELOCATION = np.array([
+    "", " , не готов к переезду , не готов к командировкам",
+    " , готов к переезду , готов к командировкам", " , не готов к переезду , готов к командировкам",
+    " , м. Парк культуры , не готов к переезду , готов к редким командировкам",
+])
+POSITIONS = np.array([
+    "Менеджер по продажам", "Программист", "Водитель", "Бухгалтер", "Продавец-консультант",
+    "Системный администратор", "Инженер", "Администратор", "Юрист", "Менеджер проектов",
+    "Специалист по закупкам", "Оператор call-центра", "Кладовщик", "Экономист", "Дизайнер",
+])
+EMPLOYMENT = np.array([
+    "полная занятость", "частичная занятость", "проектная работа", "стажировка",
+    "частичная занятость, полная занятость", "проектная работа, полная занятость",
+    "полная занятость, частичная занятость, проектная работа",
+])
+SCHEDULE = np.array([
+    "полный день", "гибкий график", "удаленная работа", "сменный график", "вахтовый метод",
+    "полный день, гибкий график", "полный день, удаленная работа",
+    "гибкий график, удаленная работа", "сменный график, полный день",
+])
+AUTO = np.array(["Не указано", "Имеется собственный автомобиль"])
+MONTHS = np.array([
+    "января", "февраля", "марта", "апреля", "мая", "июня",
+    "июля", "августа", "сентября", "октября", "ноября", "декабря",
+])
+EDUCATION = np.array([
+    "Высшее образование 2010 МГУ", "Среднее специальное образование 2005 Колледж",
+    "Неоконченное высшее образование 2015 СПбГУ", "Высшее образование (Магистр) 2018 ВШЭ",
+])
+COMPANIES = np.array(["ООО Ромашка", "ПАО Сбербанк", "ИП Иванов", "АО РЖД", "ООО Яндекс"])
+
+
+def _age_word(age: int) -> str:
+    """
+    Склонение «год/года/лет» для возраста.
+    """
+    if age % 10 == 1 and age % 100 != 11:
+        return "год"
+    if 2 <= age % 10 <= 4 and not 12 <= age % 100 <= 14:
+        return "года"
+    return "лет"
+
+
+def _field(value: str) -> str:
+    """
+    Поле CSV: значение в кавычках, если оно содержит запятую или кавычку.
+    """
+    if "," in value or '"' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _pool(values) -> np.ndarray:
+    """
+    Массив готовых полей CSV, из которого строки выбираются по индексам.
+    """
+    return np.array([_field(value) for value in values], dtype=object)
+
+
+class _Pools:
+    """
+    Все варианты значений столбцов, заранее отформатированные как поля CSV.
+
+    Столбцы со многими вариантами (пол и возраст, должность) задаются произведением
+    небольших множеств, поэтому строка выбирается из пула по вычисленному индексу
+    без форматирования строк для каждой записи.
+    """
+
+    AGES = range(16, 70)
+    DAYS = range(1, 29)
+    MAX_SALARY_THOUSANDS = 2000
+    CURRENCIES = (" руб.", " USD", " EUR", " KZT")
+    POSITION_SUFFIXES = 5000
+
+    def __init__(self) -> None:
+        self.gender_age = _pool(
+            f"{gender} ,  {age} {_age_word(age)} , {born} {day} {month} {2019 - age}"
+            for gender, born in (("Женщина", "родилась"), ("Мужчина", "родился"))
+            for age in self.AGES
+            for day in self.DAYS
+            for month in MONTHS
+        )
+        self.gender = _pool(["Женщина", "Мужчина"])
+        self.salary = _pool(
+            f"{thousands * 1000}{currency}"
+            for currency in self.CURRENCIES
+            for thousands in range(self.MAX_SALARY_THOUSANDS + 1)
+        )
+        self.position = _pool(
+            position if suffix == 0 else f"{position} {suffix}"
+            for position in POSITIONS
+            for suffix in range(self.POSITION_SUFFIXES)
+        )
+        self.city = _pool(city + relocation for city in CITIES for relocation in RELOCATION)
+        self.employment = _pool(EMPLOYMENT)
+        self.schedule = _pool(SCHEDULE)
+        self.experience = _pool(
+            f"Опыт работы {years} лет {months} месяцев  {month} 2015 — по настоящее время"
+            for years in range(30)
+            for months in range(12)
+            for month in MONTHS
+        )
+        self.company = _pool(COMPANIES)
+        self.education = _pool(EDUCATION)
+        self.updated = _pool(
+            f"{day}.04.2019 {hour}:{minute}"
+            for day in range(10, 29)
+            for hour in range(10, 24)
+            for minute in range(10, 60)
+        )
+        self.auto = _pool(AUTO)
+
+
+def generate_block(rng: np.random.Generator, pools: _Pools, start: int, rows: int) -> str:
+    """
+    Возвращает блок из rows строк CSV; start — номер первой строки (столбец индекса).
+    """
+    male = (rng.random(rows) < 0.55).astype(np.int64)
+    ages = rng.integers(0, len(pools.AGES), rows)
+    days = rng.integers(0, len(pools.DAYS), rows)
+    months = rng.integers(0, len(MONTHS), rows)
+    gender_age = pools.gender_age[((male * len(pools.AGES) + ages) * len(pools.DAYS) + days) * len(MONTHS) + months]
+    no_age = rng.random(rows) < 0.03
+    gender_age[no_age] = pools.gender[male[no_age]]
+
+    thousands = np.minimum(rng.lognormal(3.9, 0.5, rows).astype(np.int64), pools.MAX_SALARY_THOUSANDS)
+    currency = rng.choice(len(pools.CURRENCIES), rows, p=[0.94, 0.03, 0.01, 0.02])
+    salary = pools.salary[currency * (pools.MAX_SALARY_THOUSANDS + 1) + thousands]
+
+    # Должности с уникальными уточнениями дают столбец высокой кардинальности, как в выгрузке.
+    suffix = np.where(rng.random(rows) < 0.2, rng.integers(1, pools.POSITION_SUFFIXES, rows), 0)
+    position = pools.position[rng.integers(0, len(POSITIONS), rows) * pools.POSITION_SUFFIXES + suffix]
+
+    city_index = rng.choice(len(CITIES), rows, p=CITY_WEIGHTS / CITY_WEIGHTS.sum())
+    city = pools.city[city_index * len(RELOCATION) + rng.integers(0, len(RELOCATION), rows)]
+
+    columns = [
+        np.arange(start, start + rows).astype(str),
+        gender_age,
+        salary,
+        position,
+        city,
+        pools.employment[rng.integers(0, len(pools.employment), rows)],
+        pools.schedule[rng.integers(0, len(pools.schedule), rows)],
+        pools.experience[rng.integers(0, len(pools.experience), rows)],
+        pools.company[rng.integers(0, len(pools.company), rows)],
+        pools.education[rng.integers(0, len(pools.education), rows)],
+        pools.updated[rng.integers(0, len(pools.updated), rows)],
+        pools.auto[(rng.random(rows) < 0.3).astype(np.int64)],
+    ]
+    return "".join(line + "\n" for line in map(",".join, zip(*columns)))
+
+
+def generate_csv(path: Path, rows: int, seed: int = 0) -> None:
+    """
+    Записывает синтетический CSV из rows строк; одинаковые rows и seed дают одинаковый файл.
+
+    Генерирует исключение при сбое записи.
+    """
+    rng = np.random.default_rng(seed)
+    pools = _Pools()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(",".join(_field(column) for column in COLUMNS) + "\n")
+        for start in range(0, rows, BLOCK_ROWS):
+            file.write(generate_block(rng, pools, start, min(BLOCK_ROWS, rows - start)))
+
+
+def main() -> None:
+    """
+    Точка входа CLI генератора.
+
+    Завершает работу с кодом 1 при ошибке.
+    """
+    parser = ArgumentParser(
+        prog="python -m benchmarks.generate",
+        description="Генерация синтетического CSV в формате выгрузки hh.ru.",
+    )
+    parser.add_argument("path", type=Path, help="путь к создаваемому CSV-файлу")
+    parser.add_argument("--rows", type=int, default=100_000, help="число строк (от 10 тыс. до 10 млн)")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора случайных чисел")
+    args = parser.parse_args()
+    if args.rows <= 0:
+        parser.error("--rows должен быть положительным")
+    try:
+        generate_csv(args.path, args.rows, args.seed)
+    except OSError as exc:
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Бенчмарк пайплайна chain_pattern и модели regression на синтетических данных.
+
+Для каждого размера выборки генерирует CSV (см. benchmarks.generate) и измеряет:
+время каждого обработчика цепочки, build_pipeline целиком, обучение регрессионного
+пайплайна и predict_salaries. Каждое измерение повторяется, в результат идёт
+наименьшее время. Результаты сохраняются в JSON; при наличии базовых результатов
+измерения, ставшие медленнее допуска, отмечаются как регрессии.
+
+Интерфейс: python -m benchmarks.run [--rows 10000 100000] [--baseline benchmarks/baseline.json]
+"""
+
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "chain_pattern"))
+
+from handlers import profiling  # noqa: E402
+from pipeline import build_pipeline  # noqa: E402
+
+from regression.cli import ArgumentParser  # noqa: E402
+from regression.predict import predict_salaries  # noqa: E402
+from regression.train import build_regression_pipeline, fit_timed, load_data  # noqa: E402
+
+from .generate import generate_csv  # noqa: E402
+
+DEFAULT_ROWS = [10_000, 100_000]
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_OUTPUT = Path(__file__).resolve().parent / "results.json"
+# Обучение GradientBoostingRegressor растёт линейно с числом строк и на миллионах строк
+# занимает десятки минут, поэтому обучающая выборка ограничена первыми строками.
+MAX_TRAIN_ROWS = 100_000
+# Допуск замедления относительно базовых результатов.
+TOLERANCE = 0.10
+# Измерения короче этого порога не сравниваются: их разброс больше допуска.
+MIN_SECONDS = 0.05
+
+
+def _best_time(func: Callable[[], object], repeat: int) -> float:
+    """
+    Наименьшее время выполнения func из repeat запусков, с.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _handler_times(csv_path: Path, repeat: int) -> dict[str, float]:
+    """
+    Наименьшее время каждого обработчика цепочки из repeat запусков, с.
+    """
+    best: dict[str, float] = {}
+    for _ in range(repeat):
+        profiler = profiling.enable(trace_memory=False)
+        try:
+            build_pipeline(str(csv_path)).handle(pd.DataFrame())
+        finally:
+            profiling.disable()
+        for name, stats in profiler.stages.items():
+            best[name] = min(best.get(name, float("inf")), stats.wall_seconds)
+    return best
+
+
+def bench_size(rows: int, work_dir: Path, repeat: int, max_train_rows: int) -> dict:
+    """
+    Измеряет все этапы на синтетическом файле из rows строк в папке work_dir.
+
+    Возвращает словарь: handlers (время обработчиков), build_pipeline, train
+    (обучение на первых max_train_rows строках) и predict_salaries, с.
+    """
+    csv_path = work_dir / f"hh_{rows}.csv"
+    generate_csv(csv_path, rows)
+    result = {
+        "handlers": _handler_times(csv_path, repeat),
+        "build_pipeline": _best_time(
+            lambda: build_pipeline(str(csv_path)).handle(pd.DataFrame()), repeat
+        ),
+    }
+    X, y = load_data(work_dir, memory_map=True)
+    X_train = np.asarray(X[:max_train_rows])
+    y_train = np.asarray(y[:max_train_rows])
+    result["train"] = min(
+        fit_timed(build_regression_pipeline(), X_train, y_train)["fit_seconds"]
+        for _ in range(repeat)
+    )
+    result["train_rows"] = len(y_train)
+    result["predict_salaries"] = _best_time(
+        lambda: predict_salaries(work_dir / "x_data.npy"), repeat
+    )
+    csv_path.unlink()
+    return result
+
+
+def run(sizes: list[int], repeat: int = 3, max_train_rows: int = MAX_TRAIN_ROWS) -> dict:
+    """
+    Выполняет бенчмарк для каждого размера выборки.
+
+    Возвращает результаты: сведения об окружении (meta) и измерения по размерам (results).
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        for rows in sizes:
+            print(f"Строк: {rows}", file=sys.stderr)
+            results[str(rows)] = bench_size(rows, Path(tmp), repeat, max_train_rows)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    """
+    Преобразует вложенные результаты в словарь «путь/к/измерению → время».
+    """
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{path}/"))
+        elif isinstance(value, float):
+            flat[path] = value
+    return flat
+
+
+def find_regressions(current: dict, baseline: dict, tolerance: float = TOLERANCE) -> list[dict]:
+    """
+    Сравнивает результаты с базовыми.
+
+    Возвращает измерения, ставшие медленнее базовых больше чем на tolerance (доля):
+    путь, базовое и текущее время и их отношение. Измерения, отсутствующие
+    в базовых результатах или короче MIN_SECONDS, не сравниваются.
+    """
+    base = _flatten(baseline["results"])
+    regressions = []
+    for path, seconds in _flatten(current["results"]).items():
+        before = base.get(path)
+        if before is None or max(before, seconds) < MIN_SECONDS:
+            continue
+        ratio = seconds / before if before > 0 else float("inf")
+        if ratio > 1 + tolerance:
+            regressions.append(
+                {"path": path, "baseline": before, "current": seconds, "ratio": ratio}
+            )
+    return regressions
+
+
+def main() -> None:
+    """
+    Точка входа CLI бенчмарка.
+
+    Завершает работу с кодом 1 при регрессиях относительно базовых результатов
+    или при ошибке.
+    """
+    parser = ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Бенчмарк подготовки данных, обучения и предсказания на синтетических данных hh.ru.",
+    )
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="размеры выборок в строках"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="число повторов каждого измерения")
+    parser.add_argument(
+        "--max-train-rows",
+        type=int,
+        default=MAX_TRAIN_ROWS,
+        help="наибольшее число строк для обучения",
+    )
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="файл результатов (JSON)")
+    parser.add_argument(
+        "--baseline", type=Path, default=DEFAULT_BASELINE, help="файл базовых результатов (JSON)"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=TOLERANCE, help="допустимое замедление (доля)"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="сохранить результаты как базовые",
+    )
+    args = parser.parse_args()
+    if min(args.rows) <= 0 or args.repeat <= 0 or args.max_train_rows <= 0:
+        parser.error("--rows, --repeat и --max-train-rows должны быть положительными")
+    # Отладочный вывод regression не нужен при замерах.
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        current = run(args.rows, args.repeat, args.max_train_rows)
+        args.output.write_text(json.dumps(current, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(json.dumps(current["results"], ensure_ascii=False, indent=2))
+        if args.update_baseline:
+            args.baseline.write_text(json.dumps(current, ensure_ascii=False, indent=2), encoding="utf-8")
+            return
+        if not args.baseline.is_file():
+            print(f"Базовые результаты не найдены: {args.baseline}", file=sys.stderr)
+            return
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = find_regressions(current, baseline, args.tolerance)
+    except (ValueError, OSError) as exc:
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        sys.exit(1)
+    for item in regressions:
+        print(
+            f"Регрессия {item['path']}: {item['baseline']:.3f} с -> {item['current']:.3f} с "
+            f"(x{item['ratio']:.2f})",
+            file=sys.stderr,
+        )
+    if regressions:
+        sys.exit(1)
+    print("Регрессий нет", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
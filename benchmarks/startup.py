@@ -0,0 +1,130 @@
+"""
+Бенчмарк холодного старта regression.app: время до первого предсказания.
+
+Каждый запуск — новый процесс python -m regression.app по небольшой матрице
+признаков; время измеряется от запуска процесса до получения первой строки
+вывода (первого предсказания) и до завершения процесса. Результат — медиана
+и наименьшее время по повторам для каждого способа предсказания.
+
+Интерфейс: python -m benchmarks.startup [--rows 10] [--repeat 10] [--backend sklearn auto]
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from regression.cli import ArgumentParser
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BACKENDS = ["sklearn", "compiled", "auto"]
+DEFAULT_ROWS = 10
+DEFAULT_REPEAT = 10
+
+
+def _sample(path: Path, rows: int, n_features: int) -> None:
+    """
+    Сохраняет в path случайную целочисленную матрицу признаков из rows строк.
+    """
+    rng = np.random.default_rng(0)
+    np.save(path, rng.integers(0, 100, size=(rows, n_features)))
+
+
+def _n_features() -> int:
+    """
+    Число признаков сохранённой модели (по скомпилированной или sklearn-версии).
+    """
+    from regression.model_io import load_model
+
+    return int(load_model().n_features_in_)
+
+
+def cold_start(x_path: Path, backend: str) -> tuple[float, float]:
+    """
+    Запускает python -m regression.app в новом процессе.
+
+    Возвращает время до первой строки вывода и до завершения процесса, с.
+    Генерирует исключение, если процесс завершился с ошибкой.
+    """
+    command = [sys.executable, "-m", "regression.app", str(x_path), "--backend", backend]
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    first = process.stdout.readline()
+    first_seconds = time.perf_counter() - start
+    process.stdout.read()
+    code = process.wait()
+    total_seconds = time.perf_counter() - start
+    if code != 0 or not first:
+        raise ValueError(f"regression.app --backend {backend} завершился с кодом {code}.")
+    return first_seconds, total_seconds
+
+
+def run(backends: list[str], rows: int = DEFAULT_ROWS, repeat: int = DEFAULT_REPEAT) -> dict:
+    """
+    Измеряет холодный старт для каждого способа предсказания.
+
+    Возвращает по способу: медиану и минимум времени до первого предсказания
+    (first_prediction) и до завершения (total), с.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="startup-") as tmp:
+        x_path = Path(tmp) / "x_data.npy"
+        _sample(x_path, rows, _n_features())
+        # Первый запуск прогревает кеш файловой системы и байт-код и не учитывается.
+        for backend in backends:
+            cold_start(x_path, backend)
+        for backend in backends:
+            firsts, totals = zip(*(cold_start(x_path, backend) for _ in range(repeat)))
+            results[backend] = {
+                "first_prediction": {"median": statistics.median(firsts), "min": min(firsts)},
+                "total": {"median": statistics.median(totals), "min": min(totals)},
+            }
+    return results
+
+
+def main() -> None:
+    """
+    Точка входа CLI бенчмарка холодного старта.
+
+    Завершает работу с кодом 1 при ошибке запуска regression.app.
+    """
+    parser = ArgumentParser(
+        prog="python -m benchmarks.startup",
+        description="Время до первого предсказания regression.app в новом процессе.",
+    )
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="строк в матрице признаков")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="число запусков")
+    parser.add_argument(
+        "--backend",
+        nargs="+",
+        default=DEFAULT_BACKENDS,
+        help="способы предсказания (см. regression.app --backend)",
+    )
+    parser.add_argument("--output", type=Path, default=None, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+    if args.rows <= 0 or args.repeat <= 0:
+        parser.error("--rows и --repeat должны быть положительными")
+    try:
+        results = run(args.backend, args.rows, args.repeat)
+    except (ValueError, OSError) as exc:
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        sys.exit(1)
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    for backend, result in results.items():
+        print(
+            f"{backend}: первое предсказание {result['first_prediction']['median'] * 1000:.0f} мс "
+            f"(мин. {result['first_prediction']['min'] * 1000:.0f} мс), "
+            f"завершение {result['total']['median'] * 1000:.0f} мс"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Кэш результатов обработчиков цепочки по содержимому входных данных.
+
+Выход каждого обработчика хранится в формате Feather (Arrow IPC, по столбцам)
+под ключом, который зависит от хеша входного файла, классов и параметров всех
+обработчиков до него включительно и исходного кода их модулей (вместе с модулями
+той же папки, которые они импортируют, например handlers/strings.py и base.py). Повторный запуск
+продолжает с самой глубокой стадии, найденной в кэше. Размер кэша ограничен:
+давно не использованные записи удаляются первыми.
+"""
+import hashlib
+import json
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+from types import ModuleType
+from typing import Optional
+import pandas as pd
+from handlers.base import Handler
+
+# Размер кэша по умолчанию, байт.
+DEFAULT_MAX_BYTES = 2 << 30
+_BLOCK_SIZE = 1 << 20
+_SUFFIX = ".feather"
+
+
+def file_digest(path: str) -> str:
+    """
+    Возвращает SHA-256 содержимого файла (шестнадцатеричная строка).
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while block := file.read(_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _local_sources(module: ModuleType) -> list[Path]:
+    """
+    Файлы модуля и модулей из той же папки, от которых он зависит через импорт (транзитивно).
+
+    Зависимость — модуль или объект (функция, класс) этой папки в пространстве имён модуля.
+    """
+    root = Path(module.__file__).resolve().parent
+    found = {Path(module.__file__).resolve(): module}
+    pending = [module]
+    while pending:
+        for value in list(vars(pending.pop()).values()):
+            if isinstance(value, ModuleType):
+                dependency = value
+            else:
+                name = getattr(value, "__module__", None)
+                dependency = sys.modules.get(name) if isinstance(name, str) else None
+            path = getattr(dependency, "__file__", None)
+            if path is None:
+                continue
+            path = Path(path).resolve()
+            if path.parent == root and path not in found:
+                found[path] = dependency
+                pending.append(dependency)
+    return sorted(found)
+
+
+@lru_cache(maxsize=None)
+def _module_digest(module_name: str) -> str:
+    """
+    Хеш исходного кода модуля и его локальных зависимостей (см. _local_sources).
+    """
+    digest = hashlib.sha256()
+    for path in _local_sources(sys.modules[module_name]):
+        digest.update(f"{path.name}\n".encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _source_digest(handler: Handler) -> str:
+    """
+    Возвращает хеш исходного кода модуля обработчика и импортируемых им модулей той же
+    папки: правка кода обработчика или общих функций (strings, base) делает кэш недействительным.
+    """
+    return _module_digest(type(handler).__module__)
+
+
+def stage_keys(handlers: list[Handler], input_digest: str) -> list[str]:
+    """
+    Возвращает ключи кэша для выхода каждого обработчика цепочки.
+
+    handlers — обработчики в порядке выполнения.
+    input_digest — хеш входного файла (см. file_digest).
+    """
+    keys = []
+    key = input_digest
+    for handler in handlers:
+        params = json.dumps(handler.cache_params(), sort_keys=True, ensure_ascii=False, default=str)
+        stage = f"{key}\n{type(handler).__qualname__}\n{_source_digest(handler)}\n{params}"
+        key = hashlib.sha256(stage.encode("utf-8")).hexdigest()
+        keys.append(key)
+    return keys
+
+
+def pipeline_fingerprint(handlers: list[Handler]) -> str:
+    """
+    Возвращает отпечаток кода обработчиков: классы и исходный код их модулей.
+
+    В отличие от stage_keys не зависит от входного файла и параметров обработчиков,
+    поэтому совпадает у всех режимов запуска одной версии пайплайна.
+    """
+    digest = hashlib.sha256()
+    for handler in handlers:
+        digest.update(f"{type(handler).__qualname__}\n{_source_digest(handler)}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    Хранилище датафреймов в папке directory с вытеснением по размеру (LRU).
+
+    Время последнего использования записи — время изменения файла, обновляется при чтении.
+    Требует pyarrow.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as exc:
+            raise ImportError("Для кэша стадий требуется пакет pyarrow: pip install pyarrow") from exc
+        self._directory = Path(directory)
+        self._max_bytes = max_bytes
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self.evict()
+
+    def _path(self, key: str) -> Path:
+        return self._directory / f"{key}{_SUFFIX}"
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """
+        Возвращает датафрейм по ключу или None, если записи нет или она повреждена.
+        """
+        path = self._path(key)
+        try:
+            df = pd.read_feather(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            path.unlink(missing_ok=True)
+            return None
+        os.utime(path)
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        """
+        Сохраняет датафрейм под ключом и вытесняет старые записи сверх лимита размера.
+
+        Датафреймы с индексом, отличным от RangeIndex с нуля, не сохраняются.
+        """
+        if not df.index.equals(pd.RangeIndex(len(df))):
+            return
+        path = self._path(key)
+        partial = path.with_name(f"{path.name}.{os.getpid()}.part")
+        try:
+            df.to_feather(partial)
+            os.replace(partial, path)
+        finally:
+            partial.unlink(missing_ok=True)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Удаляет давно не использованные записи, пока размер кэша превышает лимит.
+        """
+        entries = []
+        for path in self._directory.glob(f"*{_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self._max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def run_cached(handlers: list[Handler], cache: StageCache, input_digest: str) -> pd.DataFrame:
+    """
+    Выполняет обработчики по порядку, начиная после самой глубокой стадии из кэша.
+
+    Кэшируются и пропускаются только обработчики из начального участка цепочки,
+    у которых cacheable истинно: обработчики с побочными эффектами (запись файлов)
+    и все следующие за ними выполняются всегда.
+    Возвращает датафрейм на выходе последнего обработчика.
+    """
+    keys = stage_keys(handlers, input_digest)
+    cacheable = 0
+    while cacheable < len(handlers) and handlers[cacheable].cacheable:
+        cacheable += 1
+    start, df = 0, pd.DataFrame()
+    for stage in reversed(range(cacheable)):
+        cached = cache.get(keys[stage])
+        if cached is not None:
+            start, df = stage + 1, cached
+            break
+    for stage in range(start, len(handlers)):
+        df = handlers[stage].run(df)
+        if stage < cacheable:
+            cache.put(keys[stage], df)
+    return df
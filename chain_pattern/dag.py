@@ -0,0 +1,173 @@
+"""
+Выполнение обработчиков chain_pattern графом зависимостей по столбцам.
+
+Обработчики объявляют столбцы, которые читают, добавляют и удаляют (Handler.reads,
+writes, drops). Обработчик зависит от предыдущего, если читает его результат или
+меняет столбцы, которые тот читает или меняет; обработчики с reads = None
+(загрузка, нормализация названий, кодирование, запись матриц) зависят от всех
+соседей. Подряд идущие независимые обработчики (ParseGenderAge, ParseSalary,
+ParseCity) образуют волну и выполняются одновременно в пуле потоков или процессов,
+каждый над срезом только из своих столбцов. Результаты волны добавляются в датафрейм
+в порядке цепочки, поэтому столбцы и значения совпадают с последовательным
+выполнением handle.
+"""
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Iterable, Iterator, Optional
+import pandas as pd
+from handlers.base import Handler
+from handlers.profiling import active_profiler
+
+EXECUTORS = ("thread", "process")
+
+
+def _touches(handler: Handler) -> set[str]:
+    """
+    Столбцы, которые обработчик меняет.
+    """
+    return set(handler.writes) | set(handler.drops)
+
+
+def depends(later: Handler, earlier: Handler) -> bool:
+    """
+    Зависит ли обработчик later от обработчика earlier, стоящего раньше в цепочке.
+    """
+    if later.reads is None or earlier.reads is None:
+        return True
+    touched = _touches(earlier)
+    return bool(
+        touched & set(later.reads) or _touches(later) & (touched | set(earlier.reads))
+    )
+
+
+def dependency_graph(handlers: list[Handler]) -> dict[int, set[int]]:
+    """
+    Возвращает граф зависимостей: номер обработчика -> номера обработчиков, от которых он зависит.
+    """
+    return {
+        j: {i for i in range(j) if depends(handlers[j], handlers[i])}
+        for j in range(len(handlers))
+    }
+
+
+def waves(handlers: list[Handler]) -> list[list[int]]:
+    """
+    Разбивает цепочку на волны подряд идущих попарно независимых обработчиков.
+
+    Волны выполняются по порядку; обработчики одной волны — одновременно.
+    Порядок обработчиков внутри волны и волн между собой совпадает с цепочкой.
+    """
+    graph = dependency_graph(handlers)
+    result: list[list[int]] = []
+    for j in range(len(handlers)):
+        if result and not graph[j] & set(result[-1]) and handlers[j].reads is not None:
+            result[-1].append(j)
+        else:
+            result.append([j])
+    return result
+
+
+def _process_slice(handler: Handler, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Выполняет process обработчика над срезом столбцов и возвращает добавленные столбцы.
+    """
+    return handler.process(frame)[list(handler.writes)]
+
+
+def _run_wave(
+    handlers: list[Handler],
+    df: pd.DataFrame,
+    pool: Optional[Executor],
+) -> pd.DataFrame:
+    """
+    Выполняет волну независимых обработчиков над срезами столбцов df и объединяет результат.
+
+    Без пула или при включённом профилировании (его показатели собираются
+    в одном потоке) обработчики выполняются по очереди.
+    """
+    slices = [df[list(handler.reads)] for handler in handlers]
+    if pool is None or active_profiler() is not None:
+        outputs = [
+            handler.run(frame)[list(handler.writes)] for handler, frame in zip(handlers, slices)
+        ]
+    else:
+        futures = [
+            pool.submit(_process_slice, handler, frame) for handler, frame in zip(handlers, slices)
+        ]
+        outputs = [future.result() for future in futures]
+    for handler, output in zip(handlers, outputs):
+        for column in handler.writes:
+            df[column] = output[column]
+        df.drop(columns=[col for col in handler.drops if col not in handler.writes], inplace=True)
+    return df
+
+
+def _pool(handlers: list[Handler], jobs: Optional[int], executor: str):
+    """
+    Контекст пула для самой широкой волны (nullcontext, если параллелить нечего).
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Неизвестный способ выполнения: {executor}")
+    width = max(len(wave) for wave in waves(handlers))
+    jobs = min(jobs or os.cpu_count() or 1, width)
+    if jobs <= 1:
+        return nullcontext(None)
+    if executor == "process":
+        return ProcessPoolExecutor(max_workers=jobs)
+    return ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="stage")
+
+
+def run_graph(
+    handlers: list[Handler],
+    df: pd.DataFrame,
+    jobs: Optional[int] = None,
+    executor: str = "thread",
+) -> pd.DataFrame:
+    """
+    Выполняет обработчики над датафреймом по волнам графа зависимостей (аналог handle).
+
+    handlers — обработчики в порядке цепочки; связи set_next не используются.
+    jobs — наибольшее число одновременно выполняемых обработчиков (по умолчанию
+    число процессоров), executor — "thread" или "process".
+    Возвращает датафрейм на выходе последнего обработчика.
+    """
+    with _pool(handlers, jobs, executor) as pool:
+        for wave in waves(handlers):
+            if len(wave) == 1 and handlers[wave[0]].reads is None:
+                df = handlers[wave[0]].run(df)
+            else:
+                df = _run_wave([handlers[i] for i in wave], df, pool)
+    return df
+
+
+def run_graph_chunks(
+    handlers: list[Handler],
+    chunks: Iterable[pd.DataFrame],
+    jobs: Optional[int] = None,
+    executor: str = "thread",
+) -> Iterator[pd.DataFrame]:
+    """
+    Потоковый вариант run_graph (аналог handle_chunks).
+
+    Обработчики с reads = None получают поток частей (process_chunks), волны
+    независимых обработчиков выполняются над каждой частью.
+    Возвращает ленивый итератор частей на выходе последнего обработчика.
+    """
+    with _pool(handlers, jobs, executor) as pool:
+        stream: Iterable[pd.DataFrame] = chunks
+        for wave in waves(handlers):
+            if len(wave) == 1 and handlers[wave[0]].reads is None:
+                stream = handlers[wave[0]].run_chunks(stream)
+            else:
+                stream = _wave_stream([handlers[i] for i in wave], stream, pool)
+        yield from stream
+
+
+def _wave_stream(
+    handlers: list[Handler],
+    chunks: Iterable[pd.DataFrame],
+    pool: Optional[Executor],
+) -> Iterator[pd.DataFrame]:
+    for chunk in chunks:
+        yield _run_wave(handlers, chunk, pool)
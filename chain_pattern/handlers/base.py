@@ -3,8 +3,9 @@
 """
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 import pandas as pd
+from .profiling import active_profiler
 
 
 class Handler(ABC):
@@ -12,8 +13,17 @@ class Handler(ABC):
     Абстрактный обработчик в цепочке.
 
     Каждый обработчик выполняет свою логику в process и передаёт данные следующему.
+
+    reads, writes и drops — столбцы, которые process читает, добавляет и удаляет
+    (для выполнения графом зависимостей, см. dag). reads = None означает, что
+    обработчик работает со всем датафреймом и выполняется только после всех
+    предыдущих и до всех последующих.
     """
 
+    reads: Optional[tuple[str, ...]] = None
+    writes: tuple[str, ...] = ()
+    drops: tuple[str, ...] = ()
+
     def __init__(self) -> None:
         self._next: Optional[Handler] = None
 
@@ -34,11 +44,76 @@ class Handler(ABC):
         df — входной датафрейм.
         Возвращает обработанный датафрейм.
         """
-        processed = self.process(df)
+        processed = self.run(df)
         if self._next:
             return self._next.handle(processed)
         return processed
 
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Вызывает process; при включённом профилировании (см. handlers.profiling)
+        записывает показатели обработчика.
+
+        df — входной датафрейм.
+        Возвращает обработанный датафрейм.
+        """
+        profiler = active_profiler()
+        if profiler is None:
+            return self.process(df)
+        with profiler.measure(type(self).__name__, df) as stage:
+            processed = self.process(df)
+            stage.output(processed)
+        return processed
+
+    def handle_chunks(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        Потоковый вариант handle: обрабатывает данные по частям.
+
+        chunks — итератор частей входного датафрейма.
+        Возвращает ленивый итератор частей на выходе цепочки; обработка
+        выполняется по мере его чтения, в памяти одновременно находится одна часть.
+        """
+        processed = self.run_chunks(chunks)
+        if self._next:
+            return self._next.handle_chunks(processed)
+        return processed
+
+    def run_chunks(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        Вызывает process_chunks; при включённом профилировании записывает показатели
+        обработчика (потоковый вариант run).
+        """
+        profiler = active_profiler()
+        if profiler is None:
+            return self.process_chunks(chunks)
+        name = type(self).__name__
+        return profiler.iterate(name, self.process_chunks(profiler.feed(name, chunks)))
+
+    def process_chunks(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        Обрабатывает поток частей. По умолчанию вызывает process для каждой части.
+
+        Переопределяется обработчиками, которым нужно состояние между частями
+        (источник данных, запись результата).
+        """
+        for chunk in chunks:
+            yield self.process(chunk)
+
+    @property
+    def cacheable(self) -> bool:
+        """
+        Можно ли взять результат process из кэша вместо выполнения.
+
+        Ложно для обработчиков с побочными эффектами (запись файлов).
+        """
+        return True
+
+    def cache_params(self) -> dict:
+        """
+        Параметры, от которых зависит результат process; входят в ключ кэша.
+        """
+        return {}
+
     @abstractmethod
     def process(self, df: pd.DataFrame) -> pd.DataFrame:
         """
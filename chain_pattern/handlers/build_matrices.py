@@ -1,31 +1,473 @@
 """
 Обработчик построения матриц признаков и целевых значений.
 """
+import shutil
+import zipfile
+from typing import Optional
 import numpy as np
+import pandas as pd
 from pathlib import Path
 from .base import Handler
+from .feature_store import (
+    FeatureStoreWriter,
+    fingerprint,
+    promote_dtype,
+    upcast_file,
+)
+from .filenames import FEATURES_FILENAME, SPARSE_X_FILENAME
+
+# Столбцы, не входящие в матрицу признаков: целевое значение и его исходный текст.
+TARGET_COLUMNS = ("salary", "зп")
+# Наибольшее по модулю целое, точно представимое во float32.
+_FLOAT32_EXACT = 2 ** 24
+# Форматы результата: отдельные .npy-файлы или хранилище признаков (см. feature_store).
+OUTPUT_FORMATS = ("npy", "store")
+
+
+def _sparse():
+    """
+    Модуль scipy.sparse (нужен только для столбцов, кодируемых в корзины).
+    """
+    try:
+        from scipy import sparse
+    except ImportError as exc:
+        raise ImportError(
+            "Для кодирования столбцов в корзины требуется пакет scipy: pip install scipy"
+        ) from exc
+    return sparse
+
+
+class NpyAppender:
+    """
+    Записывает массив в .npy-файл по частям строк, не держа его в памяти целиком.
+
+    Столбцы копятся во временных файлах и склеиваются при close, поэтому результат
+    побайтно совпадает с np.save для массива, полученного DataFrame.to_numpy
+    (такой массив хранится по столбцам, fortran_order). Часть более широкого типа
+    (float64 после float32 экономного режима) переводит в него уже записанные
+    столбцы (см. feature_store.promote_dtype), как при записи массива целиком.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._dtype = None
+        self._row_shape = None
+        self._rows = 0
+        self._parts: list[Path] = []
+        self._files = []
+
+    def append(self, array: np.ndarray) -> None:
+        """
+        Дописывает строки array в конец массива.
+
+        array — одномерный вектор или двумерная матрица; число столбцов должно
+        совпадать с первой частью, а тип — приводиться к общему с ней.
+        Генерирует исключение при несовместимой части.
+        """
+        if self._dtype is None:
+            self._dtype = array.dtype
+            self._row_shape = array.shape[1:]
+            columns = self._row_shape[0] if self._row_shape else 1
+            self._parts = [
+                self._path.with_name(f"{self._path.name}.{i}.part") for i in range(columns)
+            ]
+            self._files = [open(part, "wb") for part in self._parts]
+        if array.shape[1:] != self._row_shape:
+            raise ValueError(
+                f"Форма части {array.shape} не совпадает с формой первой части "
+                f"(*, {', '.join(map(str, self._row_shape))}) для {self._path.name}."
+            )
+        if array.dtype != self._dtype:
+            dtype = promote_dtype(self._dtype, array.dtype, self._path.name)
+            if dtype != self._dtype:
+                for j, part in enumerate(self._parts):
+                    self._files[j].close()
+                    upcast_file(part, self._dtype, dtype)
+                    self._files[j] = open(part, "ab")
+                self._dtype = dtype
+            array = array.astype(self._dtype)
+        columns = array.reshape(len(array), -1)
+        for j, file in enumerate(self._files):
+            np.ascontiguousarray(columns[:, j]).tofile(file)
+        self._rows += len(array)
+
+    def close(self) -> None:
+        """
+        Записывает итоговый .npy-файл и удаляет временные файлы.
+
+        Генерирует исключение, если не было записано ни одной части.
+        """
+        if self._dtype is None:
+            raise ValueError(f"Нет данных для записи в {self._path.name}.")
+        for file in self._files:
+            file.close()
+        shape = (self._rows, *self._row_shape)
+        header = {
+            "descr": np.lib.format.dtype_to_descr(self._dtype),
+            # np.save помечает fortran_order только массивы, не являющиеся C-непрерывными
+            "fortran_order": len(shape) == 2 and shape[0] > 1 and shape[1] > 1,
+            "shape": shape,
+        }
+        # Файл собирается рядом и заменяет прежний целиком: прежний можно читать
+        # до замены, а прерванная запись его не портит.
+        partial = self._path.with_name(f"{self._path.name}.part")
+        try:
+            with open(partial, "wb") as out:
+                np.lib.format.write_array_header_1_0(out, header)
+                for part in self._parts:
+                    with open(part, "rb") as src:
+                        shutil.copyfileobj(src, out, 1 << 20)
+            partial.replace(self._path)
+        finally:
+            partial.unlink(missing_ok=True)
+        self.discard()
+
+    def discard(self) -> None:
+        """
+        Удаляет временные файлы без записи результата.
+        """
+        for file in self._files:
+            file.close()
+        for part in self._parts:
+            part.unlink(missing_ok=True)
+        self._files = []
+        self._parts = []
+
+
+class SparseAppender:
+    """
+    Записывает разреженную матрицу CSR в .npz-файл по частям строк, не держа её в памяти целиком.
+
+    Файл читается scipy.sparse.load_npz: массивы data, indices и indptr копятся
+    во временных файлах и при close записываются в архив без сжатия. Тип значений
+    и число столбцов частей проверяются, как в NpyAppender; часть более широкого
+    типа переводит в него уже записанные значения.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._dtype = None
+        self._n_columns = 0
+        self._rows = 0
+        self._nnz = 0
+        self._parts = {
+            name: path.with_name(f"{path.name}.{name}.part") for name in ("data", "indices", "indptr")
+        }
+        self._files = {}
+
+    def append(self, matrix) -> None:
+        """
+        Дописывает строки разреженной матрицы matrix в конец.
+
+        Генерирует исключение при несовместимой части.
+        """
+        matrix = matrix.tocsr()
+        matrix.sort_indices()
+        if self._dtype is None:
+            self._dtype = matrix.dtype
+            self._n_columns = matrix.shape[1]
+            self._files = {name: open(part, "wb") for name, part in self._parts.items()}
+            np.zeros(1, dtype=np.int64).tofile(self._files["indptr"])
+        if matrix.shape[1] != self._n_columns:
+            raise ValueError(
+                f"Число столбцов части ({matrix.shape[1]}) не совпадает с первой частью "
+                f"({self._n_columns}) для {self._path.name}."
+            )
+        data = matrix.data
+        if data.dtype != self._dtype:
+            dtype = promote_dtype(self._dtype, data.dtype, self._path.name)
+            if dtype != self._dtype:
+                self._files["data"].close()
+                upcast_file(self._parts["data"], self._dtype, dtype)
+                self._files["data"] = open(self._parts["data"], "ab")
+                self._dtype = dtype
+            data = data.astype(self._dtype)
+        data.tofile(self._files["data"])
+        matrix.indices.astype(np.int64).tofile(self._files["indices"])
+        (matrix.indptr[1:].astype(np.int64) + self._nnz).tofile(self._files["indptr"])
+        self._rows += matrix.shape[0]
+        self._nnz += matrix.nnz
+
+    def _write_member(self, archive: zipfile.ZipFile, name: str, dtype, length: int) -> None:
+        """
+        Записывает временный файл массива name в архив как name.npy.
+        """
+        header = {
+            "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            "fortran_order": False,
+            "shape": (length,),
+        }
+        with archive.open(f"{name}.npy", "w", force_zip64=True) as out:
+            np.lib.format.write_array_header_1_0(out, header)
+            with open(self._parts[name], "rb") as src:
+                shutil.copyfileobj(src, out, 1 << 20)
+
+    def close(self) -> None:
+        """
+        Записывает итоговый .npz-файл (заменяя прежний целиком) и удаляет временные файлы.
+
+        Генерирует исключение, если не было записано ни одной части.
+        """
+        if self._dtype is None:
+            raise ValueError(f"Нет данных для записи в {self._path.name}.")
+        for file in self._files.values():
+            file.close()
+        partial = self._path.with_name(f"{self._path.name}.part")
+        try:
+            with zipfile.ZipFile(partial, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for name, array in (
+                    ("format", np.array(b"csr")),
+                    ("shape", np.array((self._rows, self._n_columns), dtype=np.int64)),
+                ):
+                    with archive.open(f"{name}.npy", "w") as out:
+                        np.lib.format.write_array(out, array, allow_pickle=False)
+                self._write_member(archive, "data", self._dtype, self._nnz)
+                self._write_member(archive, "indices", np.int64, self._nnz)
+                self._write_member(archive, "indptr", np.int64, self._rows + 1)
+            partial.replace(self._path)
+        finally:
+            partial.unlink(missing_ok=True)
+        self.discard()
+
+    def discard(self) -> None:
+        """
+        Удаляет временные файлы без записи результата.
+        """
+        for file in self._files.values():
+            file.close()
+        for part in self._parts.values():
+            part.unlink(missing_ok=True)
+        self._files = {}
+
+
+def _fits_float32(column: np.ndarray) -> bool:
+    """
+    Представимы ли все значения столбца во float32 без изменения.
+    """
+    if column.dtype.kind in "iu":
+        return column.dtype.itemsize <= 2 or len(column) == 0 or (
+            column.min() >= -_FLOAT32_EXACT and column.max() <= _FLOAT32_EXACT
+        )
+    if column.dtype.kind == "f":
+        return column.dtype.itemsize <= 4 or np.array_equal(
+            column.astype(np.float32), column, equal_nan=True
+        )
+    return False
+
+
+def feature_matrix(
+    df,
+    lean: bool = False,
+    buckets: Optional[dict[str, int]] = None,
+) -> tuple[np.ndarray, list[str]]:
+    """
+    Возвращает матрицу признаков датафрейма и названия её столбцов.
+
+    Признаки — числовые столбцы, кроме TARGET_COLUMNS (если они есть), в порядке
+    датафрейма (как select_dtypes(include=["number"])). В режиме lean матрица
+    заполняется по столбцам без промежуточных датафреймов во float32 (float64,
+    если какой-то столбец не представим во float32 точно).
+    buckets — число корзин столбцов, закодированных в корзины (см.
+    encode_categorical.bucket_counts); с ними возвращается разреженная матрица
+    (см. _bucket_matrix).
+    """
+    if buckets:
+        return _bucket_matrix(df, lean, buckets)
+    if lean:
+        feature_names = [
+            col for col, dtype in df.dtypes.items()
+            if col not in TARGET_COLUMNS
+            and pd.api.types.is_numeric_dtype(dtype)
+            and not pd.api.types.is_bool_dtype(dtype)
+        ]
+        columns = [df[col].to_numpy() for col in feature_names]
+        dtype = np.float32 if all(map(_fits_float32, columns)) else np.float64
+        x = np.empty((len(df), len(columns)), dtype=dtype, order="F")
+        for j, column in enumerate(columns):
+            x[:, j] = column
+        return x, feature_names
+    targets = [col for col in TARGET_COLUMNS if col in df.columns]
+    features = df.drop(columns=targets).select_dtypes(include=["number"])
+    return features.to_numpy(), features.columns.tolist()
+
+
+def _bucket_matrix(df, lean: bool, buckets: dict[str, int]):
+    """
+    Разреженная матрица признаков (scipy.sparse CSR) со столбцами, закодированными в корзины.
+
+    Сначала идут прочие признаки (как в feature_matrix), затем для каждого такого
+    столбца в порядке buckets — блок индикаторов его корзин: в строке одна единица
+    в столбце корзины. Названия столбцов блока — «столбец#корзина».
+    """
+    sparse = _sparse()
+    present = [col for col in buckets if col in df.columns]
+    dense, feature_names = feature_matrix(df.drop(columns=present), lean)
+    n_rows = len(df)
+    blocks = [sparse.csr_matrix(dense)]
+    for col in present:
+        codes = df[col].to_numpy(dtype=np.int64)
+        ones = np.ones(n_rows, dtype=dense.dtype)
+        blocks.append(
+            sparse.csr_matrix((ones, (np.arange(n_rows), codes)), shape=(n_rows, buckets[col]))
+        )
+        feature_names += [f"{col}#{bucket}" for bucket in range(buckets[col])]
+    return sparse.hstack(blocks, format="csr"), feature_names
 
 
 class BuildMatricesHandler(Handler):
     """
     Формирует матрицы x_data.npy и y_data.npy и сохраняет в указанную папку.
+
+    После обработки feature_names содержит названия столбцов x_data.npy по порядку.
+    В режиме lean матрица признаков заполняется по столбцам в заранее выделенный
+    массив float32 без промежуточных датафреймов; значения не меняются, а если
+    какой-то столбец не представим во float32 точно, используется float64.
+    С output_format="store" матрицы сохраняются в хранилище признаков FEATURES_FILENAME
+    (сжатие compression, см. feature_store) с отпечатком, построенным по отпечатку
+    кода pipeline, названиям признаков и словарям категорий из df.attrs["vocabularies"].
+    С buckets (столбцы, закодированные в корзины, см. feature_matrix) матрица признаков
+    разреженная и сохраняется в SPARSE_X_FILENAME (SparseAppender) вместо x_data.npy;
+    хранилище признаков для неё не поддерживается.
     """
 
-    def __init__(self, output_dir: Path):
+    def __init__(
+        self,
+        output_dir: Path,
+        lean: bool = False,
+        output_format: str = "npy",
+        compression: Optional[str] = None,
+        pipeline: str = "",
+        buckets: Optional[dict[str, int]] = None,
+    ):
         super().__init__()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(
+                f"Неизвестный формат матриц: {output_format}. Допустимые: {', '.join(OUTPUT_FORMATS)}."
+            )
+        if buckets and output_format == "store":
+            raise ValueError(
+                "Столбцы, закодированные в корзины, поддерживаются только в формате npy."
+            )
+        self._buckets = buckets or None
         self._output_dir = output_dir
+        self._lean = lean
+        self._output_format = output_format
+        self._compression = compression
+        self._pipeline = pipeline
+        self.feature_names: list[str] = []
+
+    @property
+    def cacheable(self) -> bool:
+        """
+        Результат — файлы x_data.npy и y_data.npy, поэтому обработчик выполняется всегда.
+        """
+        return False
+
+    def _matrices(self, df) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Возвращает матрицу признаков и вектор зарплат для датафрейма.
+        """
+        y = df["salary"].to_numpy(dtype=np.float32)
+        x, self.feature_names = feature_matrix(df, self._lean, self._buckets)
+        return x, y
+
+    def _store_writer(self, df) -> FeatureStoreWriter:
+        """
+        Создаёт запись хранилища признаков; вызывается после _matrices.
+        """
+        return FeatureStoreWriter(
+            self._output_dir / FEATURES_FILENAME,
+            self.feature_names,
+            compression=self._compression,
+            fingerprint=fingerprint(
+                self._pipeline, self.feature_names, df.attrs.get("vocabularies")
+            ),
+        )
 
     def process(self, df):
         """
-        Извлекает признаки и зарплаты, сохраняет в .npy-файлы.
+        Извлекает признаки и зарплаты, сохраняет в .npy-файлы или хранилище признаков.
 
         df — входной датафрейм с обработанными признаками и столбцом salary.
         Возвращает исходный датафрейм без изменений.
         """
-        y = df["salary"].to_numpy(dtype=np.float32)
-        x = df.drop(columns=["salary", "зп"]).select_dtypes(include=["number"]).to_numpy()
+        x, y = self._matrices(df)
 
-        np.save(self._output_dir / "x_data.npy", x)
+        if self._output_format == "store":
+            writer = self._store_writer(df)
+            try:
+                writer.append(x, y)
+                writer.close()
+            finally:
+                writer.discard()
+            return df
+
+        if self._buckets:
+            x_writer = SparseAppender(self._output_dir / SPARSE_X_FILENAME)
+            try:
+                x_writer.append(x)
+                x_writer.close()
+            finally:
+                x_writer.discard()
+        else:
+            np.save(self._output_dir / "x_data.npy", x)
         np.save(self._output_dir / "y_data.npy", y)
+        self._remove_stale()
 
         return df
+
+    def _remove_stale(self) -> None:
+        """
+        Удаляет матрицы признаков других форматов: regression читает хранилище
+        признаков раньше .npy-файлов, а x_data.npz — раньше x_data.npy.
+        """
+        stale = [FEATURES_FILENAME, "x_data.npy" if self._buckets else SPARSE_X_FILENAME]
+        for name in stale:
+            (self._output_dir / name).unlink(missing_ok=True)
+
+    def process_chunks(self, chunks):
+        """
+        Дописывает признаки и зарплаты каждой части в .npy-файлы или хранилище признаков.
+
+        chunks — итератор частей с обработанными признаками и столбцом salary.
+        Возвращает части без изменений; файлы дописываются после последней части.
+        """
+        if self._output_format == "store":
+            yield from self._store_chunks(chunks)
+            return
+        if self._buckets:
+            x_writer = SparseAppender(self._output_dir / SPARSE_X_FILENAME)
+        else:
+            x_writer = NpyAppender(self._output_dir / "x_data.npy")
+        y_writer = NpyAppender(self._output_dir / "y_data.npy")
+        try:
+            for chunk in chunks:
+                x, y = self._matrices(chunk)
+                x_writer.append(x)
+                y_writer.append(y)
+                yield chunk
+            x_writer.close()
+            y_writer.close()
+            self._remove_stale()
+        finally:
+            x_writer.discard()
+            y_writer.discard()
+
+    def _store_chunks(self, chunks):
+        """
+        Потоковая запись хранилища признаков (см. process_chunks).
+        """
+        writer = None
+        try:
+            for chunk in chunks:
+                x, y = self._matrices(chunk)
+                if writer is None:
+                    writer = self._store_writer(chunk)
+                writer.append(x, y)
+                yield chunk
+            if writer is None:
+                raise ValueError(f"Нет данных для записи в {FEATURES_FILENAME}.")
+            writer.close()
+        finally:
+            if writer is not None:
+                writer.discard()
@@ -0,0 +1,143 @@
+"""
+Разбиение CSV-файла на диапазоны байтов по границам записей и чтение диапазона.
+"""
+import io
+from pathlib import Path
+from typing import Union
+
+_BLOCK_SIZE = 1 << 20
+
+
+def _record_boundaries(path: Union[str, Path], offsets: list[int]) -> list[int]:
+    """
+    Для каждого смещения находит начало первой записи CSV не раньше него.
+
+    Перевод строки считается концом записи, только если до него в файле чётное
+    число кавычек (то есть он не внутри значения в кавычках).
+
+    path — путь к CSV-файлу.
+    offsets — смещения в байтах по возрастанию.
+    Возвращает смещения начал записей; за концом файла — размер файла.
+    """
+    result: list[int] = []
+    position = 0
+    parity = 0
+    with open(path, "rb") as file:
+        while len(result) < len(offsets):
+            block = file.read(_BLOCK_SIZE)
+            if not block:
+                break
+            local_parity = parity
+            counted = 0
+            while len(result) < len(offsets):
+                start = max(offsets[len(result)] - position, counted)
+                if start >= len(block):
+                    break
+                index = block.find(b"\n", start)
+                while index != -1:
+                    local_parity ^= block.count(b'"', counted, index) & 1
+                    counted = index
+                    if not local_parity:
+                        break
+                    index = block.find(b"\n", index + 1)
+                if index == -1:
+                    break
+                result.append(position + index + 1)
+                counted = index + 1
+            parity ^= block.count(b'"') & 1
+            position += len(block)
+    return result + [position] * (len(offsets) - len(result))
+
+
+def complete_records_end(path: Union[str, Path], start: int) -> int:
+    """
+    Находит конец последней полной записи CSV-файла после смещения start.
+
+    Запись полная, если за ней следует перевод строки вне значения в кавычках;
+    незавершённая последняя строка (файл ещё дописывается) не учитывается.
+
+    path — путь к CSV-файлу.
+    start — начало записи (например, конец заголовка или предыдущей обработанной части).
+    Возвращает смещение за последней полной записью; start, если полных записей нет.
+    """
+    end = start
+    position = start
+    parity = 0
+    with open(path, "rb") as file:
+        file.seek(start)
+        while True:
+            block = file.read(_BLOCK_SIZE)
+            if not block:
+                break
+            counted = 0
+            index = block.find(b"\n")
+            while index != -1:
+                parity ^= block.count(b'"', counted, index) & 1
+                counted = index
+                if not parity:
+                    end = position + index + 1
+                index = block.find(b"\n", index + 1)
+            parity ^= block.count(b'"', counted) & 1
+            position += len(block)
+    return end
+
+
+def split_csv(path: Union[str, Path], parts: int) -> tuple[int, list[tuple[int, int]]]:
+    """
+    Делит CSV-файл на части примерно равного размера по границам записей.
+
+    path — путь к CSV-файлу.
+    parts — желаемое число частей.
+    Возвращает конец строки заголовка и непустые диапазоны байтов [start, end)
+    частей без заголовка.
+    """
+    size = Path(path).stat().st_size
+    header_end = _record_boundaries(path, [0])[0]
+    body = size - header_end
+    offsets = [header_end + body * k // parts for k in range(1, parts)]
+    bounds = [header_end] + _record_boundaries(path, offsets) + [size]
+    ranges = [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+    return header_end, ranges
+
+
+class CSVRangeReader(io.RawIOBase):
+    """
+    Поток байтов строки заголовка CSV-файла, за которой следует диапазон [start, end).
+
+    Передаётся в pd.read_csv, чтобы часть файла читалась как самостоятельный CSV.
+    """
+
+    def __init__(self, path: Union[str, Path], header_end: int, start: int, end: int) -> None:
+        super().__init__()
+        self._file = open(path, "rb")
+        self._header = self._file.read(header_end)
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer)
+        if self._header:
+            size = min(len(view), len(self._header))
+            view[:size] = self._header[:size]
+            self._header = self._header[size:]
+            return size
+        size = min(len(view), self._remaining)
+        if size <= 0:
+            return 0
+        read = self._file.readinto(view[:size])
+        self._remaining -= read
+        return read
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def open_csv_range(path: Union[str, Path], header_end: int, start: int, end: int) -> io.BufferedReader:
+    """
+    Открывает диапазон CSV-файла вместе с заголовком как буферизованный поток.
+    """
+    return io.BufferedReader(CSVRangeReader(path, header_end, start, end), _BLOCK_SIZE)
@@ -1,13 +1,157 @@
 """
 Обработчик кодирования категориальных признаков.
 """
-from sklearn.preprocessing import LabelEncoder
+import json
+from pathlib import Path
+from typing import Optional
+import numpy as np
+import pandas as pd
 from .base import Handler
+from .strings import map_unique
+
+UNKNOWN_CODE = -1
+# Файл словарей рядом с матрицами признаков (режим fit) и рядом с моделью regression.
+VOCABULARIES_FILENAME = "vocabularies.json"
+# Способы кодирования столбца в корзины (кроме кодирования по словарю): хеширование
+# значений и самые частые значения с корзиной «прочие».
+BUCKET_ENCODINGS = ("hash", "top")
+# Во сколько раз счётчиков частот режима top больше, чем сохраняемых значений.
+TOP_COUNTERS_FACTOR = 8
+
+
+def parse_encoding(spec: str) -> tuple[str, tuple[str, int]]:
+    """
+    Разбирает описание кодирования столбца в корзины: «столбец=способ:число».
+
+    Способ hash — хеширование значений в число корзин, top — столько самых частых
+    значений и корзина «прочие», например "ищет_работу_на_должность:=hash:1024".
+    Возвращает пару: столбец и (способ, число).
+    Генерирует исключение при неверном описании или столбце не из CATEGORICAL_COLUMNS.
+    """
+    column, _, rule = spec.rpartition("=")
+    method, _, count = rule.partition(":")
+    if column not in EncodeCategoricalHandler.CATEGORICAL_COLUMNS:
+        raise ValueError(
+            f"Неизвестный категориальный столбец в «{spec}». "
+            f"Допустимые: {', '.join(EncodeCategoricalHandler.CATEGORICAL_COLUMNS)}."
+        )
+    if method not in BUCKET_ENCODINGS or not count.isdigit() or int(count) < 1:
+        raise ValueError(
+            f"Неверное кодирование «{spec}»: ожидается столбец=hash:N или столбец=top:N, N ≥ 1."
+        )
+    return column, (method, int(count))
+
+
+def bucket_counts(encodings: Optional[dict[str, tuple[str, int]]]) -> dict[str, int]:
+    """
+    Число корзин каждого столбца, кодируемого в корзины (top:N — N значений и «прочие»).
+    """
+    return {
+        col: count if method == "hash" else count + 1
+        for col, (method, count) in (encodings or {}).items()
+    }
+
+
+def hash_buckets(values: pd.Series, buckets: int) -> np.ndarray:
+    """
+    Номера корзин значений при хешировании: одинаковы во всех процессах и запусках
+    (pd.util.hash_array с постоянным ключом), словарь не нужен.
+    """
+    hashed = pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+    return (hashed % np.uint64(buckets)).astype(np.int64)
+
+
+def _value_counts(values: pd.Series) -> pd.Series:
+    """
+    Частоты значений столбца по их строковому виду (как в словарях).
+    """
+    counts = values.value_counts(dropna=False)
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(str)
+    return counts.groupby(level=0).sum()
+
+
+def _merge_counts(counts: Optional[pd.Series], batch: pd.Series, capacity: int) -> pd.Series:
+    """
+    Добавляет частоты части данных к счётчикам и оставляет capacity наибольших
+    (алгоритм Space-Saving, объединение сводок).
+
+    Пока разных значений не больше capacity, частоты точные. Когда все счётчики
+    заняты, значению, которого среди них нет, добавляется наименьший счётчик:
+    столько раз оно могло встретиться до вытеснения. Оценка не меньше истинной
+    частоты и превышает её не больше чем на наименьший счётчик, поэтому значение,
+    встречающееся чаще доли 1 / capacity строк, не теряется, а число счётчиков
+    не убывает. При равных частотах остаются меньшие по порядку значения.
+    """
+    if counts is not None:
+        floor = counts.min() if len(counts) >= capacity else 0
+        merged = counts.add(batch, fill_value=0).astype("int64")
+        if floor:
+            merged[~merged.index.isin(counts.index)] += floor
+        batch = merged
+    if len(batch) <= capacity:
+        return batch
+    return batch.sort_index().sort_values(ascending=False, kind="stable").iloc[:capacity]
+
+
+def load_vocabularies(path: Path) -> dict[str, list[str]]:
+    """
+    Загружает словари категориальных столбцов из JSON-файла.
+
+    path — путь к файлу, сохранённому save_vocabularies.
+    Возвращает словари: для каждого столбца значения в порядке их кодов.
+    Генерирует исключение при отсутствии или повреждении файла.
+    """
+    if not path.is_file():
+        raise FileNotFoundError(
+            f"Файл словарей не найден: {path}. "
+            "Сначала выполните подготовку обучающих данных в режиме fit."
+        )
+    try:
+        with open(path, encoding="utf-8") as file:
+            vocabularies = json.load(file)
+    except (OSError, ValueError) as exc:
+        raise ValueError(f"Не удалось загрузить словари из {path}: {exc}") from exc
+    return vocabularies
+
+
+def save_vocabularies(path: Path, vocabularies: dict[str, list[str]]) -> None:
+    """
+    Сохраняет словари категориальных столбцов в JSON-файл.
+
+    path — путь к файлу; папка создаётся при необходимости.
+    vocabularies — для каждого столбца значения в порядке их кодов.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(vocabularies, file, ensure_ascii=False)
 
 
 class EncodeCategoricalHandler(Handler):
     """
-    Кодирует категориальные столбцы числами с помощью LabelEncoder.
+    Кодирует категориальные столбцы числами по словарям значений.
+
+    Код значения — его позиция в отсортированном словаре столбца (как у LabelEncoder).
+    Режим fit (без vocabularies): словари строятся по каждому входному датафрейму
+    и сохраняются в save_path, если он задан; обученные словари доступны через
+    vocabularies. Режим transform (с vocabularies): значения кодируются поиском
+    в хеш-таблице без сортировки, неизвестные значения получают UNKNOWN_CODE.
+    Словари, собранные заранее через partial_fit, используются и в потоковом
+    и параллельном режимах: тогда коды всех частей совпадают с кодами обработки
+    файла целиком. В режиме lean коды хранятся наименьшим целым типом,
+    вмещающим значения столбца. Использованные словари записываются
+    в df.attrs["vocabularies"] для отпечатка хранилища признаков.
+
+    encodings задаёт столбцам с большим числом значений кодирование в корзины
+    (см. parse_encoding); код такого столбца — номер корзины, и BuildMatricesHandler
+    раскрывает его в разреженный блок признаков (bucket_counts).
+    ("hash", N) — номер корзины по хешу значения (hash_buckets): словарь не строится,
+    память не зависит от числа значений. ("top", N) — словарь из N самых частых
+    значений (коды 0..N-1), остальные и неизвестные значения попадают в корзину
+    «прочие» с кодом N. Частоты при сборе словаря считаются не более чем
+    N · TOP_COUNTERS_FACTOR счётчиками (_merge_counts): пока разных значений
+    не больше, словарь потокового режима совпадает с обработкой файла целиком,
+    иначе частоты оцениваются сверху и граничные значения словаря могут отличаться.
     """
 
     CATEGORICAL_COLUMNS = [
@@ -18,6 +162,116 @@ class EncodeCategoricalHandler(Handler):
         "авто",
     ]
 
+    def __init__(
+        self,
+        vocabularies: Optional[dict[str, list[str]]] = None,
+        save_path: Optional[Path] = None,
+        lean: bool = False,
+        encodings: Optional[dict[str, tuple[str, int]]] = None,
+    ) -> None:
+        super().__init__()
+        self._encodings = dict(encodings or {})
+        self._vocabularies = vocabularies
+        if vocabularies is not None:
+            self._check_top(vocabularies)
+        self._codes = None if vocabularies is None else self._code_tables(vocabularies)
+        self._save_path = save_path
+        self._lean = lean
+        self._seen: dict[str, set[str]] = {}
+        self._counts: dict[str, pd.Series] = {}
+
+    def _method(self, col: str) -> str:
+        """
+        Способ кодирования столбца: "ordinal" (по словарю), "hash" или "top".
+        """
+        return self._encodings.get(col, ("ordinal", 0))[0]
+
+    def _check_top(self, vocabularies: dict[str, list[str]]) -> None:
+        """
+        Проверяет, что словари столбцов top не длиннее числа сохраняемых значений.
+        """
+        for col, (method, count) in self._encodings.items():
+            if method == "top" and len(vocabularies.get(col, [])) > count:
+                raise ValueError(
+                    f"Словарь столбца {col} содержит {len(vocabularies[col])} значений, "
+                    f"а кодирование top:{count} — не больше {count}. "
+                    "Подготовьте словари с тем же кодированием столбцов."
+                )
+
+    @staticmethod
+    def _code_tables(vocabularies: dict[str, list[str]]) -> dict[str, dict[str, int]]:
+        """
+        Строит хеш-таблицы «значение → код» по словарям.
+        """
+        return {
+            col: {value: code for code, value in enumerate(values)}
+            for col, values in vocabularies.items()
+        }
+
+    @property
+    def cacheable(self) -> bool:
+        """
+        В режиме fit с сохранением словарей результат не кэшируется: словари записываются в файл.
+        """
+        return self._codes is not None or self._save_path is None
+
+    def cache_params(self) -> dict:
+        """
+        Таблицы кодов режима transform (None в режиме fit) и режим lean.
+        """
+        return {"codes": self._codes, "lean": self._lean, "encodings": self._encodings}
+
+    def partial_fit(self, df) -> None:
+        """
+        Добавляет значения категориальных столбцов части данных в словари.
+
+        Столбцы hash пропускаются, для столбцов top обновляются счётчики частот.
+        df — часть датафрейма после разбора столбцов (перед кодированием).
+        """
+        for col in self.CATEGORICAL_COLUMNS:
+            if col not in df.columns:
+                continue
+            method = self._method(col)
+            if method == "top":
+                capacity = self._encodings[col][1] * TOP_COUNTERS_FACTOR
+                self._counts[col] = _merge_counts(
+                    self._counts.get(col), _value_counts(df[col]), capacity
+                )
+            elif method == "ordinal":
+                uniques = pd.Series(df[col].unique()).astype(str)
+                self._seen.setdefault(col, set()).update(uniques)
+
+    @property
+    def vocabularies(self) -> dict[str, list[str]]:
+        """
+        Словари, собранные через partial_fit или при последнем обучении в process:
+        отсортированные значения по столбцам. Для столбцов top — самые частые
+        значения (при равных частотах — меньшие по порядку).
+        """
+        vocabularies = {col: sorted(values) for col, values in self._seen.items()}
+        for col, counts in self._counts.items():
+            ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            vocabularies[col] = sorted(value for value, _ in ranked[: self._encodings[col][1]])
+        return vocabularies
+
+    def _encoder(self, col: str, table: dict[str, int]):
+        """
+        Возвращает преобразование уникальных значений столбца в коды по таблице
+        (для столбцов hash — в номера корзин).
+        """
+        method, count = self._encodings.get(col, ("ordinal", 0))
+        missing = count if method == "top" else UNKNOWN_CODE
+
+        def encode(values):
+            if method == "hash":
+                encoded = pd.Series(hash_buckets(values, count), index=values.index)
+            else:
+                encoded = values.astype(str).map(table).fillna(missing).astype("int64")
+            if self._lean:
+                return pd.to_numeric(encoded, downcast="integer")
+            return encoded
+        return encode
+
     def process(self, df):
         """
         Заменяет категориальные значения на числовые коды.
@@ -25,8 +279,16 @@ class EncodeCategoricalHandler(Handler):
         df — входной датафрейм.
         Возвращает датафрейм с закодированными категориальными столбцами.
         """
+        codes, vocabularies = self._codes, self._vocabularies
+        if codes is None:
+            self._seen, self._counts = {}, {}
+            self.partial_fit(df)
+            vocabularies = self.vocabularies
+            if self._save_path is not None:
+                save_vocabularies(self._save_path, vocabularies)
+            codes = self._code_tables(vocabularies)
+        df.attrs["vocabularies"] = vocabularies
         for col in self.CATEGORICAL_COLUMNS:
             if col in df.columns:
-                encoder = LabelEncoder()
-                df[col] = encoder.fit_transform(df[col].astype(str))
+                df[col] = map_unique(df[col], self._encoder(col, codes.get(col, {})))
         return df
@@ -0,0 +1,589 @@
+"""
+Хранилище признаков: матрица признаков и целевые значения в одном самоописывающем файле.
+
+Формат файла:
+    данные столбцов | JSON-заголовок | длина заголовка (uint64 LE) | MAGIC
+
+Заголовок содержит названия и типы признаков, число строк, отпечаток пайплайна
+(см. fingerprint), способ сжатия и для каждой части строк — смещения и размеры
+столбцов признаков и столбца целевых значений. Каждый столбец части начинается
+с границы ALIGNMENT байт.
+
+Без сжатия файл состоит из одной части, столбцы которой лежат с одинаковым шагом,
+поэтому матрица признаков читается как представление отображённого в память файла:
+диапазоны строк и подряд идущие столбцы читаются без копирования.
+Со сжатием (zlib) строки делятся на части по chunk_rows, каждый столбец части
+сжимается отдельно, и при чтении распаковываются только нужные части и столбцы.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import mmap
+import shutil
+import struct
+import zlib
+from pathlib import Path
+from typing import Optional, Sequence, Union
+import numpy as np
+from .filenames import FEATURES_FILENAME
+
+MAGIC = b"HHFSTOR1"
+VERSION = 1
+ALIGNMENT = 64
+CHUNK_ROWS = 65536
+COMPRESSIONS = (None, "zlib")
+# Значений в блоке при переписывании записанных частей в более широкий тип.
+UPCAST_BLOCK = 1 << 20
+_TAIL = struct.Struct("<Q8s")
+
+Columns = Optional[Sequence[Union[int, str]]]
+
+
+def fingerprint(pipeline: str, feature_names: list[str], vocabularies: Optional[dict]) -> str:
+    """
+    Отпечаток признаков: код обработчиков, названия признаков и словари категорий.
+
+    pipeline — отпечаток кода обработчиков (см. cache.pipeline_fingerprint).
+    Матрицы с одинаковым отпечатком закодированы одинаково и совместимы с одной моделью.
+    """
+    payload = json.dumps(
+        {"pipeline": pipeline, "features": feature_names, "vocabularies": vocabularies},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def promote_dtype(current: np.dtype, incoming: np.dtype, name: str) -> np.dtype:
+    """
+    Общий тип уже записанных частей (current) и новой части (incoming), в котором
+    значения обоих не меняются: например, float32 и float64 дают float64.
+
+    Нужен для записи по частям: экономный режим chain_pattern выбирает float32
+    или float64 по значениям каждой части (см. build_matrices.feature_matrix).
+    Генерирует исключение, если такого типа нет или типы не числовые.
+    """
+    if current == incoming:
+        return current
+    promoted = None
+    if current.kind in "biuf" and incoming.kind in "biuf":
+        promoted = np.promote_types(current, incoming)
+    if promoted is None or not (
+        np.can_cast(current, promoted, casting="safe")
+        and np.can_cast(incoming, promoted, casting="safe")
+    ):
+        raise ValueError(
+            f"Тип части {incoming} несовместим с типом первой части {current} для {name}."
+        )
+    return promoted
+
+
+def upcast_file(path: Path, dtype: np.dtype, promoted: np.dtype) -> None:
+    """
+    Переписывает файл сырых значений типа dtype значениями типа promoted (блоками
+    по UPCAST_BLOCK значений); файл заменяется после записи.
+    """
+    upcast = path.with_name(f"{path.name}.upcast")
+    try:
+        with open(path, "rb") as src, open(upcast, "wb") as dst:
+            while block := src.read(UPCAST_BLOCK * dtype.itemsize):
+                np.frombuffer(block, dtype=dtype).astype(promoted).tofile(dst)
+        upcast.replace(path)
+    finally:
+        upcast.unlink(missing_ok=True)
+
+
+def _pad(file) -> int:
+    """
+    Дописывает нули до границы ALIGNMENT и возвращает текущее смещение.
+    """
+    offset = file.tell()
+    padding = -offset % ALIGNMENT
+    if padding:
+        file.write(b"\0" * padding)
+    return offset + padding
+
+
+class FeatureStoreWriter:
+    """
+    Записывает хранилище признаков по частям строк.
+
+    path — путь к файлу.
+    feature_names — названия столбцов матрицы признаков.
+    compression — None или "zlib".
+    chunk_rows — строк в части сжатого файла.
+    Несжатые столбцы копятся во временных файлах и склеиваются при close (как NpyAppender).
+    Часть более широкого типа (float64 после float32) переводит в него уже записанные
+    строки (см. promote_dtype), поэтому тип хранилища совпадает с записью одной частью.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        feature_names: list[str],
+        target_name: str = "salary",
+        compression: Optional[str] = None,
+        chunk_rows: int = CHUNK_ROWS,
+        fingerprint: str = "",
+    ) -> None:
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                f"Неизвестный способ сжатия: {compression}. Допустимые: none, zlib."
+            )
+        self._path = Path(path)
+        self._partial = self._path.with_name(f"{self._path.name}.part")
+        self.feature_names = list(feature_names)
+        self._target_name = target_name
+        self._compression = compression
+        self._chunk_rows = chunk_rows
+        self.fingerprint = fingerprint
+        self._dtype = None
+        self._target_dtype = None
+        self._rows = 0
+        self._chunks: list[dict] = []
+        self._pending: list[tuple[np.ndarray, np.ndarray]] = []
+        self._pending_rows = 0
+        self._spools: list[Path] = []
+        self._spool_files = []
+        self._file = open(self._partial, "wb")
+
+    def append(self, x: np.ndarray, y: np.ndarray) -> None:
+        """
+        Дописывает строки матрицы признаков x и целевые значения y.
+
+        Генерирует исключение при несовместимой форме или типе части (см. promote_dtype).
+        """
+        if x.ndim != 2 or x.shape[1] != len(self.feature_names) or len(y) != len(x):
+            raise ValueError(
+                f"Форма части {x.shape} (целевых значений {len(y)}) не совпадает "
+                f"с {len(self.feature_names)} признаками хранилища {self._path.name}."
+            )
+        if self._dtype is None:
+            self._dtype, self._target_dtype = x.dtype, y.dtype
+            if self._compression is None:
+                self._spools = [
+                    self._path.with_name(f"{self._path.name}.{i}.part")
+                    for i in range(x.shape[1] + 1)
+                ]
+                self._spool_files = [open(spool, "wb") for spool in self._spools]
+        dtype = promote_dtype(self._dtype, x.dtype, self._path.name)
+        target_dtype = promote_dtype(self._target_dtype, y.dtype, self._path.name)
+        if (dtype, target_dtype) != (self._dtype, self._target_dtype):
+            self._upcast(dtype, target_dtype)
+        x = x.astype(self._dtype, copy=False)
+        y = y.astype(self._target_dtype, copy=False)
+        self._rows += len(x)
+        if self._compression is None:
+            for j, file in enumerate(self._spool_files[:-1]):
+                np.ascontiguousarray(x[:, j]).tofile(file)
+            np.ascontiguousarray(y).tofile(self._spool_files[-1])
+            return
+        self._pending.append((x, y))
+        self._pending_rows += len(x)
+        while self._pending_rows >= self._chunk_rows:
+            self._write_chunk(self._chunk_rows)
+
+    def _upcast(self, dtype: np.dtype, target_dtype: np.dtype) -> None:
+        """
+        Переводит уже записанные строки в типы dtype и target_dtype.
+        """
+        if self._compression is None:
+            dtypes = [(self._dtype, dtype)] * (len(self._spools) - 1) + [(self._target_dtype, target_dtype)]
+            for j, (spool, (old, new)) in enumerate(zip(self._spools, dtypes)):
+                self._spool_files[j].close()
+                if new != old:
+                    upcast_file(spool, old, new)
+                self._spool_files[j] = open(spool, "ab")
+        else:
+            self._pending = [(x.astype(dtype), y.astype(target_dtype)) for x, y in self._pending]
+            if self._chunks:
+                self._recompress(dtype, target_dtype)
+        self._dtype, self._target_dtype = dtype, target_dtype
+
+    def _recompress(self, dtype: np.dtype, target_dtype: np.dtype) -> None:
+        """
+        Переписывает сжатые части в новый файл с типами dtype и target_dtype.
+        """
+        self._file.close()
+        upcast = self._partial.with_name(f"{self._partial.name}.upcast")
+        self._file = open(upcast, "wb")
+        chunks = []
+        try:
+            with open(self._partial, "rb") as src:
+                for chunk in self._chunks:
+                    chunks.append({
+                        "rows": chunk["rows"],
+                        "features": [
+                            self._recode(src, segment, self._dtype, dtype)
+                            for segment in chunk["features"]
+                        ],
+                        "target": self._recode(src, chunk["target"], self._target_dtype, target_dtype),
+                    })
+            # Открытый файл остаётся тем же после переименования: запись продолжается в него.
+            upcast.replace(self._partial)
+        finally:
+            upcast.unlink(missing_ok=True)
+        self._chunks = chunks
+
+    def _recode(self, src, segment: list[int], old: np.dtype, new: np.dtype) -> list[int]:
+        """
+        Читает сжатый столбец segment (смещение, размер) из src и записывает его с типом new.
+        """
+        src.seek(segment[0])
+        column = np.frombuffer(zlib.decompress(src.read(segment[1])), dtype=old)
+        return self._write_compressed(column.astype(new))
+
+    def _take_pending(self, rows: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Забирает первые rows строк из накопленных частей.
+        """
+        xs, ys, taken = [], [], 0
+        while taken < rows:
+            x, y = self._pending[0]
+            need = rows - taken
+            if len(x) <= need:
+                self._pending.pop(0)
+            else:
+                self._pending[0] = (x[need:], y[need:])
+                x, y = x[:need], y[:need]
+            xs.append(x)
+            ys.append(y)
+            taken += len(x)
+        self._pending_rows -= rows
+        return np.concatenate(xs), np.concatenate(ys)
+
+    def _write_chunk(self, rows: int) -> None:
+        """
+        Сжимает и записывает часть из rows накопленных строк.
+        """
+        x, y = self._take_pending(rows)
+        features = []
+        for j in range(x.shape[1]):
+            features.append(self._write_compressed(np.ascontiguousarray(x[:, j])))
+        target = self._write_compressed(np.ascontiguousarray(y))
+        self._chunks.append({"rows": rows, "features": features, "target": target})
+
+    def _write_compressed(self, column: np.ndarray) -> list[int]:
+        offset = _pad(self._file)
+        data = zlib.compress(column.tobytes(), 1)
+        self._file.write(data)
+        return [offset, len(data)]
+
+    def _write_spools(self) -> None:
+        """
+        Записывает несжатые столбцы одной частью с одинаковым шагом.
+        """
+        for file in self._spool_files:
+            file.close()
+        stride = -(self._rows * self._dtype.itemsize) % ALIGNMENT + self._rows * self._dtype.itemsize
+        base = _pad(self._file)
+        features = []
+        for j, spool in enumerate(self._spools[:-1]):
+            self._file.seek(base + j * stride)
+            with open(spool, "rb") as src:
+                shutil.copyfileobj(src, self._file, 1 << 20)
+            features.append([base + j * stride, self._rows * self._dtype.itemsize])
+        self._file.seek(base + len(features) * stride)
+        offset = _pad(self._file)
+        with open(self._spools[-1], "rb") as src:
+            shutil.copyfileobj(src, self._file, 1 << 20)
+        target = [offset, self._rows * self._target_dtype.itemsize]
+        self._chunks.append({"rows": self._rows, "features": features, "target": target})
+
+    def close(self) -> None:
+        """
+        Дописывает оставшиеся строки и заголовок, затем переименовывает файл в path.
+
+        Генерирует исключение, если не было записано ни одной части.
+        """
+        if self._dtype is None:
+            raise ValueError(f"Нет данных для записи в {self._path.name}.")
+        if self._compression is None:
+            self._write_spools()
+        elif self._pending_rows:
+            self._write_chunk(self._pending_rows)
+        header = {
+            "version": VERSION,
+            "rows": self._rows,
+            "features": self.feature_names,
+            "dtypes": [np.lib.format.dtype_to_descr(self._dtype)] * len(self.feature_names),
+            "target": self._target_name,
+            "target_dtype": np.lib.format.dtype_to_descr(self._target_dtype),
+            "fingerprint": self.fingerprint,
+            "compression": self._compression,
+            "chunks": self._chunks,
+        }
+        self._file.seek(0, 2)
+        data = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        self._file.write(data)
+        self._file.write(_TAIL.pack(len(data), MAGIC))
+        self._file.close()
+        self._partial.replace(self._path)
+        self.discard()
+
+    def discard(self) -> None:
+        """
+        Удаляет временные файлы без записи результата.
+        """
+        for file in self._spool_files:
+            file.close()
+        for spool in self._spools:
+            spool.unlink(missing_ok=True)
+        self._spool_files, self._spools = [], []
+        if not self._file.closed:
+            self._file.close()
+        self._partial.unlink(missing_ok=True)
+
+
+class FeatureStore:
+    """
+    Читает хранилище признаков через отображение файла в память.
+
+    Поддерживает форму и срезы строк как массив (X.shape, X[start:stop]), поэтому
+    может передаваться вместо матрицы признаков в пакетное предсказание.
+    Генерирует исключение при повреждённом или несовместимом файле.
+    """
+
+    ndim = 2
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as file:
+            try:
+                self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as exc:
+                raise ValueError(f"Файл хранилища признаков пуст: {self.path}") from exc
+        try:
+            header = self._read_header()
+        except Exception:
+            self._mmap.close()
+            raise
+        self.feature_names: list[str] = header["features"]
+        self.dtype = np.dtype(header["dtypes"][0]) if header["dtypes"] else np.dtype(np.float32)
+        self.target_name: str = header["target"]
+        self.target_dtype = np.dtype(header["target_dtype"])
+        self.n_rows: int = header["rows"]
+        self.fingerprint: str = header["fingerprint"]
+        self.compression: Optional[str] = header["compression"]
+        self._chunks = header["chunks"]
+        self._starts = np.cumsum([0] + [chunk["rows"] for chunk in self._chunks])
+        self._decoded: tuple[int, dict] = (-1, {})
+
+    def _read_header(self) -> dict:
+        size = len(self._mmap)
+        if size < _TAIL.size:
+            raise ValueError(f"Файл не является хранилищем признаков: {self.path}")
+        length, magic = _TAIL.unpack(self._mmap[size - _TAIL.size:])
+        if magic != MAGIC or length > size - _TAIL.size:
+            raise ValueError(f"Файл не является хранилищем признаков: {self.path}")
+        data_end = size - _TAIL.size - length
+        try:
+            header = json.loads(self._mmap[data_end:size - _TAIL.size])
+        except ValueError as exc:
+            raise ValueError(f"Заголовок хранилища признаков повреждён: {self.path}") from exc
+        if not isinstance(header, dict):
+            raise ValueError(f"Заголовок хранилища признаков повреждён: {self.path}")
+        if header.get("version") != VERSION:
+            raise ValueError(
+                f"Неподдерживаемая версия хранилища признаков {header.get('version')}: {self.path}"
+            )
+        self._check_layout(header, data_end)
+        return header
+
+    def _check_layout(self, header: dict, data_end: int) -> None:
+        """
+        Проверяет, что части покрывают все строки, а столбцы лежат в пределах данных
+        файла до заголовка: иначе файл обрезан или повреждён.
+        """
+        try:
+            dtype = np.dtype(header["dtypes"][0]) if header["dtypes"] else np.dtype(np.float32)
+            target_dtype = np.dtype(header["target_dtype"])
+            rows = sum(chunk["rows"] for chunk in header["chunks"])
+            # Смещение, размер и ожидаемый размер без сжатия для каждого столбца части.
+            segments = [
+                (int(offset), int(nbytes), chunk["rows"] * column_dtype.itemsize)
+                for chunk in header["chunks"]
+                if len(chunk["features"]) == len(header["features"])
+                for (offset, nbytes), column_dtype in (
+                    [(segment, dtype) for segment in chunk["features"]]
+                    + [(chunk["target"], target_dtype)]
+                )
+            ]
+            columns = (len(header["features"]) + 1) * len(header["chunks"])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError(f"Заголовок хранилища признаков повреждён: {self.path}") from exc
+        if rows != header["rows"] or len(segments) != columns or any(
+            offset < 0
+            or offset + nbytes > data_end
+            or (header["compression"] is None and nbytes != expected)
+            for offset, nbytes, expected in segments
+        ):
+            raise ValueError(f"Файл хранилища признаков обрезан или повреждён: {self.path}")
+
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.n_rows, len(self.feature_names)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def _column_indices(self, columns: Columns) -> Optional[list[int]]:
+        if columns is None:
+            return None
+        indices = []
+        for column in columns:
+            if isinstance(column, str):
+                try:
+                    column = self.feature_names.index(column)
+                except ValueError as exc:
+                    raise KeyError(f"Признак не найден в хранилище: {column}") from exc
+            indices.append(int(column))
+        return indices
+
+    def _chunk_matrix(self, i: int) -> Optional[np.ndarray]:
+        """
+        Представление несжатой части как матрицы без копирования (None, если шаг неравный).
+        """
+        chunk = self._chunks[i]
+        offsets = [offset for offset, _ in chunk["features"]]
+        if not offsets:
+            return np.empty((chunk["rows"], 0), dtype=self.dtype)
+        stride = offsets[1] - offsets[0] if len(offsets) > 1 else self.dtype.itemsize * chunk["rows"]
+        if any(b - a != stride for a, b in zip(offsets, offsets[1:])):
+            return None
+        return np.ndarray(
+            (chunk["rows"], len(offsets)),
+            dtype=self.dtype,
+            buffer=self._mmap,
+            offset=offsets[0],
+            strides=(self.dtype.itemsize, stride),
+        )
+
+    def _column(self, i: int, location: list[int], dtype: np.dtype, key) -> np.ndarray:
+        """
+        Столбец части: представление файла без сжатия или распакованные данные.
+        """
+        offset, nbytes = location
+        if self.compression is None:
+            return np.frombuffer(self._mmap, dtype=dtype, count=nbytes // dtype.itemsize, offset=offset)
+        index, decoded = self._decoded
+        if index != i:
+            decoded = {}
+            self._decoded = (i, decoded)
+        if key not in decoded:
+            try:
+                data = zlib.decompress(self._mmap[offset:offset + nbytes])
+            except zlib.error as exc:
+                raise ValueError(f"Сжатый столбец хранилища признаков повреждён: {self.path}") from exc
+            rows = self._chunks[i]["rows"]
+            if len(data) != rows * dtype.itemsize:
+                raise ValueError(f"Сжатый столбец хранилища признаков повреждён: {self.path}")
+            decoded[key] = np.frombuffer(data, dtype=dtype)
+        return decoded[key]
+
+    def _chunk_part(self, i: int, start: int, stop: int, indices: Optional[list[int]]) -> np.ndarray:
+        """
+        Строки [start, stop) части i (номера внутри части) по выбранным столбцам.
+        """
+        if self.compression is None:
+            matrix = self._chunk_matrix(i)
+            if matrix is not None:
+                rows = matrix[start:stop]
+                if indices is None:
+                    return rows
+                if indices and indices == list(range(indices[0], indices[-1] + 1)):
+                    return rows[:, indices[0]:indices[-1] + 1]
+                return rows[:, indices]
+        chosen = range(self.n_features) if indices is None else indices
+        columns = [
+            self._column(i, self._chunks[i]["features"][j], self.dtype, j)[start:stop]
+            for j in chosen
+        ]
+        if not columns:
+            return np.empty((stop - start, 0), dtype=self.dtype)
+        return np.stack(columns, axis=1)
+
+    def _row_range(self, start: int, stop: Optional[int]) -> tuple[int, int]:
+        stop = self.n_rows if stop is None else stop
+        start, stop, _ = slice(start, stop).indices(self.n_rows)
+        return start, max(start, stop)
+
+    def read(self, start: int = 0, stop: Optional[int] = None, columns: Columns = None) -> np.ndarray:
+        """
+        Возвращает строки [start, stop) матрицы признаков по столбцам columns
+        (названия или номера; по умолчанию все).
+
+        Без сжатия диапазон строк и подряд идущие столбцы возвращаются представлением
+        файла без копирования; иначе нужные части распаковываются.
+        """
+        start, stop = self._row_range(start, stop)
+        indices = self._column_indices(columns)
+        first = int(np.searchsorted(self._starts, start, side="right")) - 1
+        parts = []
+        for i in range(max(first, 0), len(self._chunks)):
+            chunk_start = int(self._starts[i])
+            if chunk_start >= stop:
+                break
+            lo = max(start, chunk_start) - chunk_start
+            hi = min(stop, int(self._starts[i + 1])) - chunk_start
+            parts.append(self._chunk_part(i, lo, hi, indices))
+        if len(parts) == 1:
+            return parts[0]
+        width = self.n_features if indices is None else len(indices)
+        if not parts:
+            return np.empty((0, width), dtype=self.dtype)
+        return np.concatenate(parts)
+
+    def read_target(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Возвращает целевые значения строк [start, stop).
+        """
+        start, stop = self._row_range(start, stop)
+        parts = []
+        for i, chunk in enumerate(self._chunks):
+            chunk_start, chunk_stop = int(self._starts[i]), int(self._starts[i + 1])
+            if chunk_stop <= start or chunk_start >= stop:
+                continue
+            column = self._column(i, chunk["target"], self.target_dtype, "target")
+            parts.append(column[max(start, chunk_start) - chunk_start:min(stop, chunk_stop) - chunk_start])
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return np.empty(0, dtype=self.target_dtype)
+        return np.concatenate(parts)
+
+    def __getitem__(self, key) -> np.ndarray:
+        """
+        Срез строк X[start:stop] или строк и столбцов X[start:stop, columns].
+        """
+        rows, columns = key if isinstance(key, tuple) else (key, None)
+        if not isinstance(rows, slice) or rows.step not in (None, 1):
+            raise TypeError("Хранилище признаков поддерживает только непрерывные срезы строк.")
+        if isinstance(columns, slice):
+            columns = range(self.n_features)[columns]
+        return self.read(rows.start or 0, rows.stop, columns)
+
+    def release_pages(self) -> None:
+        """
+        Исключает прочитанные страницы файла из памяти процесса (остаются в кеше ФС).
+        """
+        if hasattr(mmap, "MADV_DONTNEED"):
+            self._mmap.madvise(mmap.MADV_DONTNEED)
+
+    def close(self) -> None:
+        """
+        Закрывает отображение файла; полученные ранее представления становятся недействительны.
+        """
+        self._decoded = (-1, {})
+        self._mmap.close()
+
+    def __enter__(self) -> FeatureStore:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
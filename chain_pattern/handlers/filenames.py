@@ -0,0 +1,11 @@
+"""
+Имена файлов результата пайплайна.
+
+Модуль без зависимостей: его импортируют regression.predict и regression.train,
+не загружая pandas и scipy вместе с обработчиками.
+"""
+
+# Хранилище признаков (см. feature_store).
+FEATURES_FILENAME = "features.hfs"
+# Разреженная матрица признаков (столбцы, кодируемые в корзины) в формате scipy.sparse.save_npz.
+SPARSE_X_FILENAME = "x_data.npz"
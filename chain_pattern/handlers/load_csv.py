@@ -1,18 +1,69 @@
 """
 Обработчик загрузки данных из CSV-файла.
 """
+from contextlib import nullcontext
+from typing import Iterable, Iterator, Optional
 import pandas as pd
 from .base import Handler
+from .csv_range import open_csv_range
+
+# Число первых строк файла, по которым определяются текстовые столбцы в режиме lean.
+SAMPLE_ROWS = 1000
 
 
 class LoadCSVHandler(Handler):
     """
     Загружает данные из CSV-файла по указанному пути.
+
+    При заданном chunksize в потоковом режиме (handle_chunks) читает файл
+    частями по chunksize строк. При заданном byte_range — (конец заголовка,
+    начало, конец) из split_csv — читает только этот диапазон записей файла.
+    В режиме lean текстовые столбцы читаются категориальными: каждое значение
+    хранится один раз, строки — кодами.
     """
 
-    def __init__(self, path: str) -> None:
+    def __init__(
+        self,
+        path: str,
+        chunksize: Optional[int] = None,
+        byte_range: Optional[tuple[int, int, int]] = None,
+        lean: bool = False,
+    ) -> None:
         super().__init__()
         self._path = path
+        self._chunksize = chunksize
+        self._byte_range = byte_range
+        self._lean = lean
+
+    def _dtypes(self) -> Optional[dict[str, str]]:
+        """
+        Типы столбцов для чтения: в режиме lean — category для текстовых столбцов.
+
+        Текстовые столбцы определяются по первым SAMPLE_ROWS строкам файла; столбцы,
+        числовые в начале файла, читаются с обычным выводом типа.
+        """
+        if not self._lean:
+            return None
+        sample = pd.read_csv(self._path, nrows=SAMPLE_ROWS)
+        return {
+            col: "category"
+            for col, dtype in sample.dtypes.items()
+            if not pd.api.types.is_numeric_dtype(dtype)
+        }
+
+    def _source(self):
+        """
+        Возвращает контекст с путём к файлу или потоком диапазона байтов.
+        """
+        if self._byte_range is None:
+            return nullcontext(self._path)
+        return open_csv_range(self._path, *self._byte_range)
+
+    def cache_params(self) -> dict:
+        """
+        Диапазон байтов файла; сам файл учитывается в ключе кэша своим хешем.
+        """
+        return {"byte_range": self._byte_range, "lean": self._lean}
 
     def process(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -21,4 +72,22 @@ class LoadCSVHandler(Handler):
         df — игнорируется (входной датафрейм пустой при первом вызове).
         Возвращает загруженный датафрейм.
         """
-        return pd.read_csv(self._path)
+        dtypes = self._dtypes()
+        with self._source() as source:
+            return pd.read_csv(source, dtype=dtypes)
+
+    def process_chunks(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        Читает CSV-файл по частям.
+
+        chunks — игнорируется (источник данных — сам файл).
+        Возвращает итератор частей; без chunksize — одну часть со всем файлом.
+        """
+        if self._chunksize is None:
+            yield self.process(pd.DataFrame())
+            return
+        dtypes = self._dtypes()
+        with self._source() as source, pd.read_csv(
+            source, chunksize=self._chunksize, dtype=dtypes
+        ) as reader:
+            yield from reader
@@ -1,7 +1,16 @@
 """
 Обработчик парсинга города из столбца «город».
 """
+import pandas as pd
 from .base import Handler
+from .strings import map_unique
+
+
+def _parse_city(values: pd.Series) -> pd.Series:
+    """
+    Оставляет значение до первой запятой без пробелов по краям.
+    """
+    return values.str.partition(",")[0].str.strip()
 
 
 class ParseCityHandler(Handler):
@@ -9,6 +18,10 @@ class ParseCityHandler(Handler):
     Извлекает основной город из столбца «город» (первое значение до запятой).
     """
 
+    reads = ("город",)
+    writes = ("city",)
+    drops = ("город",)
+
     def process(self, df):
         """
         Берёт первый город из списка и сохраняет в столбец city.
@@ -16,6 +29,6 @@ class ParseCityHandler(Handler):
         df — входной датафрейм с столбцом «город».
         Возвращает датафрейм с новым столбцом city, удаляет столбец «город».
         """
-        df["city"] = df["город"].apply(lambda x: x.split(",")[0].strip())
+        df["city"] = map_unique(df["город"], _parse_city)
         df.drop(columns=["город"], inplace=True)
         return df
@@ -1,33 +1,67 @@
 """
 Обработчик парсинга пола и возраста из столбца «пол_возраст».
 """
-import re
+import pandas as pd
 from .base import Handler
+from .strings import map_unique
 
 COLUMN_GENDER_AGE = "пол_возраст"
 
 
+def _parse_gender_age(values: pd.Series) -> pd.DataFrame:
+    """
+    Извлекает пол и возраст из текстовых значений.
+    """
+    return pd.DataFrame({
+        "gender": values.str.contains("муж", case=False, regex=False).astype("int64"),
+        "age": values.str.extract(r"(\d+)\s*года", expand=False).fillna("-1").astype("int64"),
+    })
+
+
+def _parse_gender_age_lean(values: pd.Series) -> pd.DataFrame:
+    """
+    _parse_gender_age с наименьшими целыми типами, вмещающими значения.
+    """
+    return _parse_gender_age(values).apply(pd.to_numeric, downcast="integer")
+
+
 class ParseGenderAgeHandler(Handler):
     """
     Извлекает пол (gender) и возраст (age) из столбца «пол_возраст», удаляет исходный столбец.
+
+    В режиме lean пол и возраст хранятся наименьшими целыми типами (обычно int8).
     """
 
+    reads = (COLUMN_GENDER_AGE,)
+    writes = ("gender", "age")
+    drops = (COLUMN_GENDER_AGE,)
+
+    def __init__(self, lean: bool = False) -> None:
+        super().__init__()
+        self._lean = lean
+
+    def cache_params(self) -> dict:
+        """
+        Режим lean меняет типы столбцов.
+        """
+        return {"lean": self._lean}
+
     def process(self, df):
         """
         Парсит пол (1 — мужской, 0 — женский) и возраст из текста.
 
+        Столбец просматривается один раз; пол и возраст извлекаются
+        векторизованно по его различным значениям. Возраст без совпадения равен -1.
+
         df — входной датафрейм с столбцом «пол_возраст».
         Возвращает датафрейм с новыми столбцами gender и age.
         """
-        def parse_gender(value: str) -> int:
-            return 1 if "муж" in value.lower() else 0
-
-        def parse_age(value: str) -> int:
-            match = re.search(r"(\d+)\s*года", value)
-            return int(match.group(1)) if match else -1
-
-        df["gender"] = df[COLUMN_GENDER_AGE].apply(parse_gender)
-        df["age"] = df[COLUMN_GENDER_AGE].apply(parse_age)
+        parsed = map_unique(
+            df[COLUMN_GENDER_AGE],
+            _parse_gender_age_lean if self._lean else _parse_gender_age,
+        )
+        df["gender"] = parsed["gender"]
+        df["age"] = parsed["age"]
 
         df.drop(columns=[COLUMN_GENDER_AGE], inplace=True)
         return df
@@ -1,9 +1,17 @@
 """
 Обработчик парсинга зарплаты из столбца «зп».
 """
-import re
-import numpy as np
+import pandas as pd
 from .base import Handler
+from .strings import map_unique
+
+
+def _parse_salary(values: pd.Series) -> pd.Series:
+    """
+    Удаляет нецифровые символы и приводит к целому; строка без цифр даёт 0.
+    """
+    digits = values.str.replace(r"\D", "", regex=True)
+    return digits.where(digits != "", "0").astype("int64")
 
 
 class ParseSalaryHandler(Handler):
@@ -11,6 +19,9 @@ class ParseSalaryHandler(Handler):
     Извлекает числовое значение зарплаты из текстового столбца «зп».
     """
 
+    reads = ("зп",)
+    writes = ("salary",)
+
     def process(self, df):
         """
         Извлекает цифры из строки зарплаты и сохраняет в столбец salary.
@@ -18,9 +29,5 @@ class ParseSalaryHandler(Handler):
         df — входной датафрейм с столбцом «зп».
         Возвращает датафрейм с новым столбцом salary.
         """
-        def parse_salary(value: str) -> int:
-            digits = re.sub(r"[^\d]", "", value)
-            return int(digits) if digits else 0
-
-        df["salary"] = df["зп"].apply(parse_salary)
-        return df
\ No newline at end of file
+        df["salary"] = map_unique(df["зп"], _parse_salary)
+        return df
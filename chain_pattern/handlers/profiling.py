@@ -0,0 +1,308 @@
+"""
+Профилирование стадий обработки: время, строки, память.
+
+Профилировщик включается через enable и собирает по каждой стадии (обработчику
+цепочки или функции regression) время работы, процессорное время, строки на входе
+и выходе, память данных на входе и выходе и пиковый объём выделенной памяти
+(tracemalloc). Время вложенных стадий не входит во время внешней, поэтому
+в потоковом режиме время каждого обработчика учитывается отдельно.
+Когда профилировщик выключен, обработчики выполняют одну проверку active_profiler.
+"""
+from __future__ import annotations
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+_active: Optional[Profiler] = None
+
+
+@dataclass
+class StageStats:
+    """
+    Накопленные показатели одной стадии.
+    """
+
+    name: str
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+    memory_in_bytes: int = 0
+    memory_out_bytes: int = 0
+    peak_alloc_bytes: int = 0
+
+
+# Тип метрики Prometheus и описание для полей StageStats.
+_METRICS = {
+    "calls": ("counter", "Число вызовов стадии."),
+    "wall_seconds": ("counter", "Время работы стадии без вложенных стадий, с."),
+    "cpu_seconds": ("counter", "Процессорное время стадии без вложенных стадий, с."),
+    "rows_in": ("counter", "Строк на входе стадии."),
+    "rows_out": ("counter", "Строк на выходе стадии."),
+    "memory_in_bytes": ("counter", "Память данных на входе стадии, байт."),
+    "memory_out_bytes": ("counter", "Память данных на выходе стадии, байт."),
+    "peak_alloc_bytes": ("gauge", "Пиковый объём памяти, выделенной за вызов стадии, байт."),
+}
+
+
+def _rows(data) -> int:
+    """
+    Число строк датафрейма или массива (0 для прочих объектов).
+    """
+    shape = getattr(data, "shape", None)
+    if shape:
+        return int(shape[0])
+    return 0
+
+
+def _memory(data) -> int:
+    """
+    Объём памяти датафрейма (с содержимым строк) или массива (0 для прочих объектов).
+    """
+    if hasattr(data, "memory_usage"):
+        return int(data.memory_usage(deep=True).sum())
+    return int(getattr(data, "nbytes", 0))
+
+
+class _Frame:
+    __slots__ = ("child_wall", "child_cpu", "start", "peak")
+
+    def __init__(self, start: int) -> None:
+        self.child_wall = 0.0
+        self.child_cpu = 0.0
+        # Выделенная память в начале текущего отрезка между вложенными стадиями
+        # и наибольший прирост памяти над ней.
+        self.start = start
+        self.peak = 0
+
+
+class _Output:
+    """
+    Принимает выход стадии внутри Profiler.measure.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self) -> None:
+        self.data = None
+
+    def output(self, data) -> None:
+        self.data = data
+
+
+class Profiler:
+    """
+    Сборщик показателей стадий.
+
+    trace_memory — отслеживать пиковое выделение памяти через tracemalloc
+    (замедляет выполнение; без него peak_alloc_bytes равен 0).
+    """
+
+    def __init__(self, trace_memory: bool = True) -> None:
+        self.stages: dict[str, StageStats] = {}
+        self._trace_memory = trace_memory
+        self._owns_tracing = False
+        self._stack: list[_Frame] = []
+
+    def start(self) -> None:
+        """
+        Запускает tracemalloc, если он нужен и ещё не запущен.
+        """
+        if self._trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+
+    def stop(self) -> None:
+        """
+        Останавливает tracemalloc, если его запустил этот профилировщик.
+        """
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    def _stats(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+        return stats
+
+    @contextmanager
+    def _frame(self, stats: Optional[StageStats]) -> Iterator[None]:
+        """
+        Измеряет участок выполнения; stats=None — служебный участок, время которого
+        не учитывается ни в одной стадии.
+
+        Пик памяти стадии — наибольший прирост выделенной памяти за отрезки
+        её выполнения между вложенными стадиями.
+        """
+        tracing = tracemalloc.is_tracing()
+        parent = self._stack[-1] if self._stack else None
+        current = 0
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent.peak = max(parent.peak, peak - parent.start)
+            tracemalloc.reset_peak()
+        frame = _Frame(current)
+        self._stack.append(frame)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self._stack.pop()
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                frame.peak = max(frame.peak, peak - frame.start)
+                tracemalloc.reset_peak()
+            if parent is not None:
+                parent.child_wall += wall
+                parent.child_cpu += cpu
+                parent.start = current
+            if stats is not None:
+                stats.wall_seconds += wall - frame.child_wall
+                stats.cpu_seconds += cpu - frame.child_cpu
+                stats.peak_alloc_bytes = max(stats.peak_alloc_bytes, frame.peak)
+
+    @contextmanager
+    def measure(self, name: str, data=None) -> Iterator[_Output]:
+        """
+        Измеряет вызов стадии name над данными data.
+
+        Выход стадии передаётся через output возвращаемого объекта.
+        """
+        stats = self._stats(name)
+        result = _Output()
+        with self._frame(None):
+            stats.calls += 1
+            stats.rows_in += _rows(data)
+            stats.memory_in_bytes += _memory(data)
+        with self._frame(stats):
+            yield result
+        with self._frame(None):
+            stats.rows_out += _rows(result.data)
+            stats.memory_out_bytes += _memory(result.data)
+
+    def feed(self, name: str, items: Iterable) -> Iterator:
+        """
+        Учитывает части, поступающие на вход потоковой стадии name.
+        """
+        return self._feed(self._stats(name), items)
+
+    def _feed(self, stats: StageStats, items: Iterable) -> Iterator:
+        for item in items:
+            with self._frame(None):
+                stats.rows_in += _rows(item)
+                stats.memory_in_bytes += _memory(item)
+            yield item
+
+    def iterate(self, name: str, items: Iterable) -> Iterator:
+        """
+        Измеряет получение каждой части с выхода потоковой стадии name.
+        """
+        return self._iterate(self._stats(name), iter(items))
+
+    def _iterate(self, stats: StageStats, iterator: Iterator) -> Iterator:
+        while True:
+            with self._frame(stats):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            with self._frame(None):
+                stats.calls += 1
+                stats.rows_out += _rows(item)
+                stats.memory_out_bytes += _memory(item)
+            yield item
+
+    def report(self) -> dict:
+        """
+        Возвращает отчёт: показатели стадий в порядке первого вызова.
+        """
+        return {"stages": [asdict(stats) for stats in self.stages.values()]}
+
+    def to_prometheus(self, prefix: str) -> str:
+        """
+        Возвращает показатели в текстовом формате Prometheus.
+
+        prefix — префикс имён метрик (например, "chain_stage").
+        """
+        lines = []
+        for field in fields(StageStats):
+            if field.name == "name":
+                continue
+            kind, description = _METRICS[field.name]
+            metric = f"{prefix}_{field.name}"
+            if kind == "counter":
+                metric += "_total"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for stats in self.stages.values():
+                label = stats.name.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                lines.append(f'{metric}{{stage="{label}"}} {getattr(stats, field.name)}')
+        return "\n".join(lines) + "\n"
+
+    def save(self, path: Path, prefix: str) -> None:
+        """
+        Сохраняет отчёт в JSON (path) и в формате Prometheus (path с суффиксом .prom).
+
+        Генерирует исключение при сбое записи.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), ensure_ascii=False, indent=2), encoding="utf-8")
+        path.with_suffix(".prom").write_text(self.to_prometheus(prefix), encoding="utf-8")
+
+
+def active_profiler() -> Optional[Profiler]:
+    """
+    Возвращает включённый профилировщик или None.
+    """
+    return _active
+
+
+def enable(trace_memory: bool = True) -> Profiler:
+    """
+    Включает профилирование и возвращает новый профилировщик.
+    """
+    global _active
+    disable()
+    _active = Profiler(trace_memory)
+    _active.start()
+    return _active
+
+
+def disable() -> None:
+    """
+    Выключает профилирование.
+    """
+    global _active
+    if _active is not None:
+        _active.stop()
+        _active = None
+
+
+def profiled(name: str) -> Callable[[Callable], Callable]:
+    """
+    Декоратор: измеряет вызовы функции как стадию name, когда профилирование включено.
+
+    Входом стадии считается первый позиционный аргумент, выходом — результат.
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _active
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.measure(name, args[0] if args else None) as stage:
+                result = func(*args, **kwargs)
+                stage.output(result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,55 @@
+"""
+Векторизованные преобразования текстовых столбцов.
+"""
+from typing import Callable, Union
+import numpy as np
+import pandas as pd
+
+
+def map_unique(
+    values: pd.Series,
+    transform: Callable[[pd.Series], Union[pd.Series, pd.DataFrame]],
+) -> Union[pd.Series, pd.DataFrame]:
+    """
+    Применяет столбцовое преобразование только к различным значениям столбца.
+
+    В выгрузках hh.ru текстовые значения сильно повторяются, поэтому столбец
+    один раз кодируется хешированием (pd.factorize), transform выполняется над
+    уникальными значениями, а результат раскладывается обратно по строкам.
+
+    Категориальный столбец уже закодирован: transform выполняется над его
+    категориями, а текстовый результат тоже возвращается категориальным,
+    без строки на каждую запись.
+
+    values — исходный текстовый столбец.
+    transform — векторизованное преобразование Series уникальных значений.
+    Возвращает результат transform, выровненный по индексу values.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return _map_categories(values, transform)
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    result = transform(pd.Series(uniques, dtype=values.dtype))
+    return result.take(codes).set_axis(values.index)
+
+
+def _map_categories(
+    values: pd.Series,
+    transform: Callable[[pd.Series], Union[pd.Series, pd.DataFrame]],
+) -> Union[pd.Series, pd.DataFrame]:
+    """
+    map_unique для категориального столбца; пропуск, если он есть, преобразуется
+    как отдельное значение.
+    """
+    categories = values.cat.categories
+    codes = values.cat.codes.to_numpy()
+    missing = codes < 0
+    if missing.any():
+        categories = categories.append(pd.Index([np.nan], dtype=categories.dtype))
+        codes = np.where(missing, len(categories) - 1, codes)
+    result = transform(pd.Series(categories))
+    if isinstance(result, pd.Series) and not pd.api.types.is_numeric_dtype(result.dtype):
+        result_codes, result_uniques = pd.factorize(result)
+        return pd.Series(
+            pd.Categorical.from_codes(result_codes[codes], result_uniques), index=values.index
+        )
+    return result.take(codes).set_axis(values.index)
@@ -0,0 +1,227 @@
+"""
+Инкрементальная подготовка данных из дописываемого CSV-файла.
+
+После каждого запуска рядом с матрицами сохраняется контрольная точка
+(CHECKPOINT_FILENAME): смещение конца обработанных записей, число строк матриц,
+отпечаток файла (хеши начала файла и участка перед смещением), словари категорий
+и настройки запуска. Следующий запуск разбирает только записи после смещения
+и добавляет их строки к матрицам; коды категорий приводятся к общему
+отсортированному словарю (как в parallel.merge_shards), поэтому матрицы и словари
+совпадают с обработкой всего файла заново.
+
+Незавершённая последняя строка (файл в момент запуска дописывается) не обрабатывается
+и будет прочитана следующим запуском. Если файл усечён или заменён (ротация),
+матрицы не соответствуют контрольной точке, изменились настройки или новые строки
+несовместимы с матрицами, матрицы строятся заново по всему файлу.
+
+Дописывание не требует разбора прежних записей, но объединённые матрицы
+записываются заново (копированием блоков, см. parallel.merge_shards): в x_data.npy
+столбцы хранятся подряд, и строки в конец не добавить.
+"""
+import hashlib
+import json
+import tempfile
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from handlers.csv_range import complete_records_end, split_csv
+from handlers.encode_categorical import EncodeCategoricalHandler, save_vocabularies
+from handlers.feature_store import FEATURES_FILENAME, FeatureStore
+from cache import pipeline_fingerprint
+from parallel import _run_shard, merge_shards
+from pipeline import _parse_handlers
+
+CHECKPOINT_FILENAME = "checkpoint.json"
+CHECKPOINT_VERSION = 1
+# Байт начала файла и участка перед смещением, по хешам которых узнаётся тот же файл.
+ANCHOR_BYTES = 1 << 16
+
+
+def _digest(path: Path, start: int, stop: int) -> str:
+    """
+    SHA-256 диапазона байтов [start, stop) файла.
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        return hashlib.sha256(file.read(stop - start)).hexdigest()
+
+
+def file_anchors(path: Path, offset: int) -> dict[str, str]:
+    """
+    Отпечаток обработанной части файла: хеши первых и последних ANCHOR_BYTES байт до offset.
+
+    Дописывание в конец файла отпечаток не меняет; усечение, замена файла другим
+    или изменение записей рядом с началом или смещением — меняет.
+    """
+    return {
+        "head": _digest(path, 0, min(offset, ANCHOR_BYTES)),
+        "tail": _digest(path, max(0, offset - ANCHOR_BYTES), offset),
+    }
+
+
+def load_checkpoint(output_dir: Path) -> Optional[dict]:
+    """
+    Загружает контрольную точку из output_dir (None, если её нет или она повреждена).
+    """
+    try:
+        with open(output_dir / CHECKPOINT_FILENAME, encoding="utf-8") as file:
+            checkpoint = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(checkpoint, dict) or checkpoint.get("version") != CHECKPOINT_VERSION:
+        return None
+    return checkpoint
+
+
+def save_checkpoint(output_dir: Path, checkpoint: dict) -> None:
+    """
+    Сохраняет контрольную точку; файл заменяется целиком после записи.
+    """
+    path = output_dir / CHECKPOINT_FILENAME
+    partial = path.with_name(f"{path.name}.part")
+    with open(partial, "w", encoding="utf-8") as file:
+        json.dump(checkpoint, file, ensure_ascii=False)
+    partial.replace(path)
+
+
+def _matrix_rows(output_dir: Path, output_format: str) -> Optional[int]:
+    """
+    Число строк сохранённых матриц (None, если их нет, они повреждены или не согласованы).
+    """
+    try:
+        if output_format == "store":
+            with FeatureStore(output_dir / FEATURES_FILENAME) as store:
+                return store.n_rows
+        x = np.load(output_dir / "x_data.npy", mmap_mode="r")
+        y = np.load(output_dir / "y_data.npy", mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    return len(x) if len(x) == len(y) else None
+
+
+def _resume_problem(
+    csv_path: Path,
+    output_dir: Path,
+    checkpoint: Optional[dict],
+    settings: dict,
+    vocabularies: Optional[dict[str, list[str]]],
+) -> Optional[str]:
+    """
+    Причина, по которой нельзя продолжить с контрольной точки (None, если можно).
+    """
+    if checkpoint is None:
+        return "нет контрольной точки"
+    if checkpoint["settings"] != settings:
+        return "изменились настройки запуска"
+    if vocabularies is not None and checkpoint["vocabularies"] != vocabularies:
+        return "изменились словари категорий"
+    offset = checkpoint["offset"]
+    if csv_path.stat().st_size < offset:
+        return "файл усечён или заменён"
+    if file_anchors(csv_path, offset) != checkpoint["anchors"]:
+        return "файл изменён или заменён"
+    if _matrix_rows(output_dir, settings["output_format"]) != checkpoint["rows"]:
+        return "матрицы не соответствуют контрольной точке"
+    return None
+
+
+def _ingest(
+    csv_path: str,
+    byte_range: tuple[int, int, int],
+    base: Optional[dict],
+    chunksize: Optional[int],
+    vocabularies: Optional[dict[str, list[str]]],
+    lean: bool,
+    output_format: str,
+    compression: Optional[str],
+) -> tuple[int, list[str], dict[str, list[str]]]:
+    """
+    Разбирает диапазон записей файла и записывает матрицы в папку файла: строки
+    диапазона добавляются к матрицам контрольной точки base или (base=None) заменяют их.
+
+    Возвращает число строк диапазона, названия признаков и общие словари.
+    Генерирует исключение, если строки диапазона несовместимы с матрицами base;
+    сохранённые матрицы при этом не меняются.
+    """
+    output_dir = Path(csv_path).parent
+    pipeline = pipeline_fingerprint(
+        _parse_handlers(csv_path, chunksize, lean=lean) + [EncodeCategoricalHandler(lean=lean)]
+    )
+    with tempfile.TemporaryDirectory(dir=output_dir, prefix=".tail-") as tmp:
+        tail_dir = Path(tmp)
+        local, feature_names = _run_shard(
+            csv_path, byte_range, chunksize, tail_dir, vocabularies, lean
+        )
+        rows = len(np.load(tail_dir / "y_data.npy", mmap_mode="r"))
+        shards = [(tail_dir, local, feature_names)]
+        if base is not None:
+            shards.insert(0, (output_dir, base["vocabularies"], base["feature_names"]))
+        merged = merge_shards(shards, output_dir, output_format, compression, pipeline)
+    return rows, feature_names, merged
+
+
+def run_incremental(
+    csv_path: str,
+    chunksize: Optional[int] = None,
+    vocabularies: Optional[dict[str, list[str]]] = None,
+    vocabularies_path: Optional[Path] = None,
+    lean: bool = False,
+    output_format: str = "npy",
+    compression: Optional[str] = None,
+) -> dict:
+    """
+    Обрабатывает записи CSV-файла, добавленные после прошлого запуска, и дописывает
+    их строки к матрицам в папке файла.
+
+    Параметры — как у pipeline.build_pipeline. Без vocabularies (режим fit)
+    общие словари сохраняются в vocabularies_path, если он задан.
+    Возвращает сводку: добавлено строк (rows_added), всего строк (rows),
+    смещение конца обработанных записей (offset) и причину построения
+    матриц заново (rebuilt, None при дописывании).
+    Генерирует исключение, если в файле нет ни одной полной записи.
+    """
+    csv_file = Path(csv_path)
+    output_dir = csv_file.parent
+    settings = {
+        "mode": "fit" if vocabularies is None else "transform",
+        "lean": lean,
+        "output_format": output_format,
+        "compression": compression,
+    }
+    header_end = split_csv(csv_file, 1)[0]
+    options = (chunksize, vocabularies, lean, output_format, compression)
+    checkpoint = load_checkpoint(output_dir)
+    rebuilt = _resume_problem(csv_file, output_dir, checkpoint, settings, vocabularies)
+    ingested = None
+    if rebuilt is None:
+        start = checkpoint["offset"]
+        end = complete_records_end(csv_file, start)
+        if end == start:
+            return {"rows_added": 0, "rows": checkpoint["rows"], "offset": end, "rebuilt": None}
+        try:
+            ingested = _ingest(csv_path, (header_end, start, end), checkpoint, *options)
+        except ValueError as exc:
+            rebuilt = f"новые записи несовместимы с матрицами ({exc})"
+    if ingested is None:
+        end = complete_records_end(csv_file, header_end)
+        if end == header_end:
+            raise ValueError(f"В файле нет ни одной полной записи: {csv_file}")
+        ingested = _ingest(csv_path, (header_end, header_end, end), None, *options)
+    added, feature_names, merged = ingested
+    rows = added if rebuilt else checkpoint["rows"] + added
+    if vocabularies is None and vocabularies_path is not None:
+        save_vocabularies(vocabularies_path, merged)
+    save_checkpoint(
+        output_dir,
+        {
+            "version": CHECKPOINT_VERSION,
+            "csv": csv_file.name,
+            "offset": end,
+            "rows": rows,
+            "anchors": file_anchors(csv_file, end),
+            "settings": settings,
+            "feature_names": feature_names,
+            "vocabularies": merged,
+        },
+    )
+    return {"rows_added": added, "rows": rows, "offset": end, "rebuilt": rebuilt}
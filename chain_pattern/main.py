@@ -1,25 +1,288 @@
 """
 Точка входа для пайплайна chain_pattern: подготовка данных из CSV.
 """
+import argparse
 import sys
+from pathlib import Path
 import pandas as pd
-from pipeline import build_pipeline
+from handlers import profiling
+from handlers.encode_categorical import load_vocabularies, parse_encoding, save_vocabularies
+from parallel import run_parallel
+from dag import EXECUTORS
+from incremental import run_incremental
+from pipeline import (
+    MODEL_VOCABULARIES_PATH,
+    build_pipeline,
+    default_vocabularies_path,
+    run_chunked,
+    run_staged,
+    run_with_cache,
+)
+
+
+def _run(args, vocabularies, vocabularies_path, use_cache, encodings):
+    """
+    Выполняет пайплайн в режиме, выбранном аргументами командной строки.
+    """
+    compression = None if args.compression == "none" else args.compression
+    if args.workers > 1:
+        run_parallel(
+            args.csv_path,
+            args.workers,
+            args.chunksize,
+            vocabularies,
+            vocabularies_path,
+            args.lean,
+            args.format,
+            compression,
+        )
+        return
+    if args.incremental:
+        summary = run_incremental(
+            args.csv_path,
+            args.chunksize,
+            vocabularies,
+            vocabularies_path,
+            args.lean,
+            args.format,
+            compression,
+        )
+        if summary["rebuilt"]:
+            print(f"Матрицы построены заново: {summary['rebuilt']}.", file=sys.stderr)
+        print(
+            f"Добавлено строк: {summary['rows_added']}, всего: {summary['rows']}.",
+            file=sys.stderr,
+        )
+        return
+    if args.stage_jobs is not None:
+        run_staged(
+            args.csv_path,
+            args.stage_jobs,
+            args.stage_executor,
+            args.chunksize,
+            vocabularies,
+            vocabularies_path,
+            args.lean,
+            args.format,
+            compression,
+            encodings,
+        )
+        return
+    if args.chunksize is not None:
+        run_chunked(
+            args.csv_path,
+            args.chunksize,
+            vocabularies,
+            vocabularies_path,
+            args.lean,
+            args.format,
+            compression,
+            encodings,
+        )
+        return
+    if use_cache:
+        run_with_cache(
+            args.csv_path,
+            args.cache_dir,
+            args.cache_max_mb << 20,
+            vocabularies,
+            vocabularies_path,
+            args.lean,
+            args.format,
+            compression,
+            encodings,
+        )
+        return
+
+    pipeline = build_pipeline(
+        args.csv_path,
+        vocabularies=vocabularies,
+        vocabularies_path=vocabularies_path,
+        lean=args.lean,
+        output_format=args.format,
+        compression=compression,
+        encodings=encodings,
+    )
+    pipeline.handle(pd.DataFrame())
 
 
 def main():
     """
     Запускает пайплайн обработки CSV-файла.
 
-    Ожидает один аргумент — путь к CSV-файлу.
-    Генерирует исключение при неверном числе аргументов.
+    Ожидает путь к CSV-файлу, необязательные --chunksize N для потоковой
+    обработки файлов, не помещающихся в память, и --workers N для обработки
+    частей файла в N процессах. Режим --mode fit (по умолчанию) строит словари
+    категориальных столбцов и сохраняет их рядом с матрицами (или в --vocabularies),
+    --mode transform кодирует данные сохранёнными словарями (по умолчанию словарями
+    текущей модели regression) и тоже сохраняет их рядом с матрицами. С --cache-dir
+    выход обработчиков кэшируется, и повторный запуск продолжает с последней
+    сохранённой стадии; --no-cache отключает кэш. --lean уменьшает пиковую память
+    (см. build_pipeline). С --profile показатели обработчиков сохраняются в JSON и в формате Prometheus
+    (файл с суффиксом .prom). --format store сохраняет матрицы в хранилище признаков
+    features.hfs (сжатие --compression zlib).
+    --stage-jobs N выполняет независимые обработчики одновременно (см. dag).
+    --incremental обрабатывает только записи, добавленные после прошлого запуска
+    (см. incremental). --encoding столбец=hash:N или столбец=top:N кодирует столбец
+    в корзины, и матрица признаков сохраняется разреженной в x_data.npz
+    (см. EncodeCategoricalHandler).
+    Завершает работу с ошибкой при неверных аргументах.
     """
-    if len(sys.argv) != 2:
-        raise RuntimeError("Usage: python main.py hh.csv")
+    parser = argparse.ArgumentParser(
+        prog="python main.py",
+        description="Подготовка x_data.npy и y_data.npy из CSV-файла hh.ru.",
+    )
+    parser.add_argument("csv_path", help="путь к CSV-файлу")
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="читать и обрабатывать файл частями по N строк",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="обрабатывать части файла в N процессах",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["fit", "transform"],
+        default="fit",
+        help="fit — построить и сохранить словари категорий, transform — применить сохранённые",
+    )
+    parser.add_argument(
+        "--vocabularies",
+        type=Path,
+        default=None,
+        help="путь к файлу словарей категорий: в режиме fit — куда сохранить (по умолчанию "
+        "vocabularies.json рядом с матрицами), в transform — откуда прочитать (по умолчанию "
+        "словари текущей модели regression)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="папка кэша результатов обработчиков (только при обработке файла целиком)",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=2048,
+        help="наибольший размер кэша в МБ, давно не использованные записи удаляются",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="не читать и не записывать кэш, даже если задан --cache-dir",
+    )
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        help=(
+            "экономный по памяти режим: категориальные строки, малые целые типы, "
+            "x_data.npy во float32 (float64, если значения не представимы во float32)"
+        ),
+    )
+    parser.add_argument(
+        "--format",
+        choices=["npy", "store"],
+        default="npy",
+        help="npy — x_data.npy и y_data.npy, store — хранилище признаков features.hfs",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=["none", "zlib"],
+        default="none",
+        help="сжатие хранилища признаков (только с --format store)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="обработать только записи, дописанные в файл после прошлого запуска с этим флагом, "
+        "и добавить их к матрицам (контрольная точка checkpoint.json рядом с матрицами)",
+    )
+    parser.add_argument(
+        "--stage-jobs",
+        type=int,
+        default=None,
+        help="выполнять независимые обработчики (пол и возраст, зарплата, город) одновременно "
+        "в N потоках или процессах",
+    )
+    parser.add_argument(
+        "--stage-executor",
+        choices=EXECUTORS,
+        default="thread",
+        help="пул для --stage-jobs: thread (по умолчанию) или process",
+    )
+    parser.add_argument(
+        "--encoding",
+        action="append",
+        default=[],
+        metavar="СТОЛБЕЦ=hash:N|top:N",
+        help="кодировать категориальный столбец в корзины: hash:N — хешированием в N корзин, "
+        "top:N — N самых частых значений и «прочие»; матрица признаков сохраняется "
+        "разреженной в x_data.npz (можно указать несколько раз)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help=(
+            "сохранить время и память обработчиков в JSON-файл "
+            "и рядом в формате Prometheus (.prom)"
+        ),
+    )
+    args = parser.parse_args()
 
-    csv_path = sys.argv[1]
+    if args.chunksize is not None and args.chunksize <= 0:
+        parser.error("--chunksize должен быть положительным")
+    if args.workers <= 0:
+        parser.error("--workers должен быть положительным")
+    if args.cache_max_mb <= 0:
+        parser.error("--cache-max-mb должен быть положительным")
+    if args.stage_jobs is not None and args.stage_jobs <= 0:
+        parser.error("--stage-jobs должен быть положительным")
+    use_cache = args.cache_dir is not None and not args.no_cache
+    if use_cache and (args.chunksize is not None or args.workers > 1):
+        parser.error("--cache-dir поддерживается только при обработке файла целиком")
+    if args.incremental and (use_cache or args.workers > 1 or args.stage_jobs is not None):
+        parser.error("--incremental не поддерживается с --cache-dir, --workers и --stage-jobs")
+    if args.stage_jobs is not None and (use_cache or args.workers > 1):
+        parser.error("--stage-jobs не поддерживается с --cache-dir и --workers")
+    if args.compression != "none" and args.format != "store":
+        parser.error("--compression поддерживается только с --format store")
+    if args.profile is not None and args.workers > 1:
+        parser.error("--profile не поддерживается с --workers")
+    try:
+        encodings = dict(parse_encoding(spec) for spec in args.encoding)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if encodings and (args.workers > 1 or args.incremental or args.format == "store"):
+        parser.error("--encoding не поддерживается с --workers, --incremental и --format store")
 
-    pipeline = build_pipeline(csv_path)
-    pipeline.handle(pd.DataFrame())
+    if args.mode == "transform":
+        source = args.vocabularies or MODEL_VOCABULARIES_PATH
+        vocabularies, vocabularies_path = load_vocabularies(source), None
+    else:
+        vocabularies = None
+        vocabularies_path = args.vocabularies or default_vocabularies_path(args.csv_path)
+
+    if args.profile is None:
+        _run(args, vocabularies, vocabularies_path, use_cache, encodings)
+    else:
+        profiler = profiling.enable()
+        try:
+            _run(args, vocabularies, vocabularies_path, use_cache, encodings)
+        finally:
+            profiling.disable()
+        profiler.save(args.profile, prefix="chain_stage")
+    if vocabularies is not None:
+        # Матрицы сопровождаются словарями, которыми закодированы, как в режиме fit:
+        # regression.train сохраняет их вместе с моделью.
+        target = default_vocabularies_path(args.csv_path)
+        if target.resolve() != source.resolve():
+            save_vocabularies(target, vocabularies)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,209 @@
+"""
+Параллельный запуск пайплайна chain_pattern по частям CSV-файла в пуле процессов.
+"""
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, Optional
+import numpy as np
+import pandas as pd
+from cache import pipeline_fingerprint
+from handlers.build_matrices import SPARSE_X_FILENAME, BuildMatricesHandler, NpyAppender
+from handlers.csv_range import split_csv
+from handlers.encode_categorical import EncodeCategoricalHandler, save_vocabularies
+from handlers.feature_store import FEATURES_FILENAME, FeatureStore, FeatureStoreWriter, fingerprint
+from pipeline import _link, _parse_handlers, fit_vocabularies
+
+MERGE_BLOCK_ROWS = 1_000_000
+
+
+def _run_shard(
+    csv_path: str,
+    byte_range: tuple[int, int, int],
+    chunksize: Optional[int],
+    shard_dir: Path,
+    vocabularies: Optional[dict[str, list[str]]] = None,
+    lean: bool = False,
+) -> tuple[dict[str, list[str]], list[str]]:
+    """
+    Обрабатывает диапазон CSV-файла цепочкой и сохраняет матрицы части в shard_dir.
+
+    Без vocabularies категориальные признаки кодируются по локальным словарям части.
+    Возвращает использованные словари и названия столбцов матрицы признаков.
+    """
+    if vocabularies is None and chunksize:
+        vocabularies = fit_vocabularies(csv_path, chunksize, byte_range, lean)
+    encoder = EncodeCategoricalHandler(vocabularies, lean=lean)
+    builder = BuildMatricesHandler(shard_dir, lean=lean)
+    pipeline = _link(_parse_handlers(csv_path, chunksize, byte_range, lean) + [encoder, builder])
+    if chunksize is None:
+        pipeline.handle(pd.DataFrame())
+    else:
+        for _ in pipeline.handle_chunks([]):
+            pass
+    return vocabularies or encoder.vocabularies, builder.feature_names
+
+
+def _remap(local: list[str], vocabulary: list[str]) -> np.ndarray:
+    """
+    Возвращает массив перевода локальных кодов части в коды общего словаря.
+    """
+    index = {value: code for code, value in enumerate(vocabulary)}
+    return np.array([index[value] for value in local], dtype=np.intp)
+
+
+class _NpyWriter:
+    """
+    Запись объединённых матриц в x_data.npy и y_data.npy.
+    """
+
+    def __init__(self, output_dir: Path) -> None:
+        self._x = NpyAppender(output_dir / "x_data.npy")
+        self._y = NpyAppender(output_dir / "y_data.npy")
+        self._stale = [output_dir / FEATURES_FILENAME, output_dir / SPARSE_X_FILENAME]
+
+    def append(self, x: np.ndarray, y: np.ndarray) -> None:
+        self._x.append(x)
+        self._y.append(y)
+
+    def close(self) -> None:
+        self._x.close()
+        self._y.close()
+        for path in self._stale:
+            path.unlink(missing_ok=True)
+
+    def discard(self) -> None:
+        self._x.discard()
+        self._y.discard()
+
+
+def _shard_blocks(shard_dir: Path) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Возвращает копии блоков строк матриц части по MERGE_BLOCK_ROWS: из хранилища
+    признаков, если оно есть в папке, иначе из x_data.npy и y_data.npy.
+    """
+    store_path = shard_dir / FEATURES_FILENAME
+    if store_path.is_file():
+        with FeatureStore(store_path) as store:
+            for start in range(0, store.n_rows, MERGE_BLOCK_ROWS):
+                stop = start + MERGE_BLOCK_ROWS
+                yield np.array(store.read(start, stop)), np.array(store.read_target(start, stop))
+        return
+    x = np.load(shard_dir / "x_data.npy", mmap_mode="r")
+    y = np.load(shard_dir / "y_data.npy", mmap_mode="r")
+    for start in range(0, len(x), MERGE_BLOCK_ROWS):
+        stop = start + MERGE_BLOCK_ROWS
+        yield np.array(x[start:stop]), np.array(y[start:stop])
+
+
+def merge_shards(
+    shards: list[tuple[Path, dict[str, list[str]], list[str]]],
+    output_dir: Path,
+    output_format: str = "npy",
+    compression: Optional[str] = None,
+    pipeline: str = "",
+) -> dict[str, list[str]]:
+    """
+    Объединяет матрицы частей в x_data.npy и y_data.npy с общими кодами категорий.
+
+    shards — по порядку частей: папка с матрицами (.npy или хранилище признаков),
+    локальные словари, названия столбцов.
+    output_dir — папка для итоговых матриц.
+    output_format, compression — формат результата (см. BuildMatricesHandler);
+    отпечаток хранилища строится по pipeline и общим словарям.
+    Общий словарь столбца — отсортированное объединение локальных, поэтому коды
+    совпадают с кодами обработки файла целиком. Части, закодированные общим
+    словарём (режим transform), копируются без перекодирования.
+    Возвращает общие словари.
+    Генерирует исключение при различающихся столбцах частей.
+    """
+    feature_names = shards[0][2]
+    for _, _, names in shards:
+        if names != feature_names:
+            raise ValueError(
+                f"Столбцы частей не совпадают: {names} и {feature_names}."
+            )
+    vocabularies = {
+        col: sorted(set().union(*(local[col] for _, local, _ in shards)))
+        for col in shards[0][1]
+    }
+    if output_format == "store":
+        writer = FeatureStoreWriter(
+            output_dir / FEATURES_FILENAME,
+            feature_names,
+            compression=compression,
+            fingerprint=fingerprint(pipeline, feature_names, vocabularies),
+        )
+    else:
+        writer = _NpyWriter(output_dir)
+    try:
+        for shard_dir, local, _ in shards:
+            remaps = {
+                feature_names.index(col): _remap(values, vocabularies[col])
+                for col, values in local.items()
+                if values != vocabularies[col]
+            }
+            for block, target in _shard_blocks(shard_dir):
+                for j, remap in remaps.items():
+                    block[:, j] = remap[block[:, j].astype(np.intp)]
+                writer.append(block, target)
+        writer.close()
+    finally:
+        writer.discard()
+    return vocabularies
+
+
+def run_parallel(
+    csv_path: str,
+    workers: int,
+    chunksize: Optional[int] = None,
+    vocabularies: Optional[dict[str, list[str]]] = None,
+    vocabularies_path: Optional[Path] = None,
+    lean: bool = False,
+    output_format: str = "npy",
+    compression: Optional[str] = None,
+) -> None:
+    """
+    Выполняет пайплайн в workers процессах по диапазонам байтов CSV-файла.
+
+    csv_path — путь к входному CSV-файлу; матрицы сохраняются рядом с ним.
+    workers — число процессов и частей файла.
+    chunksize — размер части в строках для потоковой обработки внутри процесса.
+    vocabularies — словари категориальных столбцов (режим transform); без них
+    общие словари строятся по частям и сохраняются в vocabularies_path, если он задан.
+    lean — экономный по памяти режим (см. pipeline.build_pipeline).
+    output_format, compression — формат результата (см. pipeline.build_pipeline).
+    Результат совпадает с обработкой файла целиком.
+    """
+    output_dir = Path(csv_path).parent
+    pipeline = pipeline_fingerprint(
+        _parse_handlers(csv_path, chunksize, lean=lean) + [EncodeCategoricalHandler(lean=lean)]
+    )
+    header_end, ranges = split_csv(csv_path, workers)
+    with tempfile.TemporaryDirectory(dir=output_dir, prefix=".shards-") as tmp:
+        shard_dirs = [Path(tmp) / str(i) for i in range(len(ranges))]
+        for shard_dir in shard_dirs:
+            shard_dir.mkdir()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(
+                    _run_shard,
+                    csv_path,
+                    (header_end, start, end),
+                    chunksize,
+                    shard_dir,
+                    vocabularies,
+                    lean,
+                )
+                for (start, end), shard_dir in zip(ranges, shard_dirs)
+            ]
+            results = [future.result() for future in futures]
+        merged = merge_shards(
+            [(shard_dir, *result) for shard_dir, result in zip(shard_dirs, results)],
+            output_dir,
+            output_format,
+            compression,
+            pipeline,
+        )
+    if vocabularies is None and vocabularies_path is not None:
+        save_vocabularies(vocabularies_path, merged)
@@ -2,32 +2,255 @@
 Сборка пайплайна обработки данных из chain_pattern.
 """
 from pathlib import Path
+from typing import Optional
+import pandas as pd
+from handlers.base import Handler
 from handlers.load_csv import LoadCSVHandler
 from handlers.normalize_columns import NormalizeColumnsHandler
 from handlers.parse_gender_age import ParseGenderAgeHandler
 from handlers.parse_salary import ParseSalaryHandler
 from handlers.parse_city import ParseCityHandler
-from handlers.encode_categorical import EncodeCategoricalHandler
+from handlers.encode_categorical import (
+    VOCABULARIES_FILENAME,
+    EncodeCategoricalHandler,
+    bucket_counts,
+    save_vocabularies,
+)
 from handlers.build_matrices import BuildMatricesHandler
+from cache import DEFAULT_MAX_BYTES, StageCache, file_digest, pipeline_fingerprint, run_cached
+from dag import run_graph, run_graph_chunks
 
+# Словари текущей модели regression (копируются туда при обучении, см. regression.train);
+# по умолчанию читаются в режиме transform.
+MODEL_VOCABULARIES_PATH = (
+    Path(__file__).resolve().parent.parent / "regression" / "resources" / VOCABULARIES_FILENAME
+)
 
-def build_pipeline(csv_path: str):
+
+def default_vocabularies_path(csv_path: str) -> Path:
+    """
+    Путь словарей режима fit по умолчанию: рядом с матрицами, в папке CSV-файла.
+    """
+    return Path(csv_path).parent / VOCABULARIES_FILENAME
+
+
+def _parse_handlers(
+    csv_path: str,
+    chunksize: Optional[int],
+    byte_range: Optional[tuple[int, int, int]] = None,
+    lean: bool = False,
+) -> list[Handler]:
+    """
+    Возвращает обработчики цепочки до кодирования категориальных признаков.
+    """
+    return [
+        LoadCSVHandler(csv_path, chunksize=chunksize, byte_range=byte_range, lean=lean),
+        NormalizeColumnsHandler(),
+        ParseGenderAgeHandler(lean=lean),
+        ParseSalaryHandler(),
+        ParseCityHandler(),
+    ]
+
+
+def _link(handlers: list[Handler]) -> Handler:
+    """
+    Связывает обработчики в цепочку и возвращает первый из них.
+    """
+    for current, following in zip(handlers, handlers[1:]):
+        current.set_next(following)
+    return handlers[0]
+
+
+def _pipeline_handlers(
+    csv_path: str,
+    chunksize: Optional[int] = None,
+    vocabularies: Optional[dict[str, list[str]]] = None,
+    vocabularies_path: Optional[Path] = None,
+    lean: bool = False,
+    output_format: str = "npy",
+    compression: Optional[str] = None,
+    encodings: Optional[dict[str, tuple[str, int]]] = None,
+) -> list[Handler]:
+    """
+    Возвращает все обработчики цепочки по порядку (см. build_pipeline).
+    """
+    handlers = _parse_handlers(csv_path, chunksize, lean=lean) + [
+        EncodeCategoricalHandler(
+            vocabularies, save_path=vocabularies_path, lean=lean, encodings=encodings
+        ),
+    ]
+    builder = BuildMatricesHandler(
+        Path(csv_path).parent,
+        lean=lean,
+        output_format=output_format,
+        compression=compression,
+        pipeline=pipeline_fingerprint(handlers),
+        buckets=bucket_counts(encodings),
+    )
+    return handlers + [builder]
+
+
+def build_pipeline(
+    csv_path: str,
+    chunksize: Optional[int] = None,
+    vocabularies: Optional[dict[str, list[str]]] = None,
+    vocabularies_path: Optional[Path] = None,
+    lean: bool = False,
+    output_format: str = "npy",
+    compression: Optional[str] = None,
+    encodings: Optional[dict[str, tuple[str, int]]] = None,
+):
     """
     Собирает цепочку обработчиков для подготовки данных из CSV.
 
     csv_path — путь к входному CSV-файлу.
+    chunksize — размер части в строках для потокового режима (handle_chunks).
+    vocabularies — словари категориальных столбцов (режим transform, см. также
+    fit_vocabularies); без них кодировщик обучается на данных, прошедших через
+    цепочку (режим fit), и сохраняет словари в vocabularies_path, если он задан.
+    lean — экономный по памяти режим: текстовые столбцы категориальные, целые
+    признаки в наименьших типах, матрица признаков float32 (значения те же).
+    output_format — "npy" (x_data.npy и y_data.npy) или "store" (хранилище
+    признаков, см. handlers.feature_store), compression — сжатие хранилища.
+    encodings — столбцы, кодируемые в корзины (см. EncodeCategoricalHandler);
+    с ними матрица признаков разреженная (x_data.npz, только формат npy).
     Возвращает первый обработчик цепочки (LoadCSVHandler).
     Матрицы сохраняются в папку с исходным файлом.
     """
-    output_dir = Path(csv_path).parent
+    return _link(
+        _pipeline_handlers(
+            csv_path,
+            chunksize,
+            vocabularies,
+            vocabularies_path,
+            lean,
+            output_format,
+            compression,
+            encodings,
+        )
+    )
+
+
+def run_with_cache(
+    csv_path: str,
+    cache_dir: Path,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    vocabularies: Optional[dict[str, list[str]]] = None,
+    vocabularies_path: Optional[Path] = None,
+    lean: bool = False,
+    output_format: str = "npy",
+    compression: Optional[str] = None,
+    encodings: Optional[dict[str, tuple[str, int]]] = None,
+) -> None:
+    """
+    Выполняет пайплайн над файлом целиком, сохраняя выход обработчиков в кэш.
+
+    Повторный запуск над тем же файлом продолжает с самой глубокой стадии из кэша
+    (см. cache.run_cached); запись матриц выполняется всегда.
+    cache_dir — папка кэша, max_bytes — её наибольший размер.
+    """
+    cache = StageCache(cache_dir, max_bytes)
+    handlers = _pipeline_handlers(
+        csv_path, None, vocabularies, vocabularies_path, lean, output_format, compression, encodings
+    )
+    run_cached(handlers, cache, file_digest(csv_path))
+
+
+def fit_vocabularies(
+    csv_path: str,
+    chunksize: int,
+    byte_range: Optional[tuple[int, int, int]] = None,
+    lean: bool = False,
+    encodings: Optional[dict[str, tuple[str, int]]] = None,
+) -> dict[str, list[str]]:
+    """
+    Собирает словари категориальных столбцов отдельным потоковым проходом по CSV.
+
+    csv_path — путь к входному CSV-файлу.
+    chunksize — размер части в строках.
+    byte_range — диапазон файла (см. LoadCSVHandler); по умолчанию весь файл.
+    lean — экономный по памяти режим (см. build_pipeline).
+    encodings — столбцы, кодируемые в корзины (для hash словарь не собирается).
+    Возвращает словари для EncodeCategoricalHandler.
+    """
+    encoder = EncodeCategoricalHandler(encodings=encodings)
+    for chunk in _link(_parse_handlers(csv_path, chunksize, byte_range, lean)).handle_chunks([]):
+        encoder.partial_fit(chunk)
+    return encoder.vocabularies
+
 
-    loader = LoadCSVHandler(csv_path)
-    loader \
-        .set_next(NormalizeColumnsHandler()) \
-        .set_next(ParseGenderAgeHandler()) \
-        .set_next(ParseSalaryHandler()) \
-        .set_next(ParseCityHandler()) \
-        .set_next(EncodeCategoricalHandler()) \
-        .set_next(BuildMatricesHandler(output_dir))
+def run_chunked(
+    csv_path: str,
+    chunksize: int,
+    vocabularies: Optional[dict[str, list[str]]] = None,
+    vocabularies_path: Optional[Path] = None,
+    lean: bool = False,
+    output_format: str = "npy",
+    compression: Optional[str] = None,
+    encodings: Optional[dict[str, tuple[str, int]]] = None,
+) -> None:
+    """
+    Выполняет пайплайн в потоковом режиме: память зависит от chunksize, а не от размера файла.
+
+    Без vocabularies (режим fit) делает два прохода по CSV: сбор словарей
+    категориальных столбцов (сохраняются в vocabularies_path, если он задан)
+    и обработку с дозаписью матриц. Результат побайтно совпадает с обработкой
+    файла целиком (словари top:N — см. EncodeCategoricalHandler). С vocabularies
+    (режим transform) проход один.
+    """
+    if vocabularies is None:
+        vocabularies = fit_vocabularies(csv_path, chunksize, lean=lean, encodings=encodings)
+        if vocabularies_path is not None:
+            save_vocabularies(vocabularies_path, vocabularies)
+    pipeline = build_pipeline(
+        csv_path,
+        chunksize=chunksize,
+        vocabularies=vocabularies,
+        lean=lean,
+        output_format=output_format,
+        compression=compression,
+        encodings=encodings,
+    )
+    for _ in pipeline.handle_chunks([]):
+        pass
 
-    return loader
+
+def run_staged(
+    csv_path: str,
+    jobs: Optional[int] = None,
+    executor: str = "thread",
+    chunksize: Optional[int] = None,
+    vocabularies: Optional[dict[str, list[str]]] = None,
+    vocabularies_path: Optional[Path] = None,
+    lean: bool = False,
+    output_format: str = "npy",
+    compression: Optional[str] = None,
+    encodings: Optional[dict[str, tuple[str, int]]] = None,
+) -> None:
+    """
+    Выполняет пайплайн графом зависимостей по столбцам (см. dag): независимые
+    обработчики разбора выполняются одновременно в jobs потоках или процессах.
+
+    С chunksize работает в потоковом режиме (как run_chunked), иначе над файлом
+    целиком. Результат совпадает с последовательной цепочкой.
+    """
+    if chunksize is not None and vocabularies is None:
+        vocabularies = fit_vocabularies(csv_path, chunksize, lean=lean, encodings=encodings)
+        if vocabularies_path is not None:
+            save_vocabularies(vocabularies_path, vocabularies)
+        vocabularies_path = None
+    handlers = _pipeline_handlers(
+        csv_path,
+        chunksize,
+        vocabularies,
+        vocabularies_path,
+        lean,
+        output_format,
+        compression,
+        encodings,
+    )
+    if chunksize is None:
+        run_graph(handlers, pd.DataFrame(), jobs, executor)
+        return
+    for _ in run_graph_chunks(handlers, [], jobs, executor):
+        pass
@@ -2,46 +2,217 @@
 CLI-приложение: предсказание зарплат по файлу x_data.npy (выход пайплайна chain_pattern).
 
 Интерфейс: python -m regression.app chain_pattern/x_data.npy из корня проекта
-Вывод: список зарплат в рублях (по одному float на строку).
+Вывод: список зарплат в рублях (по одному float на строку). С --output предсказания
+записываются в файл блоками: текст, .npy, сырые float32 или CSV (см. regression.output).
+
+Пакетный режим: python -m regression.app --batch 'data/*/x_data.npy' [--jobs 8]
+Модель загружается один раз, файлы обрабатываются в пуле потоков, предсказания
+каждого файла записываются рядом с ним (см. regression.batch).
+
+Режим сервера: python -m regression.app --serve [--port 8000 | --unix путь/к/сокету]
+Модель загружается один раз, запросы принимаются по HTTP (см. regression.server).
+
+Время запуска: с --backend compiled или auto используется скомпилированная модель,
+загрузка которой не импортирует sklearn и joblib (по умолчанию — пайплайн sklearn,
+предсказания которого скомпилированная модель повторяет с точностью до округления);
+модуль сервера импортируется только с --serve, логирование настраивается в main,
+а не при импорте.
 """
 
+import argparse
+import json
 import logging
 import sys
 from pathlib import Path
 
-from .predict import predict_salaries
+from chain_pattern.handlers import profiling
+
+from .cli import ArgumentParser
+from .output import OUTPUT_FORMATS, output_format, write_predictions
+from .predict import BACKENDS, load_backend, load_x_data, stream_matrix_salaries
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(levelname)s:%(name)s:%(message)s",
-)
 logger = logging.getLogger(__name__)
 
 
+def _parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = ArgumentParser(
+        prog="python -m regression.app",
+        description="Предсказание зарплат по x_data.npy или сервер предсказаний.",
+    )
+    parser.add_argument(
+        "x_paths",
+        nargs="*",
+        help="путь к x_data.npy, x_data.npz (разреженная матрица) или хранилищу признаков "
+        "features.hfs; с --batch — несколько путей или шаблонов (glob)",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="пакетный режим: предсказания каждого файла записываются рядом с ним "
+        "в <имя>.predictions.txt",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="число потоков пакетного режима (по умолчанию по числу ядер)",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=None,
+        help="сохранить отчёт пакетного режима (файлы, строки, строк в секунду) в JSON",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="sklearn",
+        help="способ предсказания: sklearn (по умолчанию), compiled (python -m regression.compiled) "
+        "или auto — compiled, если скомпилированная модель актуальна, иначе sklearn",
+    )
+    parser.add_argument(
+        "--model-version",
+        default=None,
+        help="версия модели из реестра (python -m regression.model_io list); по умолчанию текущая",
+    )
+    parser.add_argument("--serve", action="store_true", help="запустить сервер предсказаний")
+    parser.add_argument("--host", default="127.0.0.1", help="адрес сервера (по умолчанию 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="порт сервера (по умолчанию 8000)")
+    parser.add_argument("--unix", default=None, help="слушать Unix-сокет вместо TCP-порта")
+    parser.add_argument(
+        "--max-batch-rows",
+        type=int,
+        default=None,
+        help="максимальное число строк в микропакете (по умолчанию regression.server.MAX_BATCH_ROWS)",
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=None,
+        help="максимальное ожидание набора микропакета, мс (по умолчанию regression.server.MAX_WAIT_MS)",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="записать предсказания в файл (- — в стандартный вывод); формат по расширению: "
+        ".npy, .f32 (сырые float32 little-endian), .csv, иначе текст",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default=None,
+        help="формат предсказаний вместо определённого по расширению --output "
+        "(по умолчанию text — по одному значению на строку)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help="сохранить время и память load_model, load_x_data и predict в JSON-файл "
+        "и рядом в формате Prometheus (.prom)",
+    )
+    args = parser.parse_args()
+    if args.serve == bool(args.x_paths):
+        parser.error("укажите путь к x_data.npy или --serve")
+    if args.serve and args.batch:
+        parser.error("--batch не поддерживается с --serve")
+    if len(args.x_paths) > 1 and not args.batch:
+        parser.error("несколько файлов обрабатываются только с --batch")
+    if (args.jobs is not None or args.report is not None) and not args.batch:
+        parser.error("--jobs и --report поддерживаются только с --batch")
+    if args.jobs is not None and args.jobs <= 0:
+        parser.error("--jobs должен быть положительным")
+    if (args.serve or args.batch) and args.profile is not None:
+        parser.error("--profile поддерживается только при предсказании по одному файлу")
+    if (args.serve or args.batch) and (args.output is not None or args.output_format is not None):
+        parser.error("--output и --output-format поддерживаются только при предсказании по одному файлу")
+    return args
+
+
+def _run_batch(args: argparse.Namespace) -> None:
+    """
+    Пакетный режим: загружает модель один раз и обрабатывает все файлы (см. regression.batch).
+
+    Выводит в stderr итог: файлов, строк, время и строк в секунду.
+    Генерирует исключение, если модель не загружена, шаблон не нашёл файлов
+    или хотя бы один файл не обработан.
+    """
+    from .batch import count_rows, expand_paths, score_files
+
+    paths = expand_paths(args.x_paths)
+    model = load_backend(args.backend, args.model_version, count_rows(paths))
+    report = score_files(model, paths, args.jobs)
+    if args.report is not None:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(
+        f"Файлов: {len(report['files'])} из {len(paths)}, строк: {report['rows']}, "
+        f"время: {report['seconds']:.3f} с, строк в секунду: {report['rows_per_sec']:.0f}",
+        file=sys.stderr,
+    )
+    for item in report["failed"]:
+        print(f"Ошибка: {item['path']}: {item['error']}", file=sys.stderr)
+    if report["failed"]:
+        raise ValueError(f"Не обработано файлов: {len(report['failed'])}.")
+
+
 def main() -> None:
     """
     Точка входа CLI.
 
     Читает путь к x_data.npy из аргумента командной строки, загружает модель
-    из regression/resources, выводит предсказанные зарплаты (по одному значению на строку).
+    из regression/resources, выводит предсказанные зарплаты (по одному значению на строку)
+    по мере предсказания блоков строк. С --output и --output-format блоки записываются
+    в файл или стандартный вывод в формате .npy, float32 или CSV. С --batch обрабатывает несколько файлов
+    (пути или шаблоны) и записывает результаты рядом с ними. С флагом --serve
+    запускает сервер предсказаний.
+    С --profile сохраняет показатели загрузки и предсказания (см. chain_pattern.handlers.profiling).
     Завершает работу с кодом 1 при неверных аргументах или ошибке предсказания.
     """
-    if len(sys.argv) != 2:
-        logger.debug("Неверное число аргументов: %d, ожидается 1", len(sys.argv) - 1)
-        print(
-            "Использование: python -m regression.app path/to/x_data.npy",
-            file=sys.stderr,
-        )
-        sys.exit(1)
-    x_path = Path(sys.argv[1]).resolve()
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="%(levelname)s:%(name)s:%(message)s",
+    )
+    args = _parse_args()
+    if args.serve:
+        from .server import MAX_BATCH_ROWS, MAX_WAIT_MS, serve
+
+        max_batch_rows = MAX_BATCH_ROWS if args.max_batch_rows is None else args.max_batch_rows
+        max_wait_ms = MAX_WAIT_MS if args.max_wait_ms is None else args.max_wait_ms
+        try:
+            model = load_backend(args.backend, args.model_version)
+            serve(model, args.host, args.port, args.unix, max_batch_rows, max_wait_ms)
+        except (ValueError, OSError) as exc:
+            logger.debug("Ошибка сервера: %s", exc)
+            print(f"Ошибка: {exc}", file=sys.stderr)
+            sys.exit(1)
+        return
+    if args.batch:
+        try:
+            _run_batch(args)
+        except (ValueError, OSError) as exc:
+            logger.debug("Ошибка пакетного предсказания: %s", exc)
+            print(f"Ошибка: {exc}", file=sys.stderr)
+            sys.exit(1)
+        return
+    x_path = Path(args.x_paths[0]).resolve()
+    profiler = profiling.enable() if args.profile is not None else None
+    output = None if args.output in (None, "-") else Path(args.output).resolve()
+    fmt = output_format(args.output, args.output_format)
     try:
-        salaries = predict_salaries(x_path)
+        X = load_x_data(x_path)
+        batches = stream_matrix_salaries(X, backend=args.backend, version=args.model_version)
+        write_predictions(batches, output, fmt, X.shape[0])
+        if profiler is not None:
+            profiling.disable()
+            profiler.save(args.profile, prefix="regression_stage")
     except (ValueError, OSError) as exc:
         logger.debug("Ошибка при предсказании: %s", exc)
         print(f"Ошибка: {exc}", file=sys.stderr)
         sys.exit(1)
-    for s in salaries:
-        print(s)
 
 
 if __name__ == "__main__":
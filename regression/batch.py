@@ -0,0 +1,122 @@
+"""
+Пакетное предсказание по многим файлам признаков одной загруженной моделью.
+
+Файлы обрабатываются параллельно в пуле потоков: пока один поток читает блок
+строк с диска или записывает результаты, другие вычисляют предсказания
+(NumPy и деревья sklearn отпускают GIL на время вычислений). Предсказания
+каждого файла записываются рядом с ним в <имя>.predictions.txt в формате
+вывода regression.app по умолчанию (см. output.format_text).
+"""
+
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from .output import write_predictions
+from .predict import BATCH_SIZE, check_n_features, iter_predictions, load_x_data
+
+logger = logging.getLogger(__name__)
+
+RESULTS_SUFFIX = ".predictions.txt"
+_GLOB_CHARS = frozenset("*?[")
+
+
+def expand_paths(patterns: list[str]) -> list[Path]:
+    """
+    Раскрывает шаблоны путей (glob, в том числе ** для вложенных папок).
+
+    Пути без символов шаблона возвращаются как есть; повторы исключаются
+    с сохранением порядка.
+    Генерирует исключение, если шаблону не соответствует ни один файл.
+    """
+    paths: dict[Path, None] = {}
+    for pattern in patterns:
+        if _GLOB_CHARS.isdisjoint(pattern):
+            paths[Path(pattern).resolve()] = None
+            continue
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            raise FileNotFoundError(f"Нет файлов, соответствующих шаблону: {pattern}")
+        for match in matches:
+            paths[Path(match).resolve()] = None
+    return list(paths)
+
+
+def results_path(x_path: Path) -> Path:
+    """
+    Путь к файлу результатов рядом с файлом признаков: x_data.npy -> x_data.predictions.txt.
+    """
+    return x_path.with_name(x_path.stem + RESULTS_SUFFIX)
+
+
+def count_rows(paths: list[Path]) -> int:
+    """
+    Общее число строк в файлах признаков (по заголовкам; нечитаемые файлы пропускаются).
+
+    Нужно для выбора способа предсказания auto до загрузки модели (см. predict.load_backend).
+    """
+    rows = 0
+    for path in paths:
+        try:
+            rows += load_x_data(path).shape[0]
+        except (ValueError, OSError):
+            continue
+    return rows
+
+
+def score_file(model, x_path: Path, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Предсказывает зарплаты для файла признаков и записывает их в results_path(x_path).
+
+    Файл результатов появляется целиком после последнего блока.
+    Возвращает путь к файлу признаков и результатов, число строк и время, с.
+    Генерирует исключение при ошибке чтения, несовместимых признаках или сбое записи.
+    """
+    start = time.perf_counter()
+    X = load_x_data(x_path)
+    check_n_features(X, model)
+    output = results_path(x_path)
+    rows = write_predictions(iter_predictions(model, X, batch_size), output)
+    seconds = time.perf_counter() - start
+    logger.debug("%s: строк %d за %.3f с -> %s", x_path, rows, seconds, output)
+    return {"path": str(x_path), "output": str(output), "rows": rows, "seconds": seconds}
+
+
+def score_files(
+    model,
+    paths: list[Path],
+    jobs: Optional[int] = None,
+    batch_size: int = BATCH_SIZE,
+) -> dict:
+    """
+    Предсказывает зарплаты для каждого файла в пуле из jobs потоков (см. score_file).
+
+    Ошибка в одном файле не останавливает остальные.
+    Возвращает отчёт: по файлам (files, в порядке paths), ошибки (failed: путь и текст),
+    всего строк, общее время и строк в секунду.
+    """
+    jobs = jobs or min(len(paths), os.cpu_count() or 1) or 1
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="score") as pool:
+        futures = [pool.submit(score_file, model, path, batch_size) for path in paths]
+    files, failed = [], []
+    for path, future in zip(paths, futures):
+        try:
+            files.append(future.result())
+        except (ValueError, OSError) as exc:
+            logger.debug("Ошибка предсказания для %s: %s", path, exc)
+            failed.append({"path": str(path), "error": str(exc)})
+    seconds = time.perf_counter() - start
+    rows = sum(item["rows"] for item in files)
+    return {
+        "files": files,
+        "failed": failed,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else float("inf"),
+        "jobs": jobs,
+    }
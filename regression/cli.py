@@ -0,0 +1,18 @@
+"""Общие средства командной строки пакета regression."""
+
+import argparse
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+
+class ArgumentParser(argparse.ArgumentParser):
+    """
+    Разбор аргументов с завершением по коду 1 при ошибке, как у остальных команд пакета.
+    """
+
+    def error(self, message: str) -> None:
+        logger.debug("Неверные аргументы: %s", message)
+        self.print_usage(sys.stderr)
+        self.exit(1, f"Ошибка: {message}\n")
@@ -0,0 +1,325 @@
+"""
+Компилированный движок предсказаний для пайплайна StandardScaler + GradientBoostingRegressor.
+
+Масштабирование и все деревья бустинга переводятся в непрерывные массивы NumPy:
+пороги каждого признака (уже в исходных, немасштабированных единицах), битовые маски
+листов для узлов и значения листов. Предсказание для пакета строк вычисляется по схеме
+QuickScorer: для каждого признака одним np.searchsorted находится число порогов меньше
+значения, маски отвергнутых листов всех деревьев объединяются побитовым И, а лист
+каждого дерева — младший оставшийся бит. Цикл Python идёт только по признакам.
+
+Экспорт весов из regression/resources: python -m regression.compiled
+"""
+
+import logging
+import sys
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BLOCK_ROWS = 8192
+
+_WORD_BITS = 64
+_ARRAY_NAMES = ("thresholds", "threshold_offsets", "tables", "leaf_values")
+
+
+class CompiledModel:
+    """
+    Ансамбль деревьев регрессии в виде плоских массивов.
+
+    thresholds — отсортированные пороги узлов, сгруппированные по признакам
+    (границы групп — threshold_offsets). Строка k таблицы признака в tables — маска
+    листов всех деревьев, оставшихся после отбрасывания узлов с k наименьшими порогами
+    (значение признака больше порога — переход вправо). Таблица признака f начинается
+    со строки threshold_offsets[f] + f. Маска дерева занимает words слов по 64 бита,
+    leaf_values — значения листов, умноженные на learning_rate, init — начальное
+    предсказание. Интерфейс совпадает с пайплайном: predict и n_features_in_.
+    """
+
+    def __init__(
+        self,
+        thresholds: np.ndarray,
+        threshold_offsets: np.ndarray,
+        tables: np.ndarray,
+        leaf_values: np.ndarray,
+        init: float,
+        words: int,
+    ) -> None:
+        self.thresholds = thresholds
+        self.threshold_offsets = threshold_offsets
+        self.tables = tables
+        self.leaf_values = leaf_values
+        self.init = init
+        self.words = words
+        self.n_features_in_ = len(threshold_offsets) - 1
+        self.n_trees = leaf_values.shape[0]
+        self._leaf_base = np.arange(self.n_trees, dtype=np.intp) * leaf_values.shape[1]
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Возвращает предсказания для матрицы признаков X (объекты по строкам).
+
+        Строки обрабатываются блоками по BLOCK_ROWS, чтобы ограничить размер
+        промежуточных масок (строки блока × деревья). Из блока разреженной матрицы
+        (scipy.sparse) в плотный вид переводятся только столбцы признаков с порогами.
+        """
+        is_sparse = _is_sparse(X)
+        X = X.tocsr() if is_sparse else np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"Ожидается матрица признаков с {self.n_features_in_} столбцами, получена форма {X.shape}."
+            )
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            block = X[start:start + BLOCK_ROWS]
+            out[start:start + BLOCK_ROWS] = self._predict_block(block.tocsc() if is_sparse else block)
+        return out
+
+    def _predict_block(self, X: np.ndarray) -> np.ndarray:
+        """
+        Вычисляет предсказания всех деревьев для блока строк.
+        """
+        n = X.shape[0]
+        mask = None
+        rows = None
+        for f in range(self.n_features_in_):
+            lo, hi = self.threshold_offsets[f], self.threshold_offsets[f + 1]
+            if lo == hi:
+                continue
+            k = np.searchsorted(self.thresholds[lo:hi], _column(X, f), side="left") + (lo + f)
+            if mask is None:
+                mask = self.tables.take(k, axis=0)
+                rows = np.empty_like(mask)
+            else:
+                np.bitwise_and(mask, self.tables.take(k, axis=0, out=rows), out=mask)
+        if mask is None:
+            mask = np.broadcast_to(self.tables[0], (n, self.tables.shape[1]))
+        mask = mask.reshape(n, self.n_trees, self.words)
+        if self.words == 1:
+            word = mask[:, :, 0]
+            base = 0
+        else:
+            first = np.argmax(mask != 0, axis=2)
+            word = np.take_along_axis(mask, first[:, :, None], axis=2)[:, :, 0]
+            base = first * _WORD_BITS
+        lowest = word & (~word + np.uint64(1))
+        # Степень двойки точно представима в float64: номер бита — показатель степени.
+        bit = (lowest.astype(np.float64).view(np.int64) >> 52) - 1023
+        leaf = bit + base + self._leaf_base
+        return self.init + self.leaf_values.take(leaf).sum(axis=1)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """
+        Возвращает массивы модели для сохранения в .npz.
+        """
+        arrays = {name: getattr(self, name) for name in _ARRAY_NAMES}
+        arrays["init"] = np.array(self.init)
+        arrays["words"] = np.array(self.words)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "CompiledModel":
+        """
+        Восстанавливает модель из массивов, сохранённых to_arrays.
+        """
+        return cls(
+            *(arrays[name] for name in _ARRAY_NAMES),
+            init=float(arrays["init"]),
+            words=int(arrays["words"]),
+        )
+
+
+def _is_sparse(X) -> bool:
+    """
+    Разреженная ли матрица (scipy.sparse): проверяется без импорта scipy.
+    """
+    return hasattr(X, "tocsr") and hasattr(X, "tocsc")
+
+
+def _column(X, f: int) -> np.ndarray:
+    """
+    Столбец f блока строк (плотного или разреженного CSC) как вектор float64.
+    """
+    if _is_sparse(X):
+        return X[:, [f]].toarray().ravel().astype(np.float64)
+    return X[:, f]
+
+
+def _float_keys(x: np.ndarray) -> np.ndarray:
+    """
+    Переводит float64 в uint64 с сохранением порядка (для бинарного поиска по числам).
+    """
+    bits = x.view(np.uint64)
+    return np.where(bits >> np.uint64(63), ~bits, bits | np.uint64(1 << 63))
+
+
+def _from_float_keys(keys: np.ndarray) -> np.ndarray:
+    """
+    Обратное к _float_keys преобразование.
+    """
+    bits = np.where(keys >> np.uint64(63), keys & np.uint64((1 << 63) - 1), ~keys)
+    return bits.view(np.float64)
+
+
+def _raw_thresholds(
+    threshold: np.ndarray,
+    mean: np.ndarray,
+    scale: np.ndarray,
+    sparse_input: bool = False,
+) -> np.ndarray:
+    """
+    Переводит пороги деревьев в исходные единицы признаков без потери точности.
+
+    sklearn отправляет объект влево, если float32((x - mean) / scale) <= threshold;
+    разреженную матрицу (sparse_input) StandardScaler не делит, а умножает на 1 / scale,
+    и на границах порогов результат может отличаться. Левая часть не убывает по x,
+    поэтому условие равносильно x <= T для наибольшего float64 T, которое находится
+    бинарным поиском по всем числам float64.
+    """
+    inverse = 1 / scale
+
+    def goes_left(x: np.ndarray) -> np.ndarray:
+        with np.errstate(over="ignore", invalid="ignore"):
+            scaled = x * inverse if sparse_input else (x - mean) / scale
+            return scaled.astype(np.float32) <= threshold
+
+    lo = np.full(threshold.shape, _float_keys(np.array(-np.inf)))
+    hi = np.full(threshold.shape, _float_keys(np.array(np.inf)))
+    while True:
+        active = hi - lo > 1
+        if not active.any():
+            break
+        mid = lo + (hi - lo) // np.uint64(2)
+        left = goes_left(_from_float_keys(mid))
+        lo = np.where(active & left, mid, lo)
+        hi = np.where(active & ~left, mid, hi)
+    return _from_float_keys(lo)
+
+
+def compile_pipeline(pipeline) -> CompiledModel:
+    """
+    Переводит обученный пайплайн StandardScaler + GradientBoostingRegressor в CompiledModel.
+
+    pipeline — пайплайн из regression.train (или одиночный GradientBoostingRegressor).
+    Масштабирование сворачивается в пороги точно, поэтому ветвления совпадают с sklearn,
+    а предсказания — с pipeline.predict с точностью до порядка суммирования деревьев.
+    Пайплайн без центрирования (with_mean=False) regression.train обучает на разреженной
+    матрице x_data.npz, поэтому его пороги сворачиваются так, как sklearn масштабирует
+    разреженный вход, — и для плотной, и для разреженной матрицы.
+
+    Генерирует исключение для пайплайнов другого состава.
+    """
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    steps = [step for _, step in pipeline.steps] if hasattr(pipeline, "steps") else [pipeline]
+    regressor = steps[-1]
+    scaler = steps[0] if len(steps) == 2 else None
+    if len(steps) > 2 or not isinstance(regressor, GradientBoostingRegressor):
+        raise ValueError(
+            "Компиляция поддерживает только пайплайн StandardScaler + GradientBoostingRegressor, "
+            f"получен {' + '.join(type(step).__name__ for step in steps)}."
+        )
+    if scaler is not None and not isinstance(scaler, StandardScaler):
+        raise ValueError(f"Неподдерживаемый шаг масштабирования: {type(scaler).__name__}.")
+    n_features = regressor.n_features_in_
+    mean = np.zeros(n_features)
+    scale = np.ones(n_features)
+    if scaler is not None:
+        if scaler.with_mean:
+            mean = scaler.mean_.astype(np.float64)
+        if scaler.with_std:
+            scale = scaler.scale_.astype(np.float64)
+
+    if isinstance(regressor.init_, str) and regressor.init_ == "zero":
+        init = 0.0
+    else:
+        init = float(np.ravel(regressor.init_.predict(np.zeros((1, n_features))))[0])
+
+    trees = [estimator.tree_ for estimator in regressor.estimators_[:, 0]]
+    words = max(1, -(-max(tree.n_leaves for tree in trees) // _WORD_BITS))
+    leaf_values = np.zeros((len(trees), words * _WORD_BITS))
+    # Для каждого внутреннего узла: признак, порог, дерево и маска листов левого поддерева.
+    node_feature, node_threshold, node_tree, node_mask = [], [], [], []
+    for t, tree in enumerate(trees):
+        first_leaf = np.zeros(tree.node_count, dtype=np.intp)
+        end_leaf = np.zeros(tree.node_count, dtype=np.intp)
+        leaves = 0
+        stack = [(0, False)]
+        while stack:
+            node, visited = stack.pop()
+            left, right = tree.children_left[node], tree.children_right[node]
+            if left == -1:
+                leaf_values[t, leaves] = regressor.learning_rate * tree.value[node, 0, 0]
+                first_leaf[node], end_leaf[node] = leaves, leaves + 1
+                leaves += 1
+            elif visited:
+                first_leaf[node], end_leaf[node] = first_leaf[left], end_leaf[right]
+                node_feature.append(tree.feature[node])
+                node_threshold.append(tree.threshold[node])
+                node_tree.append(t)
+                node_mask.append((first_leaf[left], end_leaf[left]))
+            else:
+                stack.extend([(node, True), (right, False), (left, False)])
+
+    node_feature = np.array(node_feature, dtype=np.intp)
+    node_tree = np.array(node_tree, dtype=np.intp)
+    thresholds = _raw_thresholds(
+        np.array(node_threshold, dtype=np.float64),
+        mean[node_feature],
+        scale[node_feature],
+        sparse_input=scaler is not None and not scaler.with_mean,
+    )
+    order = np.lexsort((thresholds, node_feature))
+    counts = np.bincount(node_feature, minlength=n_features)
+    threshold_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.intp)
+
+    full = np.full(len(trees) * words, np.uint64(2**64 - 1))
+    tables = np.empty((len(order) + n_features, len(trees) * words), dtype=np.uint64)
+    row = 0
+    for f in range(n_features):
+        current = full.copy()
+        tables[row] = current
+        row += 1
+        for i in order[threshold_offsets[f]:threshold_offsets[f + 1]]:
+            first, end = node_mask[i]
+            for bit in range(first, end):
+                word = node_tree[i] * words + bit // _WORD_BITS
+                current[word] &= ~np.uint64(1 << (bit % _WORD_BITS))
+            tables[row] = current
+            row += 1
+
+    logger.debug(
+        "Скомпилировано деревьев: %d, внутренних узлов: %d, слов маски: %d",
+        len(trees), len(order), words,
+    )
+    return CompiledModel(
+        thresholds=thresholds[order],
+        threshold_offsets=threshold_offsets,
+        tables=tables,
+        leaf_values=leaf_values,
+        init=init,
+        words=words,
+    )
+
+
+def main() -> None:
+    """
+    Точка входа CLI: компилирует модель из regression/resources и сохраняет её рядом.
+
+    Завершает работу с кодом 1 при ошибке.
+    """
+    from .model_io import load_model, save_compiled_model
+
+    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s:%(name)s:%(message)s")
+    try:
+        save_compiled_model(compile_pipeline(load_model()))
+    except (ValueError, OSError) as exc:
+        logger.debug("Ошибка при компиляции модели: %s", exc)
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
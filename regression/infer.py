@@ -0,0 +1,387 @@
+"""
+Предсказание зарплат прямо по CSV-файлу вакансий, без промежуточных x_data.npy и y_data.npy.
+
+Цепочка обработчиков chain_pattern выполняется в режиме transform (словари категорий
+модели, см. model_vocabularies), матрица признаков каждой части файла
+сразу передаётся загруженной в память модели. Файл читается частями, поэтому
+предсказания выводятся до того, как прочитан весь CSV. ParseSalaryHandler
+пропускается, если в файле нет столбца «зп».
+
+Если столбец «зп» есть, с --metrics по ходу того же прохода накапливаются метрики
+качества (см. metrics.MetricsAccumulator), при необходимости по группам и
+с доверительными интервалами.
+
+Интерфейс: python -m regression.infer путь/к/файлу.csv [--chunksize 65536] [--metrics отчёт.json]
+Вывод: список зарплат в рублях (по одному float на строку), как у regression.app.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from chain_pattern.handlers import profiling
+from chain_pattern.handlers.base import Handler
+from chain_pattern.handlers.build_matrices import feature_matrix
+from chain_pattern.handlers.encode_categorical import (
+    EncodeCategoricalHandler,
+    bucket_counts,
+    load_vocabularies,
+    parse_encoding,
+)
+from chain_pattern.handlers.load_csv import LoadCSVHandler
+from chain_pattern.handlers.normalize_columns import NormalizeColumnsHandler
+from chain_pattern.handlers.parse_city import ParseCityHandler
+from chain_pattern.handlers.parse_gender_age import ParseGenderAgeHandler
+from chain_pattern.handlers.parse_salary import ParseSalaryHandler
+
+from .cli import ArgumentParser
+from .metrics import MetricsAccumulator, log_metrics
+from .model_io import get_vocabularies_path
+from .output import write_predictions
+from .predict import BACKENDS, BATCH_SIZE, check_n_features, iter_predictions, load_backend
+
+logger = logging.getLogger(__name__)
+
+# Байт начала файла, по которым оценивается число строк для выбора способа предсказания.
+_ESTIMATE_BYTES = 1 << 16
+
+
+def _columns(csv_path: Path) -> list[str]:
+    """
+    Названия столбцов CSV-файла после NormalizeColumnsHandler.
+    """
+    return NormalizeColumnsHandler().process(pd.read_csv(csv_path, nrows=0)).columns.tolist()
+
+
+def _estimate_rows(csv_path: Path) -> int:
+    """
+    Оценка числа строк CSV-файла по средней длине строк в его начале.
+    """
+    size = csv_path.stat().st_size
+    with open(csv_path, "rb") as file:
+        head = file.read(_ESTIMATE_BYTES)
+    lines = head.count(b"\n")
+    if size <= len(head) or lines == 0:
+        return lines
+    return int(size / (len(head) / lines))
+
+
+def inference_handlers(
+    csv_path: Path,
+    vocabularies: dict[str, list[str]],
+    chunksize: Optional[int] = None,
+    lean: bool = False,
+    encodings: Optional[dict[str, tuple[str, int]]] = None,
+) -> list[Handler]:
+    """
+    Возвращает обработчики цепочки подготовки признаков в режиме transform.
+
+    Те же обработчики, что в pipeline.build_pipeline chain_pattern, без записи матриц;
+    ParseSalaryHandler включается, только если в файле есть столбец «зп».
+    encodings — столбцы, кодируемые в корзины (те же, что при подготовке обучающих данных).
+    """
+    has_salary = "зп" in _columns(csv_path)
+    handlers = [
+        LoadCSVHandler(str(csv_path), chunksize=chunksize, lean=lean),
+        NormalizeColumnsHandler(),
+        ParseGenderAgeHandler(lean=lean),
+        *([ParseSalaryHandler()] if has_salary else []),
+        ParseCityHandler(),
+        EncodeCategoricalHandler(vocabularies, lean=lean, encodings=encodings),
+    ]
+    if not has_salary:
+        logger.debug("Столбца «зп» нет: ParseSalaryHandler пропущен")
+    return handlers
+
+
+def iter_features(
+    csv_path: Path,
+    vocabularies: dict[str, list[str]],
+    chunksize: Optional[int] = BATCH_SIZE,
+    lean: bool = False,
+    group_by: Optional[str] = None,
+    encodings: Optional[dict[str, tuple[str, int]]] = None,
+) -> Iterator[tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]]:
+    """
+    Возвращает по частям CSV-файла матрицу признаков, зарплаты (None без столбца «зп»)
+    и значения столбца group_by (None, если он не задан).
+
+    chunksize — строк в части; None — файл целиком одной частью.
+    group_by — столбец после обработки (например, city или график; коды категорий);
+    значения текстового столбца передаются строками, пропуски — пустой строкой.
+    Признаки совпадают с x_data.npy, построенным chain_pattern в режиме transform;
+    с encodings матрица разреженная, как x_data.npz.
+    Генерирует исключение, если столбца group_by нет.
+    """
+    handlers = inference_handlers(csv_path, vocabularies, chunksize, lean, encodings)
+    buckets = bucket_counts(encodings)
+    for current, following in zip(handlers, handlers[1:]):
+        current.set_next(following)
+    for chunk in handlers[0].handle_chunks([]):
+        if group_by is not None and group_by not in chunk.columns:
+            raise ValueError(f"Нет столбца для группировки: {group_by}")
+        x, _ = feature_matrix(chunk, lean, buckets)
+        y = chunk["salary"].to_numpy(dtype=np.float32) if "salary" in chunk.columns else None
+        groups = _group_values(chunk[group_by]) if group_by is not None else None
+        yield x, y, groups
+
+
+def _group_values(column: pd.Series) -> np.ndarray:
+    """
+    Значения столбца группировки: числовые коды как есть, прочие значения — строками.
+
+    Пропуски текстового столбца заменяются пустой строкой, чтобы массив сортировался
+    (см. MetricsAccumulator.update).
+    """
+    if pd.api.types.is_numeric_dtype(column):
+        return column.to_numpy()
+    return column.astype(str).where(column.notna(), "").to_numpy(dtype=str)
+
+
+def model_vocabularies(version: Optional[str] = None) -> Path:
+    """
+    Словари категорий, сохранённые вместе с моделью: текущей или версией из реестра.
+
+    Для версий, сохранённых без словарей, возвращаются словари текущей модели.
+    """
+    path = get_vocabularies_path(version)
+    if version is not None and not path.is_file():
+        logger.debug("Словари категорий не сохранены с версией %s, используются текущие", version)
+        return get_vocabularies_path()
+    return path
+
+
+def stream_csv_salaries(
+    csv_path: Path,
+    chunksize: Optional[int] = BATCH_SIZE,
+    backend: str = "auto",
+    version: Optional[str] = None,
+    vocabularies_path: Optional[Path] = None,
+    lean: bool = False,
+    metrics: Optional[MetricsAccumulator] = None,
+    group_by: Optional[str] = None,
+    encodings: Optional[dict[str, tuple[str, int]]] = None,
+) -> Iterator[np.ndarray]:
+    """
+    Возвращает предсказанные зарплаты в рублях по частям CSV-файла, в порядке его строк.
+
+    csv_path — CSV-файл в формате выгрузки hh.ru (столбец «зп» не обязателен).
+    chunksize — строк в части (None — файл целиком).
+    backend, version — способ предсказания и версия модели (см. predict.load_backend).
+    vocabularies_path — словари категорий (по умолчанию словари модели, см. model_vocabularies).
+    lean — экономный по памяти режим chain_pattern.
+    metrics — накопитель, в который добавляются фактические и предсказанные зарплаты
+    каждого блока (нужен столбец «зп»); group_by — столбец с кодами групп для него.
+    encodings — столбцы, кодируемые в корзины (см. chain_pattern --encoding).
+
+    Модель и словари загружаются до выдачи первой части.
+    Генерирует исключение при отсутствии файлов, несовместимости признаков
+    или отсутствии столбца «зп» при переданном metrics.
+    """
+    if not csv_path.is_file():
+        raise FileNotFoundError(f"Файл не найден: {csv_path}")
+    if metrics is not None and "зп" not in _columns(csv_path):
+        raise ValueError(f"Для метрик нужен столбец «зп»: {csv_path}")
+    vocabularies = load_vocabularies(vocabularies_path or model_vocabularies(version))
+    model = load_backend(backend, version, _estimate_rows(csv_path))
+    features = iter_features(csv_path, vocabularies, chunksize, lean, group_by, encodings)
+    return _predict_features(model, features, metrics)
+
+
+def _predict_features(
+    model,
+    features: Iterator[tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]],
+    metrics: Optional[MetricsAccumulator],
+) -> Iterator[np.ndarray]:
+    """
+    Предсказывает зарплаты по частям признаков и добавляет блоки в накопитель метрик.
+    """
+    for x, y, groups in features:
+        check_n_features(x, model)
+        start = 0
+        for pred in iter_predictions(model, x):
+            if metrics is not None:
+                stop = start + len(pred)
+                metrics.update(y[start:stop], pred, None if groups is None else groups[start:stop])
+                start = stop
+            yield pred
+
+
+def metrics_report(
+    metrics: MetricsAccumulator,
+    vocabularies: dict[str, list[str]],
+    group_by: Optional[str] = None,
+) -> dict:
+    """
+    Сводка накопителя метрик (MetricsAccumulator.report) с названиями групп.
+
+    Коды категорий столбца group_by заменяются значениями из словаря
+    (-1, пропуск и пустая строка — «неизвестно»), прочие коды записываются строкой.
+    """
+    report = metrics.report()
+    if "groups" in report:
+        labels = vocabularies.get(group_by, [])
+        report["group_by"] = group_by
+        report["groups"] = {
+            _group_label(code, labels): values for code, values in report["groups"].items()
+        }
+    return report
+
+
+def _group_label(code, labels: list[str]) -> str:
+    """
+    Название группы по коду категории.
+    """
+    if isinstance(code, int) and 0 <= code < len(labels):
+        return labels[code]
+    if code == -1 or code == "" or code != code:
+        return "неизвестно"
+    return str(code)
+
+
+def _parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = ArgumentParser(
+        prog="python -m regression.infer",
+        description="Предсказание зарплат по CSV-файлу вакансий без промежуточных .npy-файлов.",
+    )
+    parser.add_argument("csv_path", type=Path, help="путь к CSV-файлу")
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=BATCH_SIZE,
+        help=f"читать файл частями по N строк (по умолчанию {BATCH_SIZE}; 0 — целиком)",
+    )
+    parser.add_argument(
+        "--vocabularies",
+        type=Path,
+        default=None,
+        help="путь к словарям категорий (по умолчанию словари модели или версии --model-version)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="sklearn",
+        help="способ предсказания (по умолчанию sklearn, см. python -m regression.app --help)",
+    )
+    parser.add_argument(
+        "--model-version",
+        default=None,
+        help="версия модели из реестра (python -m regression.model_io list); по умолчанию текущая",
+    )
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        help="экономный по памяти режим подготовки признаков (см. chain_pattern --lean)",
+    )
+    parser.add_argument(
+        "--encoding",
+        action="append",
+        default=[],
+        metavar="СТОЛБЕЦ=hash:N|top:N",
+        help="кодирование столбца в корзины, как при подготовке обучающих данных "
+        "(см. chain_pattern --encoding; можно указать несколько раз)",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        default=None,
+        help="сохранить метрики качества по столбцу «зп» в JSON-файл (считаются в том же проходе)",
+    )
+    parser.add_argument(
+        "--group-by",
+        default=None,
+        help="метрики также по группам столбца после обработки, например city или график",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=0,
+        help="повторов бутстрэпа для 95%%-х доверительных интервалов метрик (по умолчанию 0 — без них)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="зерно генератора бутстрэпа (по умолчанию 0)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help="сохранить время и память обработчиков, load_model и predict в JSON-файл "
+        "и рядом в формате Prometheus (.prom)",
+    )
+    args = parser.parse_args()
+    if args.chunksize < 0:
+        parser.error("--chunksize не может быть отрицательным")
+    if args.bootstrap < 0:
+        parser.error("--bootstrap не может быть отрицательным")
+    if args.metrics is None and (args.group_by is not None or args.bootstrap):
+        parser.error("--group-by и --bootstrap используются только с --metrics")
+    try:
+        args.encoding = dict(parse_encoding(spec) for spec in args.encoding)
+    except ValueError as exc:
+        parser.error(str(exc))
+    return args
+
+
+def main() -> None:
+    """
+    Точка входа CLI.
+
+    Выводит предсказанные зарплаты (по одному значению на строку) по мере обработки
+    частей CSV-файла; с --metrics сохраняет метрики качества. Завершает работу с кодом 1 при неверных аргументах или ошибке.
+    """
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="%(levelname)s:%(name)s:%(message)s",
+    )
+    args = _parse_args()
+    profiler = profiling.enable() if args.profile is not None else None
+    metrics = (
+        MetricsAccumulator(bootstrap=args.bootstrap, seed=args.seed)
+        if args.metrics is not None
+        else None
+    )
+    try:
+        batches = stream_csv_salaries(
+            args.csv_path.resolve(),
+            chunksize=args.chunksize or None,
+            backend=args.backend,
+            version=args.model_version,
+            vocabularies_path=args.vocabularies,
+            lean=args.lean,
+            metrics=metrics,
+            group_by=args.group_by,
+            encodings=args.encoding,
+        )
+        write_predictions(batches)
+        if metrics is not None:
+            vocabularies = load_vocabularies(
+                args.vocabularies or model_vocabularies(args.model_version)
+            )
+            report = metrics_report(metrics, vocabularies, args.group_by)
+            log_metrics(report["metrics"], prefix="Метрики: ")
+            args.metrics.write_text(
+                json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+        if profiler is not None:
+            profiling.disable()
+            profiler.save(args.profile, prefix="inference_stage")
+    except (ValueError, OSError) as exc:
+        logger.debug("Ошибка при предсказании: %s", exc)
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,280 @@
 """Вычисление метрик качества регрессии."""
 
 import logging
+import math
+from typing import Optional
 
 import numpy as np
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
 logger = logging.getLogger(__name__)
 
+METRIC_NAMES = ("mae", "mse", "rmse", "r2")
+# Столбцы состояния накопителя: число объектов, среднее и сумма квадратов отклонений
+# от среднего фактических значений, средняя абсолютная и средняя квадратичная ошибка.
+_N, _MEAN, _M2, _MAE, _MSE = range(5)
+# Наибольшее число весов бутстрэпа (строк × повторов) в одном блоке вычислений.
+_BOOTSTRAP_BLOCK = 1 << 22
+# Веса бутстрэпа по 16-битному случайному числу: квантили распределения Пуассона(1)
+# в серединах 65536 равных интервалов (вероятности значений верны до 1/65536).
+_POISSON_TABLE = np.searchsorted(
+    np.cumsum([math.exp(-1) / math.factorial(k) for k in range(20)]),
+    (np.arange(1 << 16) + 0.5) / (1 << 16),
+    side="right",
+).astype(np.float64)
+
+
+def _batch_state(y_true: np.ndarray, error: np.ndarray, inverse: np.ndarray, k: int) -> np.ndarray:
+    """
+    Состояние накопителя по одному пакету для k групп (inverse — номер группы строки).
+    """
+    state = np.empty((k, 5))
+    n = np.bincount(inverse, minlength=k).astype(np.float64)
+    state[:, _N] = n
+    state[:, _MEAN] = np.bincount(inverse, y_true, minlength=k) / n
+    state[:, _M2] = np.bincount(inverse, (y_true - state[inverse, _MEAN]) ** 2, minlength=k)
+    state[:, _MAE] = np.bincount(inverse, np.abs(error), minlength=k) / n
+    state[:, _MSE] = np.bincount(inverse, error * error, minlength=k) / n
+    return state
+
+
+def _merge(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Объединяет состояния накопителя построчно (формулы Чана для среднего и дисперсии).
+
+    Средние обновляются через разность со средним пакета, поэтому порядок величин
+    накопленных значений не растёт с числом объектов.
+    """
+    merged = np.empty_like(a)
+    n = a[:, _N] + b[:, _N]
+    share = np.divide(b[:, _N], n, out=np.zeros_like(n), where=n > 0)
+    delta = b[:, _MEAN] - a[:, _MEAN]
+    merged[:, _N] = n
+    merged[:, _MEAN] = a[:, _MEAN] + delta * share
+    merged[:, _M2] = a[:, _M2] + b[:, _M2] + delta * delta * a[:, _N] * share
+    merged[:, _MAE] = a[:, _MAE] + (b[:, _MAE] - a[:, _MAE]) * share
+    merged[:, _MSE] = a[:, _MSE] + (b[:, _MSE] - a[:, _MSE]) * share
+    return merged
+
+
+def _r2(sse: np.ndarray, sst: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """
+    R² как в sklearn.metrics.r2_score: 1.0 при нулевых sse и sst, 0.0 при нулевом sst,
+    nan меньше чем для двух объектов.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = np.where(sst > 0, 1.0 - sse / sst, np.where(sse > 0, 0.0, 1.0))
+    return np.where(n >= 2, r2, np.nan)
+
+
+def _state_metrics(state: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Метрики по строкам состояния накопителя.
+    """
+    n, mse = state[:, _N], state[:, _MSE]
+    return {
+        "mae": state[:, _MAE],
+        "mse": mse,
+        "rmse": np.sqrt(mse),
+        "r2": _r2(mse * n, state[:, _M2], n),
+    }
+
+
+class MetricsAccumulator:
+    """
+    Накапливает метрики регрессии (MAE, MSE, RMSE, R²) по пакетам (y_true, y_pred) за один проход.
+
+    Для каждого пакета вычисляются его средние и сумма квадратов отклонений, которые
+    объединяются с накопленными (формулы Чана), поэтому массивы целиком в памяти
+    не нужны, а результат не зависит от разбиения на пакеты (с точностью до округления).
+
+    С группами (коды города, графика и т. п., переданные в update) метрики считаются
+    и по каждой группе. С bootstrap > 0 строятся доверительные интервалы метрик по
+    всем объектам пуассоновским бутстрэпом: каждой строке в каждом из bootstrap повторов
+    назначается вес Пуассона(1) (по таблице квантилей), и взвешенные суммы всех повторов
+    вычисляются одним матричным умножением на пакет. Веса строки зависят только от seed
+    и номера строки, поэтому интервалы воспроизводимы при любом разбиении на пакеты.
+    """
+
+    def __init__(
+        self,
+        bootstrap: int = 0,
+        confidence: float = 0.95,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        bootstrap — число повторов бутстрэпа (0 — без доверительных интервалов).
+        confidence — уровень доверия интервалов, от 0 до 1.
+        seed — зерно генератора весов бутстрэпа.
+        """
+        if bootstrap < 0:
+            raise ValueError("Число повторов бутстрэпа не может быть отрицательным.")
+        if not 0 < confidence < 1:
+            raise ValueError("Уровень доверия должен быть между 0 и 1.")
+        self._state = np.zeros((1, 5))
+        self._group_keys: Optional[np.ndarray] = None
+        self._group_state = np.zeros((0, 5))
+        self._bootstrap = bootstrap
+        self._confidence = confidence
+        self._rng = np.random.default_rng(seed)
+        # Взвешенные суммы повторов: вес, отклонение y_true от _shift и его квадрат,
+        # абсолютная и квадратичная ошибка. Сдвиг на среднее первого пакета
+        # уменьшает потерю точности в сумме квадратов отклонений.
+        self._sums = np.zeros((bootstrap, 5))
+        self._shift: Optional[float] = None
+
+    @property
+    def rows(self) -> int:
+        """
+        Число накопленных объектов.
+        """
+        return int(self._state[0, _N])
+
+    def update(
+        self,
+        y_true: np.ndarray,
+        y_pred: np.ndarray,
+        groups: Optional[np.ndarray] = None,
+    ) -> "MetricsAccumulator":
+        """
+        Добавляет пакет фактических и предсказанных значений.
+
+        groups — коды групп строк пакета (той же длины, числа или строки) для метрик
+        по группам; передаётся либо в каждом пакете, либо ни в одном.
+        Возвращает сам накопитель.
+        Генерирует исключение при несовпадении длин массивов.
+        """
+        y_true = np.asarray(y_true, dtype=np.float64).ravel()
+        y_pred = np.asarray(y_pred, dtype=np.float64).ravel()
+        if y_true.size != y_pred.size:
+            raise ValueError(
+                f"Длины массивов не совпадают: y_true {y_true.size}, y_pred {y_pred.size}."
+            )
+        if groups is not None and len(groups) != y_true.size:
+            raise ValueError(
+                f"Длина groups ({len(groups)}) не совпадает с длиной y_true ({y_true.size})."
+            )
+        if (groups is None) != (self._group_keys is None) and self.rows:
+            raise ValueError("Коды групп нужно передавать в каждом пакете либо ни в одном.")
+        if y_true.size == 0:
+            return self
+        error = y_pred - y_true
+        self._state = _merge(
+            self._state, _batch_state(y_true, error, np.zeros(y_true.size, dtype=np.intp), 1)
+        )
+        if groups is not None:
+            self._update_groups(y_true, error, np.asarray(groups))
+        if self._bootstrap:
+            self._update_bootstrap(y_true, error)
+        return self
+
+    def _update_groups(self, y_true: np.ndarray, error: np.ndarray, groups: np.ndarray) -> None:
+        """
+        Объединяет состояние групп с состоянием групп пакета.
+        """
+        keys, inverse = np.unique(groups, return_inverse=True)
+        batch = _batch_state(y_true, error, inverse.ravel(), len(keys))
+        if self._group_keys is None:
+            self._group_keys, self._group_state = keys, batch
+            return
+        known = np.union1d(self._group_keys, keys)
+        if len(known) != len(self._group_keys):
+            state = np.zeros((len(known), 5))
+            state[np.searchsorted(known, self._group_keys)] = self._group_state
+            self._group_keys, self._group_state = known, state
+        index = np.searchsorted(self._group_keys, keys)
+        self._group_state[index] = _merge(self._group_state[index], batch)
+
+    def _update_bootstrap(self, y_true: np.ndarray, error: np.ndarray) -> None:
+        """
+        Добавляет пакет к взвешенным суммам всех повторов бутстрэпа.
+        """
+        if self._shift is None:
+            self._shift = float(y_true.mean())
+        deviation = y_true - self._shift
+        columns = np.column_stack(
+            [np.ones_like(error), deviation, deviation * deviation, np.abs(error), error * error]
+        )
+        # На строку берётся целое число 64-битных случайных чисел (по 4 веса в каждом),
+        # чтобы веса строки не зависели от разбиения на пакеты и блоки.
+        words = -(-self._bootstrap // 4)
+        step = max(1, _BOOTSTRAP_BLOCK // self._bootstrap)
+        for start in range(0, len(columns), step):
+            block = columns[start:start + step]
+            bits = self._rng.bit_generator.random_raw((len(block), words))
+            weights = _POISSON_TABLE[bits.view(np.uint16)[:, :self._bootstrap]]
+            self._sums += weights.T @ block
+
+    def metrics(self) -> dict[str, float]:
+        """
+        Возвращает метрики по всем объектам: словарь с ключами "mae", "mse", "rmse", "r2".
+
+        Генерирует исключение, если не добавлено ни одного объекта.
+        """
+        if not self.rows:
+            raise ValueError("Массивы не должны быть пустыми.")
+        return {name: float(values[0]) for name, values in _state_metrics(self._state).items()}
+
+    def group_metrics(self) -> dict:
+        """
+        Возвращает метрики по группам: код группы -> число объектов и метрики.
+
+        Коды — значения Python (числа или строки); пропуски числовых кодов — NaN.
+        Пустой словарь, если коды групп не передавались.
+        """
+        if self._group_keys is None:
+            return {}
+        values = _state_metrics(self._group_state)
+        return {
+            key.item() if isinstance(key, np.generic) else key: {
+                "rows": int(self._group_state[i, _N]),
+                **{name: float(values[name][i]) for name in METRIC_NAMES},
+            }
+            for i, key in enumerate(self._group_keys)
+        }
+
+    def confidence_intervals(self) -> dict[str, tuple[float, float]]:
+        """
+        Возвращает доверительные интервалы метрик (перцентильный бутстрэп):
+        метрика -> (нижняя граница, верхняя граница).
+
+        Генерирует исключение, если накопитель создан без бутстрэпа или пуст.
+        """
+        if not self._bootstrap:
+            raise ValueError("Доверительные интервалы требуют bootstrap > 0.")
+        if not self.rows:
+            raise ValueError("Массивы не должны быть пустыми.")
+        weight, deviation, squares, abs_error, sq_error = self._sums.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mse = sq_error / weight
+            values = {
+                "mae": abs_error / weight,
+                "mse": mse,
+                "rmse": np.sqrt(mse),
+                "r2": _r2(sq_error, squares - deviation * deviation / weight, weight),
+            }
+        tail = (1 - self._confidence) / 2 * 100
+        intervals = {}
+        for name in METRIC_NAMES:
+            low, high = np.nanpercentile(values[name], [tail, 100 - tail])
+            intervals[name] = (float(low), float(high))
+        return intervals
+
+    def report(self) -> dict:
+        """
+        Возвращает сводку для сохранения в JSON: число объектов, метрики,
+        доверительные интервалы (при бутстрэпе) и метрики по группам (если переданы коды).
+        """
+        report = {"rows": self.rows, "metrics": self.metrics()}
+        if self._bootstrap:
+            report["confidence"] = self._confidence
+            report["bootstrap"] = self._bootstrap
+            report["confidence_intervals"] = {
+                name: list(bounds) for name, bounds in self.confidence_intervals().items()
+            }
+        if self._group_keys is not None:
+            report["groups"] = self.group_metrics()
+        return report
+
 
 def compute_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> dict[str, float]:
     """
@@ -23,18 +291,8 @@ def compute_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> dict[str, float]:
     """
     y_true = np.asarray(y_true, dtype=np.float64)
     y_pred = np.asarray(y_pred, dtype=np.float64)
-    if y_true.size != y_pred.size:
-        raise ValueError(
-            f"Длины массивов не совпадают: y_true {y_true.size}, y_pred {y_pred.size}."
-        )
-    if y_true.size == 0:
-        raise ValueError("Массивы не должны быть пустыми.")
     logger.debug("Вычисление метрик по %d объектам", y_true.size)
-    mae = float(mean_absolute_error(y_true, y_pred))
-    mse = float(mean_squared_error(y_true, y_pred))
-    rmse = float(np.sqrt(mse))
-    r2 = float(r2_score(y_true, y_pred))
-    return {"mae": mae, "mse": mse, "rmse": rmse, "r2": r2}
+    return MetricsAccumulator().update(y_true, y_pred).metrics()
 
 
 def log_metrics(metrics: dict[str, float], prefix: str = "") -> None:
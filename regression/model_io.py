@@ -1,15 +1,60 @@
-"""Загрузка и сохранение весов регрессионной модели в папке resources пакета regression."""
+"""
+Загрузка и сохранение весов регрессионной модели в папке resources пакета regression.
 
+Текущая модель хранится в resources/salary_model.joblib (и salary_model.npz)
+вместе со словарями категорий, которыми закодированы её признаки (vocabularies.json).
+Реестр версий: каждая обученная модель сохраняется также в resources/models/<версия>/
+вместе со своими словарями категорий и metadata.json (отпечаток обучающих данных,
+метрики, число признаков), поэтому несколько версий можно хранить рядом, сравнивать
+и делать текущей.
+
+Пайплайн загружается через joblib с mmap_mode="r": в память отображаются только
+массивы NumPy, сохранённые в файле отдельно (например, параметры StandardScaler);
+узлы деревьев sklearn при загрузке копируются в память процесса. Загруженные модели
+кешируются в процессе (LRU); перед повторным использованием сверяются время
+изменения и размер файла.
+
+joblib и sklearn импортируются только при загрузке и сохранении пайплайна sklearn:
+загрузка скомпилированной модели требует лишь NumPy, что сокращает запуск CLI.
+
+Интерфейс: python -m regression.model_io list | activate <версия>
+"""
+
+from __future__ import annotations
+
+import json
 import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, Optional, Union
 
-import joblib
-from sklearn.pipeline import Pipeline
+import numpy as np
+
+from chain_pattern.handlers.profiling import profiled
+
+from .cli import ArgumentParser
+from .compiled import CompiledModel
+
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
 
 logger = logging.getLogger(__name__)
 
 MODEL_FILENAME = "salary_model.joblib"
+COMPILED_FILENAME = "salary_model.npz"
+MODELS_DIRNAME = "models"
+METADATA_FILENAME = "metadata.json"
+VOCABULARIES_FILENAME = "vocabularies.json"
+# Наибольшее число загруженных моделей в кеше процесса.
+CACHE_SIZE = 4
+
+_cache: OrderedDict[Path, tuple[tuple[int, int], object]] = OrderedDict()
+_cache_lock = threading.Lock()
 
 
 def _resources_dir() -> Path:
@@ -19,31 +64,136 @@ def _resources_dir() -> Path:
     return Path(__file__).resolve().parent / "resources"
 
 
-def get_model_path() -> Path:
+def _models_dir() -> Path:
+    """
+    Возвращает путь к папке реестра версий resources/models.
+    """
+    return _resources_dir() / MODELS_DIRNAME
+
+
+def _version_dir(version: str) -> Path:
+    """
+    Возвращает папку версии модели.
+
+    Генерирует исключение при неизвестной версии.
+    """
+    path = _models_dir() / version
+    if version in ("", ".", "..") or "/" in version or "\\" in version or not path.is_dir():
+        known = ", ".join(meta["version"] for meta in list_versions()) or "нет"
+        raise FileNotFoundError(f"Версия модели не найдена: {version}. Доступные версии: {known}.")
+    return path
+
+
+def _model_dir(version: Optional[str]) -> Path:
     """
-    Возвращает путь к файлу весов модели в папке resources.
+    Папка текущей модели (version=None) или версии из реестра.
+    """
+    return _resources_dir() if version is None else _version_dir(version)
+
+
+def get_model_path(version: Optional[str] = None) -> Path:
+    """
+    Возвращает путь к файлу весов модели.
+
+    Без version — текущая модель regression/resources/salary_model.joblib,
+    иначе — файл версии из реестра.
+    """
+    return _model_dir(version) / MODEL_FILENAME
+
+
+def get_vocabularies_path(version: Optional[str] = None) -> Path:
+    """
+    Возвращает путь к словарям категорий текущей модели или версии из реестра
+    (см. chain_pattern, режим fit).
+    """
+    return _model_dir(version) / VOCABULARIES_FILENAME
+
 
-    Результат указывает на salary_model.joblib в regression/resources.
+def _copy_file(source: Path, target: Path) -> None:
+    """
+    Копирует файл; копия записывается рядом и заменяет прежний файл одной операцией.
     """
-    return _resources_dir() / MODEL_FILENAME
+    partial = target.with_name(f"{target.name}.{os.getpid()}.part")
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source, partial)
+        os.replace(partial, target)
+    finally:
+        partial.unlink(missing_ok=True)
 
 
-def load_model() -> Pipeline:
+def _stamp(path: Path) -> tuple[int, int]:
+    """
+    Время изменения (нс) и размер файла: признак того, что файл не перезаписан.
+    """
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _cached(path: Path, stamp: tuple[int, int]):
+    """
+    Возвращает модель из кеша процесса, если файл не изменился с её загрузки.
+    """
+    with _cache_lock:
+        entry = _cache.get(path)
+        if entry is None:
+            return None
+        if entry[0] != stamp:
+            del _cache[path]
+            return None
+        _cache.move_to_end(path)
+        return entry[1]
+
+
+def _remember(path: Path, stamp: tuple[int, int], model) -> None:
+    """
+    Добавляет модель в кеш процесса и вытесняет давно не использованные.
+    """
+    with _cache_lock:
+        _cache[path] = (stamp, model)
+        _cache.move_to_end(path)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def clear_model_cache() -> None:
+    """
+    Очищает кеш загруженных моделей процесса.
+    """
+    with _cache_lock:
+        _cache.clear()
+
+
+@profiled("load_model")
+def load_model(version: Optional[str] = None, cache: bool = True) -> Pipeline:
     """
     Загружает обученный пайплайн (преобразования + модель) из папки regression/resources.
 
+    version — версия из реестра (см. list_versions); по умолчанию текущая модель.
+    cache — использовать кеш процесса: повторный вызов возвращает тот же объект,
+    пока файл не изменился, а массивы модели отображаются в память только для чтения.
+    Для изменения модели (дообучения) нужна отдельная копия: cache=False.
+
     Возвращает обученный пайплайн с методом predict.
     Генерирует исключение при отсутствии файла, повреждении или несовместимости объекта.
     """
-    path = get_model_path()
-    logger.debug("Загрузка модели из %s", path)
+    path = get_model_path(version)
     if not path.is_file():
         raise FileNotFoundError(
             f"Файл весов модели не найден: {path}. "
             "Сначала выполните обучение: python -m regression.train <путь_к_папке_с_x_data_и_y_data>"
         )
+    stamp = _stamp(path)
+    if cache:
+        pipeline = _cached(path, stamp)
+        if pipeline is not None:
+            logger.debug("Модель %s взята из кеша процесса", path)
+            return pipeline
+    logger.debug("Загрузка модели из %s", path)
+    import joblib
+
     try:
-        pipeline = joblib.load(path)
+        pipeline = joblib.load(path, mmap_mode="r" if cache else None)
     except Exception as exc:
         raise ValueError(
             f"Не удалось загрузить модель из {path}: файл повреждён или несовместим."
@@ -56,25 +206,291 @@ def load_model() -> Pipeline:
         raise ValueError(
             "Загруженный объект не имеет атрибута n_features_in_ (несовместимая версия модели)."
         )
+    if cache:
+        _remember(path, stamp, pipeline)
     logger.debug("Модель успешно загружена")
     return pipeline
 
 
-def save_model(pipeline: Union[Pipeline, object]) -> None:
+def _dump_model(pipeline: Union[Pipeline, object], path: Path) -> None:
+    """
+    Сохраняет пайплайн через joblib без сжатия (массивы можно отображать в память).
+
+    Файл записывается рядом и заменяет прежний одной операцией, поэтому процессы,
+    отобразившие прежний файл, продолжают работать.
+    """
+    import joblib
+
+    partial = path.with_name(f"{path.name}.{os.getpid()}.part")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump(pipeline, partial)
+        os.replace(partial, path)
+    except OSError as exc:
+        raise OSError(
+            f"Не удалось сохранить модель в {path}: {exc}"
+        ) from exc
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def save_model(pipeline: Union[Pipeline, object], vocabularies: Optional[Path] = None) -> None:
     """
     Сохраняет обученный пайплайн в папку regression/resources.
 
     pipeline — обученный пайплайн (StandardScaler + регрессор) для сохранения.
+    vocabularies — файл словарей категорий обучающих данных; копируется рядом
+    с моделью (без него словари текущей модели не меняются).
     Генерирует исключение при сбое создания папки или записи файла.
     """
-    resources = _resources_dir()
-    path = resources / MODEL_FILENAME
+    path = get_model_path()
     logger.debug("Сохранение модели в %s", path)
+    _dump_model(pipeline, path)
+    if vocabularies is not None:
+        _copy_file(vocabularies, get_vocabularies_path())
+    logger.debug("Модель успешно сохранена")
+
+
+def get_compiled_model_path(version: Optional[str] = None) -> Path:
+    """
+    Возвращает путь к файлу скомпилированной модели (salary_model.npz)
+    текущей модели или версии из реестра.
+    """
+    return _model_dir(version) / COMPILED_FILENAME
+
+
+@profiled("load_compiled_model")
+def load_compiled_model(version: Optional[str] = None) -> CompiledModel:
+    """
+    Загружает скомпилированную модель (массивы деревьев) из папки regression/resources.
+
+    version — версия из реестра; по умолчанию текущая модель.
+    Возвращает CompiledModel с методом predict.
+    Генерирует исключение при отсутствии или повреждении файла.
+    """
+    path = get_compiled_model_path(version)
+    logger.debug("Загрузка скомпилированной модели из %s", path)
+    if not path.is_file():
+        raise FileNotFoundError(
+            f"Файл скомпилированной модели не найден: {path}. "
+            "Выполните компиляцию: python -m regression.compiled"
+        )
+    stamp = _stamp(path)
+    model = _cached(path, stamp)
+    if model is not None:
+        return model
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            model = CompiledModel.from_arrays(arrays)
+    except Exception as exc:
+        raise ValueError(
+            f"Не удалось загрузить скомпилированную модель из {path}: файл повреждён или несовместим."
+        ) from exc
+    _remember(path, stamp, model)
+    logger.debug("Скомпилированная модель успешно загружена")
+    return model
+
+
+def _save_compiled(model: CompiledModel, path: Path) -> None:
     try:
-        resources.mkdir(parents=True, exist_ok=True)
-        joblib.dump(pipeline, path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, **model.to_arrays())
     except OSError as exc:
         raise OSError(
-            f"Не удалось сохранить модель в {path}: {exc}"
+            f"Не удалось сохранить скомпилированную модель в {path}: {exc}"
         ) from exc
-    logger.debug("Модель успешно сохранена")
+
+
+def save_compiled_model(model: CompiledModel) -> None:
+    """
+    Сохраняет скомпилированную модель в папку regression/resources.
+
+    Генерирует исключение при сбое создания папки или записи файла.
+    """
+    path = get_compiled_model_path()
+    logger.debug("Сохранение скомпилированной модели в %s", path)
+    _save_compiled(model, path)
+    logger.debug("Скомпилированная модель успешно сохранена")
+
+
+def compiled_model_is_current(version: Optional[str] = None) -> bool:
+    """
+    Есть ли скомпилированная модель, сохранённая не раньше пайплайна sklearn.
+
+    Обучение сохраняет обе версии или удаляет скомпилированную, поэтому более старый
+    salary_model.npz относится к предыдущей модели и не используется.
+    """
+    compiled = get_compiled_model_path(version)
+    if not compiled.is_file():
+        return False
+    model = get_model_path(version)
+    return not model.is_file() or compiled.stat().st_mtime >= model.stat().st_mtime
+
+
+def delete_compiled_model() -> None:
+    """
+    Удаляет скомпилированную модель из папки regression/resources, если она есть.
+
+    Вызывается, когда сохранённая модель не поддерживает компиляцию, чтобы не оставить
+    скомпилированную версию предыдущей модели.
+    """
+    path = get_compiled_model_path()
+    if path.is_file():
+        logger.debug("Удаление скомпилированной модели %s", path)
+        path.unlink()
+
+
+def _version_number(version: str) -> int:
+    """
+    Номер версии вида v<N> (0 для имён другого вида).
+    """
+    return int(version[1:]) if version[:1] == "v" and version[1:].isdigit() else 0
+
+
+def list_versions() -> list[dict]:
+    """
+    Возвращает метаданные всех версий реестра по возрастанию номера.
+    """
+    root = _models_dir()
+    if not root.is_dir():
+        return []
+    versions = []
+    for path in root.iterdir():
+        metadata = path / METADATA_FILENAME
+        if not metadata.is_file():
+            continue
+        try:
+            versions.append(json.loads(metadata.read_text(encoding="utf-8")))
+        except (OSError, ValueError) as exc:
+            logger.debug("Пропуск версии %s: %s", path.name, exc)
+    return sorted(versions, key=lambda meta: _version_number(meta.get("version", "")))
+
+
+def load_metadata(version: str) -> dict:
+    """
+    Возвращает метаданные версии: номер, время создания, число признаков,
+    отпечаток обучающих данных, метрики и прочие сведения об обучении.
+
+    Генерирует исключение при неизвестной версии или повреждённом файле.
+    """
+    path = _version_dir(version) / METADATA_FILENAME
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        raise ValueError(f"Не удалось прочитать метаданные версии {version}: {exc}") from exc
+
+
+def _json_value(value):
+    """
+    Преобразует скаляры NumPy в значения Python для JSON.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Значение типа {type(value).__name__} не сериализуется в JSON.")
+
+
+def register_model(
+    pipeline: Union[Pipeline, object],
+    compiled: Optional[CompiledModel] = None,
+    metadata: Optional[dict] = None,
+    vocabularies: Optional[Path] = None,
+) -> str:
+    """
+    Сохраняет обученный пайплайн новой версией реестра.
+
+    compiled — скомпилированная версия модели (если есть).
+    vocabularies — словари категорий, которыми закодированы признаки модели;
+    копируются в папку версии.
+    metadata — сведения об обучении: отпечаток данных ("data_fingerprint"),
+    метрики ("metrics") и др.; номер версии, время создания и число признаков
+    добавляются автоматически.
+    Возвращает номер версии (v1, v2, ...).
+    Генерирует исключение при сбое записи.
+    """
+    root = _models_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    number = max((_version_number(path.name) for path in root.iterdir()), default=0)
+    while True:
+        number += 1
+        version = f"v{number}"
+        try:
+            (root / version).mkdir()
+            break
+        except FileExistsError:
+            continue
+    directory = root / version
+    try:
+        _dump_model(pipeline, directory / MODEL_FILENAME)
+        if compiled is not None:
+            _save_compiled(compiled, directory / COMPILED_FILENAME)
+        if vocabularies is not None:
+            _copy_file(vocabularies, directory / VOCABULARIES_FILENAME)
+        record = {
+            **(metadata or {}),
+            "version": version,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "n_features": int(getattr(pipeline, "n_features_in_", 0)),
+            "model": type(getattr(pipeline, "steps", [(None, pipeline)])[-1][1]).__name__,
+            "compiled": compiled is not None,
+        }
+        (directory / METADATA_FILENAME).write_text(
+            json.dumps(record, ensure_ascii=False, indent=2, default=_json_value), encoding="utf-8"
+        )
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    logger.debug("Модель зарегистрирована как версия %s", version)
+    return version
+
+
+def activate_version(version: str) -> None:
+    """
+    Делает версию реестра текущей моделью (копирует её файлы в regression/resources).
+
+    Словари категорий копируются, если они сохранены с версией; иначе текущие не меняются.
+    Генерирует исключение при неизвестной версии или сбое записи.
+    """
+    directory = _version_dir(version)
+    resources = _resources_dir()
+    for filename in (MODEL_FILENAME, COMPILED_FILENAME):
+        source = directory / filename
+        target = resources / filename
+        if not source.is_file():
+            target.unlink(missing_ok=True)
+            continue
+        _copy_file(source, target)
+    vocabularies = directory / VOCABULARIES_FILENAME
+    if vocabularies.is_file():
+        _copy_file(vocabularies, get_vocabularies_path())
+    logger.debug("Текущая модель: версия %s", version)
+
+
+def main() -> None:
+    """
+    Точка входа CLI реестра: list — версии с метриками, activate — сделать версию текущей.
+
+    Завершает работу с кодом 1 при ошибке.
+    """
+    parser = ArgumentParser(
+        prog="python -m regression.model_io",
+        description="Реестр версий модели предсказания зарплат.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="вывести версии и их метаданные (JSON)")
+    activate = commands.add_parser("activate", help="сделать версию текущей моделью")
+    activate.add_argument("version", help="версия реестра, например v3")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s:%(name)s:%(message)s")
+    try:
+        if args.command == "list":
+            print(json.dumps(list_versions(), ensure_ascii=False, indent=2))
+        else:
+            activate_version(args.version)
+    except (ValueError, OSError) as exc:
+        logger.debug("Ошибка реестра: %s", exc)
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
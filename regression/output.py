@@ -0,0 +1,176 @@
+"""
+Запись предсказаний regression.app в файл или стандартный вывод.
+
+Форматы (OUTPUT_FORMATS):
+- text — по одному значению на строку в записи str(float), как при выводе print
+  (формат по умолчанию);
+- npy — вектор float64 в формате .npy (np.load);
+- f32 — сырые значения float32 с порядком байтов little-endian, без заголовка;
+- csv — столбец salary с CSV_DECIMALS знаками после запятой.
+
+Каждый блок предсказаний форматируется целиком и записывается одним вызовом write;
+значения не превращаются в объекты Python, кроме формата text, запись которого
+повторяет str(float). Числа CSV собираются векторно из цифр целой части
+округлённых значений.
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional
+
+import numpy as np
+
+OUTPUT_FORMATS = ("text", "npy", "f32", "csv")
+# Формат по расширению файла --output; при другом расширении используется text.
+SUFFIX_FORMATS = {".npy": "npy", ".f32": "f32", ".csv": "csv"}
+# Буфер записи файла предсказаний, байт.
+WRITE_BUFFER = 1 << 22
+CSV_HEADER = b"salary\n"
+CSV_DECIMALS = 2
+# Наибольшее по модулю значение CSV при CSV_DECIMALS знаках: значение, умноженное
+# на 10 ** CSV_DECIMALS, округляется до целого, точно представимого в float64 (меньше 2 ** 53).
+# Выше него младшие цифры теряются: 1e15 + 0.25 записалось бы как 1000000000000000.32.
+CSV_MAX_ABS = 9e13
+
+_DIGITS = np.frombuffer(b"0123456789", dtype=np.uint8)
+
+
+def output_format(path: Optional[str], fmt: Optional[str] = None) -> str:
+    """
+    Формат записи: явно заданный fmt или определённый по расширению path (text по умолчанию).
+    """
+    if fmt is not None:
+        return fmt
+    if path is None or path == "-":
+        return "text"
+    return SUFFIX_FORMATS.get(Path(path).suffix.lower(), "text")
+
+
+def format_text(pred: np.ndarray) -> bytes:
+    """
+    Значения по одному на строку в записи str(float), как у print.
+    """
+    if not len(pred):
+        return b""
+    return ("\n".join(map(str, pred.tolist())) + "\n").encode("ascii")
+
+
+def format_csv(pred: np.ndarray, decimals: int = CSV_DECIMALS) -> bytes:
+    """
+    Строки CSV с decimals знаками после запятой, без заголовка.
+
+    Значения округляются до decimals знаков, раскладываются на цифры массивом
+    (блок x ширина самого длинного числа) и собираются в байты маской значащих символов.
+    Генерирует исключение при бесконечных, пропущенных или слишком больших значениях.
+    """
+    if not len(pred):
+        return b""
+    limit = CSV_MAX_ABS * 10.0 ** (CSV_DECIMALS - decimals)
+    scaled = np.rint(np.asarray(pred, dtype=np.float64) * 10.0 ** decimals)
+    if not np.isfinite(scaled).all() or np.abs(scaled).max() >= limit * 10.0 ** decimals:
+        raise ValueError(
+            f"Предсказания вне диапазона записи CSV (конечные значения меньше {limit:g} по модулю)."
+        )
+    values = scaled.astype(np.int64)
+    magnitude = np.abs(values)
+    width = max(len(str(int(magnitude.max()))), decimals + 1)
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    digits = _DIGITS[magnitude[:, None] // powers % 10]
+    integer = width - decimals
+    # Ведущие нули целой части отбрасываются, последняя цифра целой части остаётся всегда.
+    significant = np.maximum.accumulate(digits[:, :integer - 1] != ord("0"), axis=1)
+    fractional = 1 + decimals if decimals else 0
+    chars = np.empty((len(values), 1 + integer + fractional + 1), dtype=np.uint8)
+    keep = np.ones(chars.shape, dtype=bool)
+    chars[:, 0] = ord("-")
+    keep[:, 0] = values < 0
+    chars[:, 1:1 + integer] = digits[:, :integer]
+    keep[:, 1:integer] = significant
+    if decimals:
+        chars[:, 1 + integer] = ord(".")
+        chars[:, 2 + integer:-1] = digits[:, integer:]
+    chars[:, -1] = ord("\n")
+    return chars[keep].tobytes()
+
+
+class PredictionWriter:
+    """
+    Записывает блоки предсказаний в выбранном формате в открытый двоичный поток.
+
+    rows — общее число предсказаний; обязательно для формата npy (заголовок .npy
+    записывается до первого блока) и сверяется с записанным в close.
+    """
+
+    def __init__(self, stream: BinaryIO, fmt: str = "text", rows: Optional[int] = None) -> None:
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Неизвестный формат вывода: {fmt}. Допустимо: {', '.join(OUTPUT_FORMATS)}.")
+        if fmt == "npy" and rows is None:
+            raise ValueError("Для формата npy нужно заранее известное число предсказаний.")
+        self._stream = stream
+        self._fmt = fmt
+        self._rows = rows
+        self.written = 0
+        if fmt == "npy":
+            header = {"descr": "<f8", "fortran_order": False, "shape": (rows,)}
+            np.lib.format.write_array_header_1_0(stream, header)
+        elif fmt == "csv":
+            stream.write(CSV_HEADER)
+
+    def write(self, pred: np.ndarray) -> None:
+        """
+        Дописывает блок предсказаний.
+        """
+        if self._fmt == "text":
+            self._stream.write(format_text(pred))
+        elif self._fmt == "csv":
+            self._stream.write(format_csv(pred))
+        else:
+            dtype = "<f4" if self._fmt == "f32" else "<f8"
+            self._stream.write(np.ascontiguousarray(pred, dtype=dtype).data)
+        self.written += len(pred)
+
+    def close(self) -> None:
+        """
+        Проверяет число записанных предсказаний.
+
+        Генерирует исключение, если оно не совпадает с заявленным rows.
+        """
+        if self._rows is not None and self.written != self._rows:
+            raise ValueError(
+                f"Записано предсказаний: {self.written}, ожидалось: {self._rows}."
+            )
+
+
+def write_predictions(
+    batches: Iterable[np.ndarray],
+    path: Optional[Path] = None,
+    fmt: str = "text",
+    rows: Optional[int] = None,
+) -> int:
+    """
+    Записывает блоки предсказаний в файл path или, без path, в стандартный вывод.
+
+    Файл собирается рядом и заменяет прежний после последнего блока, поэтому
+    прерванная запись его не портит. Возвращает число записанных предсказаний.
+    Генерирует исключение при ошибке записи или несовпадении числа предсказаний с rows.
+    """
+    if path is None:
+        sys.stdout.flush()
+        writer = PredictionWriter(sys.stdout.buffer, fmt, rows)
+        for pred in batches:
+            writer.write(pred)
+        writer.close()
+        sys.stdout.buffer.flush()
+        return writer.written
+    partial = path.with_name(f"{path.name}.{os.getpid()}.part")
+    try:
+        with open(partial, "wb", buffering=WRITE_BUFFER) as file:
+            writer = PredictionWriter(file, fmt, rows)
+            for pred in batches:
+                writer.write(pred)
+            writer.close()
+        os.replace(partial, path)
+    finally:
+        partial.unlink(missing_ok=True)
+    return writer.written
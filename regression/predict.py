@@ -1,29 +1,104 @@
-"""Предсказание зарплат по матрице признаков с помощью обученной модели."""
+"""
+Предсказание зарплат по матрице признаков с помощью обученной модели.
+
+scipy импортируется только при загрузке разреженной матрицы x_data.npz,
+поэтому предсказание по x_data.npy не загружает ни scipy, ни pandas.
+"""
+
+from __future__ import annotations
 
 import logging
+import mmap
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
 
 import numpy as np
+from chain_pattern.handlers.feature_store import FeatureStore
+from chain_pattern.handlers.filenames import FEATURES_FILENAME, SPARSE_X_FILENAME
+from chain_pattern.handlers.profiling import profiled
+
+from .model_io import compiled_model_is_current, load_compiled_model, load_model
 
-from .model_io import load_model
+if TYPE_CHECKING:
+    from scipy import sparse
 
 logger = logging.getLogger(__name__)
 
+BATCH_SIZE = 65536
+
+BACKENDS = ("sklearn", "compiled", "auto")
+# Способ auto выбирает скомпилированную модель, если строк не больше этого числа:
+# она загружается примерно на 1,5 с быстрее, но на больших матрицах предсказывает
+# вдвое медленнее sklearn, и выигрыш от загрузки исчезает к ~400 тыс. строк.
+AUTO_COMPILED_MAX_ROWS = 200_000
+
 
-def load_x_data(path: Path) -> np.ndarray:
+def _load_store(path: Path, memory_map: bool):
     """
-    Загружает матрицу признаков из файла .npy (выход пайплайна chain_pattern).
+    Открывает хранилище признаков (features.hfs, см. chain_pattern.handlers.feature_store).
+
+    С memory_map возвращает само хранилище: блоки строк читаются из отображённого файла;
+    иначе — матрицу признаков, прочитанную целиком.
+    """
+    try:
+        store = FeatureStore(path)
+    except (ValueError, KeyError) as exc:
+        raise ValueError(f"Не удалось загрузить данные из {path}: {exc}") from exc
+    logger.debug(
+        "Хранилище признаков: объектов %d, признаков %d, отпечаток %s",
+        store.n_rows,
+        store.n_features,
+        store.fingerprint,
+    )
+    if memory_map:
+        return store
+    with store:
+        return np.array(store.read())
+
+
+def load_sparse(path: Path) -> sparse.csr_matrix:
+    """
+    Загружает разреженную матрицу признаков x_data.npz (столбцы, закодированные
+    в корзины, см. chain_pattern.handlers.build_matrices) в формате CSR.
+
+    Файл читается целиком: отображение в память для .npz не поддерживается.
+    Генерирует исключение при повреждённом файле.
+    """
+    from scipy import sparse
+
+    try:
+        X = sparse.load_npz(path).tocsr()
+    except Exception as exc:
+        raise ValueError(
+            f"Не удалось загрузить данные из {path}: файл повреждён или не в формате .npz."
+        ) from exc
+    logger.debug("Загружено объектов: %d, признаков: %d (разреженная матрица)", *X.shape)
+    return X
 
-    path — путь к файлу x_data.npy.
 
-    Возвращает матрицу признаков (объекты по строкам, признаки по столбцам).
+@profiled("load_x_data")
+def load_x_data(path: Path, memory_map: bool = True):
+    """
+    Загружает матрицу признаков из файла .npy, разреженной матрицы .npz или
+    хранилища признаков .hfs (выход пайплайна chain_pattern).
+
+    path — путь к файлу x_data.npy, x_data.npz или features.hfs.
+    memory_map — отображать файл в память (np.load с mmap_mode="r") вместо чтения целиком:
+    строки подгружаются с диска по мере обращения к ним (кроме .npz, см. load_sparse).
+
+    Возвращает матрицу признаков (объекты по строкам, признаки по столбцам);
+    для хранилища с memory_map — FeatureStore, срезы строк которого дают блоки матрицы.
     Генерирует исключение при отсутствии файла или некорректном формате.
     """
     logger.debug("Загрузка признаков из %s", path)
     if not path.is_file():
         raise FileNotFoundError(f"Файл не найден: {path}")
+    if path.suffix == Path(FEATURES_FILENAME).suffix:
+        return _load_store(path, memory_map)
+    if path.suffix == Path(SPARSE_X_FILENAME).suffix:
+        return load_sparse(path)
     try:
-        X = np.load(path, allow_pickle=False)
+        X = np.load(path, mmap_mode="r" if memory_map else None, allow_pickle=False)
     except Exception as exc:
         raise ValueError(
             f"Не удалось загрузить данные из {path}: файл повреждён или не в формате .npy."
@@ -36,26 +111,180 @@ def load_x_data(path: Path) -> np.ndarray:
     return X
 
 
-def predict_salaries(x_path: Path) -> list[float]:
+def load_backend(
+    backend: str = "sklearn",
+    version: Optional[str] = None,
+    rows: Optional[int] = None,
+):
     """
-    Возвращает список предсказанных зарплат в рублях для объектов из x_data.npy.
+    Загружает модель для выбранного способа предсказания.
 
-    Загружает модель из regression/resources и матрицу признаков из указанного файла.
-    Предсказания соответствуют порядку строк в x_data.npy.
+    backend — "sklearn" (пайплайн из salary_model.joblib), "compiled"
+    (массивы деревьев из salary_model.npz, см. regression.compiled) или "auto" —
+    скомпилированная модель, если она есть, не старше пайплайна и предстоит
+    предсказать не больше AUTO_COMPILED_MAX_ROWS строк (загружается без импорта
+    sklearn), иначе пайплайн sklearn.
+    version — версия из реестра моделей (см. model_io.list_versions); по умолчанию текущая.
+    rows — число строк для предсказания (None — немного, например запросы сервера).
+    Генерирует исключение при неизвестном способе или версии или ошибке загрузки.
+    """
+    if backend == "auto":
+        small = rows is None or rows <= AUTO_COMPILED_MAX_ROWS
+        backend = "compiled" if small and compiled_model_is_current(version) else "sklearn"
+        logger.debug("Способ предсказания: %s", backend)
+    if backend == "sklearn":
+        return load_model(version)
+    if backend == "compiled":
+        return load_compiled_model(version)
+    raise ValueError(f"Неизвестный способ предсказания: {backend}. Допустимые: {', '.join(BACKENDS)}.")
 
-    x_path — путь к файлу x_data.npy (выход пайплайна chain_pattern).
 
-    Возвращает предсказанные зарплаты в рублях для каждого объекта.
-    Генерирует исключение при отсутствии файлов или несовместимости признаков.
+def as_model_input(X: np.ndarray) -> np.ndarray:
+    """
+    Приводит матрицу признаков float32 к float64.
+
+    x_data.npy экономного режима chain_pattern (--lean) хранит те же значения во float32;
+    StandardScaler считал бы тогда во float32, и предсказания отличались бы от
+    полученных по целочисленной матрице, которую он приводит к float64.
+    Прочие типы возвращаются без изменений.
+    """
+    if X.dtype == np.float32:
+        return X.astype(np.float64)
+    return X
+
+
+def check_n_features(X: np.ndarray, model) -> None:
+    """
+    Проверяет, что число признаков в данных совпадает с ожидаемым моделью.
+
+    Генерирует исключение при несовпадении.
     """
-    X = load_x_data(x_path)
-    model = load_model()
     if X.shape[1] != model.n_features_in_:
         raise ValueError(
             f"Число признаков в данных ({X.shape[1]}) не совпадает с ожидаемым моделью ({model.n_features_in_}). "
             "Используйте данные, полученные тем же пайплайном chain_pattern."
         )
-    pred = model.predict(X)
-    result = [float(x) for x in pred]
+
+
+def _release_pages(X: np.ndarray) -> None:
+    """
+    Исключает прочитанные страницы отображённой в память матрицы из памяти процесса.
+
+    Страницы остаются в кеше файловой системы, но не накапливаются в RSS.
+    """
+    if isinstance(X, FeatureStore):
+        X.release_pages()
+        return
+    buffer = getattr(X, "_mmap", None)
+    if buffer is not None and hasattr(mmap, "MADV_DONTNEED"):
+        buffer.madvise(mmap.MADV_DONTNEED)
+
+
+def iter_predictions(model, X: np.ndarray, batch_size: int = BATCH_SIZE) -> Iterator[np.ndarray]:
+    """
+    Предсказывает по блокам из batch_size строк и возвращает предсказания блоков по порядку.
+
+    Для отображённой в память матрицы в памяти находится только текущий блок.
+    При включённом профилировании каждый блок учитывается как стадия predict.
+    """
+    predict = profiled("predict")(model.predict)
+    for start in range(0, X.shape[0], batch_size):
+        pred = predict(as_model_input(X[start:start + batch_size]))
+        _release_pages(X)
+        yield pred
+
+
+def predict_batches(
+    model,
+    X: np.ndarray,
+    batch_size: int = BATCH_SIZE,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Предсказывает по блокам из batch_size строк и записывает результат в out.
+
+    model — обученный пайплайн с методом predict.
+    X — матрица признаков (в том числе отображённая в память).
+    out — заранее выделенный вектор длины X.shape[0] (например, np.lib.format.open_memmap);
+    по умолчанию создаётся новый вектор float64.
+
+    Возвращает out.
+    """
+    if out is None:
+        out = np.empty(X.shape[0], dtype=np.float64)
+    elif out.shape != (X.shape[0],):
+        raise ValueError(
+            f"Размер выходного вектора {out.shape} не совпадает с числом объектов ({X.shape[0]})."
+        )
+    start = 0
+    for pred in iter_predictions(model, X, batch_size):
+        out[start:start + len(pred)] = pred
+        start += len(pred)
+    return out
+
+
+def stream_salaries(
+    x_path: Path,
+    batch_size: int = BATCH_SIZE,
+    backend: str = "sklearn",
+    version: Optional[str] = None,
+) -> Iterator[np.ndarray]:
+    """
+    Возвращает предсказанные зарплаты в рублях блоками по batch_size объектов.
+
+    Матрица признаков отображается в память, поэтому потребление памяти не зависит
+    от размера x_data.npy. Блоки следуют в порядке строк x_data.npy.
+
+    x_path — путь к файлу x_data.npy или features.hfs (выход пайплайна chain_pattern).
+    backend, version — способ предсказания и версия модели (см. load_backend).
+
+    Генерирует исключение при отсутствии файлов или несовместимости признаков
+    (до выдачи первого блока).
+    """
+    return stream_matrix_salaries(load_x_data(x_path), batch_size, backend, version)
+
+
+def stream_matrix_salaries(
+    X,
+    batch_size: int = BATCH_SIZE,
+    backend: str = "sklearn",
+    version: Optional[str] = None,
+) -> Iterator[np.ndarray]:
+    """
+    Возвращает предсказанные зарплаты блоками по batch_size объектов для уже
+    загруженной матрицы признаков X (см. load_x_data).
+
+    Модель загружается с учётом числа строк X (см. load_backend) до выдачи первого блока.
+    Генерирует исключение при несовместимости признаков.
+    """
+    model = load_backend(backend, version, X.shape[0])
+    check_n_features(X, model)
+    return iter_predictions(model, X, batch_size)
+
+
+def predict_salaries(
+    x_path: Path,
+    batch_size: int = BATCH_SIZE,
+    backend: str = "sklearn",
+    version: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Возвращает предсказанные зарплаты в рублях для объектов из x_data.npy.
+
+    Загружает модель из regression/resources и отображает в память матрицу признаков
+    из указанного файла; предсказания считаются блоками по batch_size строк
+    в заранее выделенный вектор.
+    Предсказания соответствуют порядку строк в x_data.npy.
+
+    x_path — путь к файлу x_data.npy или features.hfs (выход пайплайна chain_pattern).
+    backend, version — способ предсказания и версия модели (см. load_backend).
+
+    Возвращает вектор предсказанных зарплат в рублях для каждого объекта.
+    Генерирует исключение при отсутствии файлов или несовместимости признаков.
+    """
+    X = load_x_data(x_path)
+    model = load_backend(backend, version, X.shape[0])
+    check_n_features(X, model)
+    result = predict_batches(model, X, batch_size)
     logger.debug("Получено предсказаний: %d", len(result))
     return result
@@ -0,0 +1,290 @@
+"""
+Подбор гиперпараметров регрессора кросс-валидацией в пуле процессов.
+
+Каждая пара (набор параметров, фолд) обучается в отдельном процессе; процессы
+отображают x_data.npy и y_data.npy в память, а не получают копии данных.
+Число деревьев подбирается ранней остановкой по ошибке на валидационном фолде:
+деревья добавляются порциями (warm_start), и обучение прекращается, когда ошибка
+не улучшается несколько порций подряд, поэтому неудачные наборы заканчиваются рано.
+
+Интерфейс: python -m regression.search <путь_к_папке_с_x_data_и_y_data> [--n-iter N]
+"""
+
+import csv
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler
+from sklearn.preprocessing import StandardScaler
+
+from .cli import ArgumentParser
+from .metrics import compute_metrics, log_metrics
+from .model_io import get_model_path
+from .predict import as_model_input
+from .train import (
+    BACKENDS,
+    build_regression_pipeline,
+    data_fingerprint,
+    data_vocabularies,
+    fit_timed,
+    load_data,
+    log_timing,
+    save_trained,
+)
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FILENAME = "search_results.csv"
+
+DEFAULT_GRID = {
+    "max_depth": [3, 4, 6, 8],
+    "min_samples_leaf": [5, 20, 50],
+    "learning_rate": [0.05, 0.1, 0.2],
+}
+
+# Параметр числа итераций бустинга для способов обучения, поддерживающих раннюю остановку.
+ITERATION_PARAMS = {"gbr": "n_estimators", "hist": "max_iter"}
+
+MAX_ESTIMATORS = 300
+STEP = 10
+PATIENCE = 3
+
+
+def evaluate_fold(
+    data_dir: Path,
+    backend: str,
+    params: dict,
+    fold: int,
+    n_folds: int,
+    max_estimators: int = MAX_ESTIMATORS,
+    step: int = STEP,
+    patience: int = PATIENCE,
+) -> dict:
+    """
+    Обучает регрессор с параметрами params на фолде fold и оценивает на валидационной части.
+
+    Деревья добавляются порциями по step; обучение останавливается, когда ошибка MSE
+    на валидации не улучшалась patience порций подряд или достигнуто max_estimators.
+
+    Возвращает метрики compute_metrics для лучшего числа деревьев, само это число
+    (n_estimators), число порций (rounds) и время обучения (fit_seconds).
+    Генерирует исключение, если max_estimators меньше step.
+    """
+    if max_estimators < step:
+        raise ValueError(f"Наибольшее число деревьев ({max_estimators}) меньше порции {step}.")
+    X, y = load_data(data_dir, memory_map=True)
+    train_idx, val_idx = list(KFold(n_folds, shuffle=True, random_state=42).split(y))[fold]
+    X_train, X_val = as_model_input(X[train_idx]), as_model_input(X[val_idx])
+    scaler = StandardScaler(with_mean=not sparse.issparse(X)).fit(X_train)
+    X_train, y_train = scaler.transform(X_train), y[train_idx]
+    X_val, y_val = scaler.transform(X_val), y[val_idx]
+
+    iteration_param = ITERATION_PARAMS[backend]
+    regressor = BACKENDS[backend]().set_params(**params, warm_start=True)
+    best_mse, best_n, best_pred, stale, rounds = np.inf, 0, None, 0, 0
+    start = time.perf_counter()
+    for n in range(step, max_estimators + 1, step):
+        regressor.set_params(**{iteration_param: n})
+        regressor.fit(X_train, y_train)
+        rounds += 1
+        pred = regressor.predict(X_val)
+        mse = float(np.mean((pred - y_val) ** 2))
+        if mse < best_mse:
+            best_mse, best_n, best_pred, stale = mse, n, pred, 0
+        else:
+            stale += 1
+            if stale >= patience:
+                break
+    return {
+        "params": params,
+        "fold": fold,
+        "n_estimators": best_n,
+        "rounds": rounds,
+        "fit_seconds": time.perf_counter() - start,
+        **compute_metrics(y_val, best_pred),
+    }
+
+
+def summarize(results: list[dict]) -> list[dict]:
+    """
+    Сводит результаты по фолдам в таблицу по наборам параметров.
+
+    Возвращает строки, отсортированные по средней RMSE на валидации: параметры,
+    среднее лучшее число деревьев, средние метрики, разброс RMSE, суммарные
+    порции и время обучения.
+    """
+    groups: dict[tuple, list[dict]] = {}
+    for result in results:
+        groups.setdefault(tuple(sorted(result["params"].items())), []).append(result)
+    table = []
+    for key, folds in groups.items():
+        rmse = np.array([fold["rmse"] for fold in folds])
+        table.append({
+            **dict(key),
+            "n_estimators": int(round(np.mean([fold["n_estimators"] for fold in folds]))),
+            "mae": float(np.mean([fold["mae"] for fold in folds])),
+            "rmse": float(rmse.mean()),
+            "rmse_std": float(rmse.std()),
+            "r2": float(np.mean([fold["r2"] for fold in folds])),
+            "rounds": sum(fold["rounds"] for fold in folds),
+            "fit_seconds": sum(fold["fit_seconds"] for fold in folds),
+        })
+    table.sort(key=lambda row: row["rmse"])
+    return table
+
+
+def save_results(table: list[dict], path: Path) -> None:
+    """
+    Сохраняет таблицу результатов подбора в CSV.
+
+    Генерирует исключение при сбое записи файла.
+    """
+    logger.debug("Сохранение результатов подбора в %s", path)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=list(table[0]))
+        writer.writeheader()
+        writer.writerows(table)
+
+
+def search(
+    data_dir: Path,
+    backend: str = "gbr",
+    grid: Optional[dict] = None,
+    n_iter: int = 0,
+    n_folds: int = 4,
+    workers: Optional[int] = None,
+    max_estimators: int = MAX_ESTIMATORS,
+) -> list[dict]:
+    """
+    Подбирает гиперпараметры, обучает лучший пайплайн на всех данных и сохраняет его.
+
+    data_dir — папка с x_data.npy и y_data.npy.
+    backend — способ обучения с ранней остановкой (ключ ITERATION_PARAMS).
+    grid — сетка параметров регрессора (по умолчанию DEFAULT_GRID).
+    n_iter — число случайных наборов из сетки; 0 — перебор всей сетки.
+    n_folds — число фолдов кросс-валидации.
+    workers — число процессов (по умолчанию по числу ядер).
+    max_estimators — наибольшее число деревьев при ранней остановке.
+
+    Лучший пайплайн сохраняется как текущая модель и новой версией реестра
+    (см. train.save_trained), таблица результатов — в search_results.csv рядом с моделью.
+    Возвращает таблицу результатов (см. summarize).
+    Генерирует исключение при неподдерживаемом способе обучения или ошибке данных.
+    """
+    if backend not in ITERATION_PARAMS:
+        raise ValueError(
+            f"Подбор с ранней остановкой поддерживает способы обучения: {', '.join(ITERATION_PARAMS)}."
+        )
+    grid = grid or DEFAULT_GRID
+    candidates = list(
+        ParameterSampler(grid, n_iter, random_state=42) if n_iter else ParameterGrid(grid)
+    )
+    X, y = load_data(data_dir, memory_map=True)
+    if len(y) < n_folds:
+        raise ValueError(f"Объектов ({len(y)}) меньше, чем фолдов ({n_folds}).")
+    pipeline = build_regression_pipeline(backend, sparse.issparse(X))
+    workers = workers or os.cpu_count() or 1
+    logger.debug(
+        "Подбор: наборов параметров %d, фолдов %d, процессов %d", len(candidates), n_folds, workers
+    )
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                evaluate_fold, data_dir, backend, params, fold, n_folds, max_estimators
+            )
+            for params in candidates
+            for fold in range(n_folds)
+        ]
+        results = [future.result() for future in futures]
+    logger.debug("Подбор занял %.1f с", time.perf_counter() - start)
+
+    table = summarize(results)
+    best = table[0]
+    logger.debug(
+        "Лучший набор: %s, деревьев %d",
+        {name: best[name] for name in grid},
+        best["n_estimators"],
+    )
+    log_metrics({name: best[name] for name in ("mae", "rmse", "r2")}, prefix="Метрики на валидации: ")
+
+    pipeline.set_params(
+        **{f"regressor__{name}": best[name] for name in grid},
+        **{f"regressor__{ITERATION_PARAMS[backend]}": best["n_estimators"]},
+    )
+    X = X if sparse.issparse(X) else np.asarray(X)
+    log_timing(fit_timed(pipeline, as_model_input(X), np.asarray(y)), prefix="Обучение на всех данных: ")
+    save_trained(
+        pipeline,
+        {
+            "backend": backend,
+            "params": {name: best[name] for name in grid},
+            "n_estimators": best["n_estimators"],
+            "data_fingerprint": data_fingerprint(data_dir),
+            "rows": len(y),
+            "metrics": {"validation": {name: best[name] for name in ("mae", "rmse", "r2")}},
+        },
+        data_vocabularies(data_dir),
+    )
+    save_results(table, get_model_path().with_name(RESULTS_FILENAME))
+    return table
+
+
+def main() -> None:
+    """
+    Точка входа CLI для подбора гиперпараметров.
+
+    Завершает работу с кодом 1 при ошибке.
+    """
+    parser = ArgumentParser(
+        prog="python -m regression.search",
+        description="Подбор гиперпараметров кросс-валидацией с ранней остановкой.",
+    )
+    parser.add_argument("data_dir", help="путь к папке с x_data.npy и y_data.npy")
+    parser.add_argument(
+        "--backend", choices=list(ITERATION_PARAMS), default="gbr", help="способ обучения"
+    )
+    parser.add_argument(
+        "--n-iter", type=int, default=0, help="число случайных наборов параметров (0 — вся сетка)"
+    )
+    parser.add_argument("--folds", type=int, default=4, help="число фолдов кросс-валидации")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов")
+    parser.add_argument(
+        "--max-estimators",
+        type=int,
+        default=MAX_ESTIMATORS,
+        help=f"наибольшее число деревьев при ранней остановке (не меньше {STEP})",
+    )
+    args = parser.parse_args()
+    if args.folds < 2:
+        parser.error("--folds должен быть не меньше 2")
+    if args.max_estimators < STEP:
+        parser.error(f"--max-estimators должен быть не меньше {STEP}")
+    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s:%(name)s:%(message)s")
+    try:
+        data_dir = Path(args.data_dir).resolve()
+        if not data_dir.is_dir():
+            raise NotADirectoryError(f"Указанный путь не является папкой: {data_dir}")
+        search(
+            data_dir,
+            args.backend,
+            n_iter=args.n_iter,
+            n_folds=args.folds,
+            workers=args.workers,
+            max_estimators=args.max_estimators,
+        )
+    except (ValueError, OSError) as exc:
+        logger.debug("Ошибка при подборе: %s", exc)
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
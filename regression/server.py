@@ -0,0 +1,311 @@
+"""
+Сервер предсказаний: модель загружается один раз, запросы объединяются в микропакеты.
+
+Интерфейс HTTP (TCP или Unix-сокет):
+POST /predict  {"rows": [[признаки], ...]} -> {"salaries": [зарплаты]}
+GET  /stats    счётчики: число запросов, строк и пакетов, задержки p50/p99, строк в секунду
+GET  /health   {"status": "ok"}
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_ROWS = 4096
+MAX_WAIT_MS = 2.0
+LATENCY_WINDOW = 10000
+
+
+class MicroBatcher:
+    """
+    Объединяет одновременные запросы на предсказание в пакеты для одного вызова model.predict.
+
+    Пакет отправляется, когда в нём набралось max_batch_rows строк или с момента
+    первого запроса прошло max_wait_ms миллисекунд. Метод predict служит
+    клиентом внутри процесса; HTTP-сервер использует его же. После close новые
+    запросы не принимаются.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_batch_rows: int = MAX_BATCH_ROWS,
+        max_wait_ms: float = MAX_WAIT_MS,
+    ) -> None:
+        self._model = model
+        self._max_batch_rows = max_batch_rows
+        self._max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._requests = 0
+        self._rows = 0
+        self._batches = 0
+        self._closed = False
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def n_features(self) -> int:
+        """
+        Число признаков, ожидаемое моделью.
+        """
+        return self._model.n_features_in_
+
+    def submit(self, rows: np.ndarray) -> Future:
+        """
+        Ставит строки признаков в очередь и возвращает Future с вектором предсказаний.
+
+        rows — матрица (объекты по строкам) с числом столбцов n_features.
+        Генерирует исключение при неверной форме матрицы (ValueError)
+        или после остановки (RuntimeError, см. close).
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim != 2 or rows.shape[1] != self.n_features:
+            raise ValueError(
+                f"Ожидается матрица признаков с {self.n_features} столбцами, получена форма {rows.shape}."
+            )
+        future: Future = Future()
+        with self._lock:
+            # Проверка и постановка в очередь под одной блокировкой с close: запрос
+            # не окажется в очереди после признака остановки, где его никто не обработает.
+            if self._closed:
+                raise RuntimeError("Сервер предсказаний остановлен.")
+            self._queue.put((rows, future, time.perf_counter()))
+        return future
+
+    def predict(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Возвращает предсказания для строк, дожидаясь обработки их пакета.
+        """
+        return self.submit(rows).result()
+
+    def stats(self) -> dict[str, float]:
+        """
+        Возвращает счётчики: запросы, строки, пакеты, задержки p50/p99 (мс) и строк в секунду.
+        """
+        with self._lock:
+            latencies = np.array(self._latencies)
+            elapsed = time.perf_counter() - self._started
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if latencies.size else (0.0, 0.0)
+            return {
+                "requests": self._requests,
+                "rows": self._rows,
+                "batches": self._batches,
+                "latency_p50_ms": float(p50),
+                "latency_p99_ms": float(p99),
+                "rows_per_sec": self._rows / elapsed if elapsed > 0 else 0.0,
+            }
+
+    def close(self) -> None:
+        """
+        Останавливает поток пакетной обработки после обработки уже поставленных запросов.
+
+        Последующие вызовы submit генерируют RuntimeError; повторный вызов close ничего не делает.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        """
+        Цикл потока: набирает пакет из очереди и выполняет предсказание.
+        """
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            rows = len(item[0])
+            deadline = time.perf_counter() + self._max_wait
+            while rows < self._max_batch_rows:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            self._predict(batch)
+
+    def _predict(self, batch: list[tuple[np.ndarray, Future, float]]) -> None:
+        """
+        Предсказывает по объединённому пакету и раздаёт результаты запросам.
+        """
+        X = np.concatenate([rows for rows, _, _ in batch])
+        try:
+            pred = self._model.predict(X)
+        except Exception as exc:
+            logger.debug("Ошибка при предсказании пакета: %s", exc)
+            for _, future, _ in batch:
+                future.set_exception(exc)
+            return
+        done = time.perf_counter()
+        start = 0
+        with self._lock:
+            self._batches += 1
+            for rows, future, submitted in batch:
+                future.set_result(pred[start:start + len(rows)])
+                start += len(rows)
+                self._requests += 1
+                self._rows += len(rows)
+                self._latencies.append(done - submitted)
+        logger.debug("Пакет: запросов %d, строк %d", len(batch), len(X))
+
+
+class _PredictRequestHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик HTTP-запросов сервера предсказаний.
+    """
+
+    server_version = "SalaryPredictor/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send_json(200, self.server.batcher.stats())
+        else:
+            self._send_json(404, {"error": f"Неизвестный путь: {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Неизвестный путь: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            future = self.server.batcher.submit(payload["rows"])
+        except (ValueError, KeyError, TypeError) as exc:
+            self._send_json(400, {"error": f"Некорректный запрос: {exc}"})
+            return
+        except RuntimeError as exc:
+            self._send_json(503, {"error": str(exc)})
+            return
+        try:
+            pred = future.result()
+        except Exception as exc:
+            self._send_json(500, {"error": f"Ошибка при предсказании: {exc}"})
+            return
+        self._send_json(200, {"salaries": pred.tolist()})
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("HTTP: " + format, *args)
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP-сервер на Unix-сокете с обработкой запросов в отдельных потоках.
+    """
+
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler ожидает адрес клиента в виде (host, port).
+        return request, ("unix", 0)
+
+
+def _remove_stale_socket(path: str) -> None:
+    """
+    Удаляет файл Unix-сокета, оставшийся от прерванного сервера.
+
+    Генерирует исключение, если путь занят другим файлом или сокетом, который принимает соединения.
+    """
+    if not os.path.exists(path):
+        return
+    if not Path(path).is_socket():
+        raise OSError(f"Путь Unix-сокета занят файлом: {path}")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            logger.debug("Удаление устаревшего сокета %s", path)
+            os.unlink(path)
+            return
+    raise OSError(f"Unix-сокет уже используется другим сервером: {path}")
+
+
+def make_server(
+    batcher: MicroBatcher,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    unix_path: Optional[str] = None,
+) -> socketserver.BaseServer:
+    """
+    Создаёт HTTP-сервер предсказаний на TCP-адресе или Unix-сокете unix_path.
+
+    batcher — пакетный обработчик с загруженной моделью.
+    port=0 — свободный порт (номер — в server.server_address).
+    Файл сокета, оставшийся от прерванного сервера, удаляется перед привязкой.
+    Генерирует исключение, если адрес или сокет заняты.
+    """
+    if unix_path is not None:
+        _remove_stale_socket(unix_path)
+        server = _ThreadingUnixHTTPServer(unix_path, _PredictRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), _PredictRequestHandler)
+    server.batcher = batcher
+    return server
+
+
+def serve(
+    model,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    unix_path: Optional[str] = None,
+    max_batch_rows: int = MAX_BATCH_ROWS,
+    max_wait_ms: float = MAX_WAIT_MS,
+) -> None:
+    """
+    Запускает сервер предсказаний и обслуживает запросы до прерывания (Ctrl+C).
+
+    model — загруженный пайплайн; остальные параметры — адрес и настройки микропакетов.
+    """
+    batcher = MicroBatcher(model, max_batch_rows, max_wait_ms)
+    server = make_server(batcher, host, port, unix_path)
+    address = unix_path if unix_path is not None else f"http://{host}:{server.server_address[1]}"
+    logger.debug("Сервер предсказаний запущен: %s", address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.debug("Остановка сервера предсказаний")
+    finally:
+        server.server_close()
+        if unix_path is not None:
+            Path(unix_path).unlink(missing_ok=True)
+        batcher.close()
+        logger.debug("Итоговые счётчики: %s", batcher.stats())
@@ -1,17 +1,36 @@
 """Скрипт обучения регрессионной модели на выходе пайплайна chain_pattern."""
 
+import hashlib
 import logging
 import sys
+import time
 from pathlib import Path
+from typing import Callable, Optional
 
 import numpy as np
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.model_selection import train_test_split
+from scipy import sparse
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import ShuffleSplit, train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 
-from .metrics import compute_metrics, log_metrics
-from .model_io import save_model
+from chain_pattern.handlers.feature_store import FeatureStore
+from chain_pattern.handlers.filenames import FEATURES_FILENAME, SPARSE_X_FILENAME
+
+from .cli import ArgumentParser
+from .compiled import compile_pipeline
+from .metrics import MetricsAccumulator, log_metrics
+from .model_io import (
+    VOCABULARIES_FILENAME,
+    delete_compiled_model,
+    get_vocabularies_path,
+    load_model,
+    register_model,
+    save_compiled_model,
+    save_model,
+)
+from .predict import as_model_input, load_sparse
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -20,19 +39,110 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def load_data(data_dir: Path) -> tuple[np.ndarray, np.ndarray]:
+def _gradient_boosting() -> GradientBoostingRegressor:
+    """
+    Градиентный бустинг sklearn (один поток).
+    """
+    return GradientBoostingRegressor(
+        n_estimators=100,
+        max_depth=6,
+        min_samples_leaf=20,
+        learning_rate=0.1,
+        random_state=42,
+    )
+
+
+def _hist_gradient_boosting() -> HistGradientBoostingRegressor:
+    """
+    Гистограммный градиентный бустинг (многопоточный, OpenMP) с теми же гиперпараметрами.
+    """
+    return HistGradientBoostingRegressor(
+        max_iter=100,
+        max_depth=6,
+        min_samples_leaf=20,
+        learning_rate=0.1,
+        early_stopping=False,
+        random_state=42,
+    )
+
+
+def _linear() -> LinearRegression:
+    """
+    Линейная регрессия — базовая модель для сравнения.
+    """
+    return LinearRegression()
+
+
+BACKENDS: dict[str, Callable[[], object]] = {
+    "gbr": _gradient_boosting,
+    "hist": _hist_gradient_boosting,
+    "linear": _linear,
+}
+
+
+# Число стадий бустинга, добавляемых при дообучении на новых данных.
+UPDATE_STAGES = 20
+
+# Доля тестовой части и зерно разбиения на обучающую и тестовую части.
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
+# Число квантильных интервалов зарплат при стратифицированной выборке.
+STRATIFY_BINS = 10
+# Строк в блоке при копировании строк и вычислении метрик.
+BLOCK_ROWS = 1 << 16
+
+
+def build_regression_pipeline(backend: str = "gbr", sparse_input: bool = False) -> Pipeline:
+    """
+    Создаёт необученный пайплайн StandardScaler + регрессор выбранного способа обучения.
+
+    backend — ключ BACKENDS: "gbr" (GradientBoostingRegressor), "hist"
+    (HistGradientBoostingRegressor) или "linear" (LinearRegression).
+    sparse_input — обучать на разреженной матрице признаков (x_data.npz): масштабирование
+    тогда без центрирования, чтобы матрица осталась разреженной.
+    Генерирует исключение при неизвестном способе или способе hist с разреженной матрицей.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Неизвестный способ обучения: {backend}. Допустимые: {', '.join(BACKENDS)}."
+        )
+    if sparse_input and backend == "hist":
+        raise ValueError(
+            "Способ обучения hist не поддерживает разреженную матрицу признаков (x_data.npz); "
+            "используйте gbr или linear."
+        )
+    return Pipeline(
+        steps=[
+            ("scaler", StandardScaler(with_mean=not sparse_input)),
+            ("regressor", BACKENDS[backend]()),
+        ],
+        memory=None,
+    )
+
+
+def load_data(data_dir: Path, memory_map: bool = False) -> tuple[np.ndarray, np.ndarray]:
     """
     Загружает матрицы признаков и целевых значений из папки с выходом пайплайна.
 
-    Ожидаются файлы x_data.npy (признаки) и y_data.npy (зарплаты в рублях)
-    в указанной папке.
+    Ожидается хранилище признаков features.hfs (см. chain_pattern.handlers.feature_store)
+    или файлы x_data.npy (признаки) и y_data.npy (зарплаты в рублях) в указанной папке;
+    хранилище читается в первую очередь. Вместо x_data.npy может быть разреженная
+    матрица x_data.npz (столбцы, закодированные в корзины); она читается целиком
+    в формате CSR (см. predict.load_sparse) и раньше x_data.npy.
 
-    data_dir — путь к папке, содержащей x_data.npy и y_data.npy.
+    data_dir — путь к папке, содержащей features.hfs или x_data.npy и y_data.npy.
+    memory_map — отобразить файлы в память (np.load с mmap_mode="r") вместо чтения целиком;
+    несколько процессов тогда разделяют одни страницы файла. Сжатое хранилище
+    распаковывается в память и при memory_map.
 
     Возвращает кортеж: матрица признаков и вектор целевых значений (зарплаты).
     Генерирует исключение при отсутствии файлов или неверном формате данных.
     """
-    x_path = data_dir / "x_data.npy"
+    store_path = data_dir / FEATURES_FILENAME
+    if store_path.is_file():
+        return _load_store(store_path, memory_map)
+    sparse_path = data_dir / SPARSE_X_FILENAME
+    x_path = sparse_path if sparse_path.is_file() else data_dir / "x_data.npy"
     y_path = data_dir / "y_data.npy"
     logger.debug("Загрузка данных из %s", data_dir)
     if not x_path.is_file():
@@ -46,12 +156,17 @@ def load_data(data_dir: Path) -> tuple[np.ndarray, np.ndarray]:
             "Укажите папку с выходом пайплайна chain_pattern (x_data.npy, y_data.npy)."
         )
     try:
-        X = np.load(x_path, allow_pickle=False)
-        y = np.load(y_path, allow_pickle=False)
+        mmap_mode = "r" if memory_map else None
+        X = None
+        if x_path != sparse_path:
+            X = np.load(x_path, mmap_mode=mmap_mode, allow_pickle=False)
+        y = np.load(y_path, mmap_mode=mmap_mode, allow_pickle=False)
     except Exception as exc:
         raise ValueError(
             f"Не удалось загрузить данные из {data_dir}: файлы повреждены или не в формате .npy."
         ) from exc
+    if X is None:
+        X = load_sparse(x_path)
     if X.ndim != 2:
         raise ValueError(
             f"Ожидается матрица признаков (2 измерения), получено {X.ndim} измерений."
@@ -62,86 +177,526 @@ def load_data(data_dir: Path) -> tuple[np.ndarray, np.ndarray]:
         )
     if X.shape[0] != y.shape[0]:
         raise ValueError(
-            f"Число строк в x_data.npy ({X.shape[0]}) не совпадает с длиной y_data.npy ({y.shape[0]})."
+            f"Число строк в {x_path.name} ({X.shape[0]}) не совпадает с длиной y_data.npy ({y.shape[0]})."
         )
     logger.debug("Загружено объектов: %d, признаков: %d", X.shape[0], X.shape[1])
     return X, y
 
 
-def train(data_dir: Path) -> None:
+def _load_store(path: Path, memory_map: bool) -> tuple[np.ndarray, np.ndarray]:
     """
-    Обучает регрессионный пайплайн и сохраняет его в папку regression/resources.
-
-    Пайплайн: StandardScaler + GradientBoostingRegressor.
-    Использует данные из указанной папки (x_data.npy, y_data.npy).
-    Сохраняется в regression/resources/salary_model.joblib.
-
-    data_dir — путь к папке с выходом пайплайна chain_pattern.
+    Загружает матрицы из хранилища признаков (см. load_data).
 
-    Генерирует исключение при отсутствии данных, ошибке формата или сбое сохранения.
+    Несжатое хранилище с memory_map возвращается представлениями отображённого файла без копирования.
     """
-    X, y = load_data(data_dir)
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+    logger.debug("Загрузка данных из %s", path)
+    try:
+        store = FeatureStore(path)
+        X, y = store.read(), store.read_target()
+    except (ValueError, KeyError) as exc:
+        raise ValueError(f"Не удалось загрузить данные из {path}: {exc}") from exc
+    if not memory_map:
+        X, y = np.array(X), np.array(y)
+        store.close()
     logger.debug(
-        "Разбиение: обучающая выборка %d, тестовая %d",
-        len(y_train),
-        len(y_test),
-    )
-    logger.debug("Запуск обучения пайплайна: StandardScaler + GradientBoostingRegressor")
-    pipeline = Pipeline(
-        steps=[
-            ("scaler", StandardScaler()),
-            (
-                "regressor",
-                GradientBoostingRegressor(
-                    n_estimators=100,
-                    max_depth=6,
-                    min_samples_leaf=20,
-                    learning_rate=0.1,
-                    random_state=42,
-                ),
-            ),
-        ],
-        memory=None,
+        "Загружено объектов: %d, признаков: %d, отпечаток %s", X.shape[0], X.shape[1], store.fingerprint
     )
+    return X, y
+
+
+def data_fingerprint(data_dir: Path) -> str:
+    """
+    SHA-256 обучающих данных: содержимого features.hfs или x_data.npz (x_data.npy) и y_data.npy.
+    """
+    store_path = data_dir / FEATURES_FILENAME
+    sparse_path = data_dir / SPARSE_X_FILENAME
+    if store_path.is_file():
+        paths = [store_path]
+    else:
+        x_path = sparse_path if sparse_path.is_file() else data_dir / "x_data.npy"
+        paths = [x_path, data_dir / "y_data.npy"]
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as file:
+            while block := file.read(1 << 20):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def target_bins(y: np.ndarray, n_bins: int = STRATIFY_BINS) -> np.ndarray:
+    """
+    Номера квантильных интервалов целевых значений (классы для стратификации).
+
+    Совпадающие границы интервалов (много одинаковых зарплат) объединяются.
+    """
+    edges = np.unique(np.quantile(y, np.linspace(0, 1, n_bins + 1)[1:-1]))
+    return np.searchsorted(edges, y, side="right")
+
+
+def sample_rows(
+    y: np.ndarray,
+    size: int,
+    stratify: bool = False,
+    seed: int = SPLIT_SEED,
+) -> np.ndarray:
+    """
+    Номера строк воспроизводимой случайной выборки размера size (по возрастанию).
+
+    stratify — сохранить в выборке доли квантильных интервалов зарплат (target_bins).
+    Одинаковые y, size, stratify и seed дают одну и ту же выборку.
+    Генерирует исключение, если size вне [1, len(y)] или стратифицированную
+    выборку такого размера составить нельзя.
+    """
+    n_rows = len(y)
+    if not 0 < size <= n_rows:
+        raise ValueError(f"Размер выборки должен быть от 1 до {n_rows}, получено {size}.")
+    if size == n_rows:
+        return np.arange(n_rows)
+    if not stratify:
+        return np.sort(np.random.default_rng(seed).choice(n_rows, size, replace=False))
+    try:
+        rows, _ = train_test_split(
+            np.arange(n_rows), train_size=size, stratify=target_bins(y), random_state=seed
+        )
+    except ValueError as exc:
+        raise ValueError(f"Не удалось составить стратифицированную выборку из {size} строк: {exc}") from exc
+    return np.sort(rows)
+
+
+def split_rows(rows: np.ndarray, test_size: float = TEST_SIZE, seed: int = SPLIT_SEED) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Разбивает номера строк на обучающую и тестовую части, не копируя сами данные.
+
+    Строки частей и их порядок совпадают с train_test_split(..., test_size=test_size,
+    random_state=seed) над строками rows.
+    """
+    train, test = next(ShuffleSplit(n_splits=1, test_size=test_size, random_state=seed).split(rows))
+    return rows[train], rows[test]
+
+
+def take_rows(X: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Копирует строки rows матрицы признаков (в том числе отображённой в память) в порядке rows,
+    приводя их к входному типу модели (см. predict.as_model_input).
+
+    Строки читаются блоками по BLOCK_ROWS по возрастанию номеров, то есть по файлу
+    подряд; кроме результата в памяти находится один блок. Строки разреженной
+    матрицы выбираются индексированием CSR.
+    """
+    if sparse.issparse(X):
+        return as_model_input(X[rows])
+    dtype = np.float64 if X.dtype == np.float32 else X.dtype
+    result = np.empty((len(rows), X.shape[1]), dtype=dtype)
+    order = np.argsort(rows, kind="stable")
+    for start in range(0, len(rows), BLOCK_ROWS):
+        positions = order[start : start + BLOCK_ROWS]
+        result[positions] = X[rows[positions]]
+    return result
+
+
+def evaluate(
+    pipeline: Pipeline,
+    X: np.ndarray,
+    y: np.ndarray,
+    rows: Optional[np.ndarray] = None,
+) -> dict[str, float]:
+    """
+    Метрики пайплайна (см. metrics.compute_metrics) на строках rows (None — на всех строках).
+
+    Предсказания вычисляются блоками по BLOCK_ROWS строк, поэтому ни строки,
+    ни вектор предсказаний целиком в память не собираются.
+    """
+    metrics = MetricsAccumulator()
+    n_rows = len(y) if rows is None else len(rows)
+    rows = None if rows is None else np.sort(rows)
+    logger.debug("Вычисление метрик по %d объектам", n_rows)
+    for start in range(0, n_rows, BLOCK_ROWS):
+        if rows is None:
+            block = slice(start, start + BLOCK_ROWS)
+            X_block = as_model_input(X[block])
+        else:
+            block = rows[start : start + BLOCK_ROWS]
+            X_block = take_rows(X, block)
+        metrics.update(y[block], pipeline.predict(X_block))
+    return metrics.metrics()
+
+
+def peak_memory_bytes() -> Optional[int]:
+    """
+    Пиковый объём резидентной памяти процесса (ru_maxrss), байт; None, если ОС его не сообщает.
+
+    Прочитанные страницы отображённых в память файлов входят в него, но при
+    нехватке памяти ОС вытесняет их, а не процесс.
+    """
     try:
-        pipeline.fit(X_train, y_train)
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def log_peak_memory() -> Optional[int]:
+    """
+    Логирует пиковый объём памяти процесса (peak_memory_bytes) и возвращает его.
+    """
+    peak = peak_memory_bytes()
+    if peak is not None:
+        logger.debug("Пиковый объём памяти процесса: %.1f МБ", peak / (1 << 20))
+    return peak
+
+
+def fit_timed(pipeline: Pipeline, X: np.ndarray, y: np.ndarray) -> dict[str, float]:
+    """
+    Обучает пайплайн и измеряет время обучения.
+
+    Возвращает словарь с ключами "fit_seconds" (время обучения, с)
+    и "rows_per_sec" (обучающих объектов в секунду).
+    Генерирует исключение при ошибке обучения.
+    """
+    start = time.perf_counter()
+    try:
+        pipeline.fit(X, y)
     except Exception as exc:
         raise ValueError(
             "Ошибка при обучении модели. Проверьте корректность данных (нет NaN/Inf, числовой тип)."
         ) from exc
-    y_pred_train = pipeline.predict(X_train)
-    y_pred_test = pipeline.predict(X_test)
-    metrics_train = compute_metrics(y_train, y_pred_train)
-    metrics_test = compute_metrics(y_test, y_pred_test)
+    elapsed = time.perf_counter() - start
+    return {
+        "fit_seconds": elapsed,
+        "rows_per_sec": len(y) / elapsed if elapsed > 0 else float("inf"),
+    }
+
+
+def log_timing(timing: dict[str, float], prefix: str = "") -> None:
+    """
+    Логирует время обучения (результат fit_timed) на уровне DEBUG.
+    """
+    logger.debug(
+        "%sвремя обучения = %.3f с, %.0f строк/с",
+        prefix,
+        timing["fit_seconds"],
+        timing["rows_per_sec"],
+    )
+
+
+def data_vocabularies(data_dir: Path) -> Optional[Path]:
+    """
+    Файл словарей категорий, сохранённый chain_pattern рядом с матрицами (None, если его нет).
+    """
+    path = data_dir / VOCABULARIES_FILENAME
+    return path if path.is_file() else None
+
+
+def save_trained(
+    pipeline: Pipeline,
+    metadata: Optional[dict] = None,
+    vocabularies: Optional[Path] = None,
+) -> str:
+    """
+    Сохраняет обученный пайплайн и, если он поддерживается, его скомпилированную версию
+    как текущую модель и новой версией реестра (см. model_io.register_model).
+
+    metadata — сведения об обучении для реестра (отпечаток данных, метрики).
+    vocabularies — словари категорий обучающих данных (см. data_vocabularies);
+    сохраняются рядом с моделью и читаются regression.infer.
+    Без vocabularies (дообучение) словари текущей модели не меняются; в реестр
+    с версией сохраняются словари, с которыми модель стала текущей.
+    Скомпилированная версия предыдущей модели удаляется, если новую скомпилировать нельзя.
+    Возвращает номер версии.
+    """
+    save_model(pipeline, vocabularies)
+    try:
+        compiled = compile_pipeline(pipeline)
+    except ValueError as exc:
+        logger.debug("Скомпилированная версия не создаётся: %s", exc)
+        compiled = None
+        delete_compiled_model()
+    else:
+        save_compiled_model(compiled)
+    current = get_vocabularies_path()
+    return register_model(pipeline, compiled, metadata, current if current.is_file() else None)
+
+
+def _iteration_param(regressor: object) -> str:
+    """
+    Имя параметра числа стадий бустинга у регрессора, поддерживающего warm_start.
+
+    Генерирует исключение для регрессоров без дообучения стадиями.
+    """
+    if isinstance(regressor, GradientBoostingRegressor):
+        return "n_estimators"
+    if isinstance(regressor, HistGradientBoostingRegressor):
+        return "max_iter"
+    raise ValueError(
+        "Дообучение поддерживает только GradientBoostingRegressor и "
+        f"HistGradientBoostingRegressor, получен {type(regressor).__name__}."
+    )
+
+
+def add_stages(pipeline: Pipeline, X: np.ndarray, y: np.ndarray, n_stages: int) -> dict[str, float]:
+    """
+    Добавляет n_stages стадий бустинга к обученному пайплайну, обучая их только на X, y.
+
+    Масштабирование остаётся прежним (деревья обучены на его выходе); существующие
+    деревья не перестраиваются — новые стадии приближают остатки модели на новых данных,
+    поэтому стоимость пропорциональна объёму новых данных.
+
+    Возвращает время обучения (см. fit_timed).
+    Генерирует исключение, если регрессор не поддерживает дообучение или число
+    признаков не совпадает с моделью.
+    """
+    regressor = pipeline.named_steps.get("regressor") if isinstance(pipeline, Pipeline) else pipeline
+    param = _iteration_param(regressor)
+    if X.shape[1] != regressor.n_features_in_:
+        raise ValueError(
+            f"Число признаков в новых данных ({X.shape[1]}) не совпадает с моделью "
+            f"({regressor.n_features_in_})."
+        )
+    stages = regressor.get_params()[param]
+    regressor.set_params(warm_start=True, **{param: stages + n_stages})
+    try:
+        timing = fit_timed(regressor, pipeline[:-1].transform(X), y)
+    finally:
+        regressor.set_params(warm_start=False)
+    logger.debug("Стадий бустинга: %d -> %d", stages, stages + n_stages)
+    return timing
+
+
+def _select_rows(
+    y: np.ndarray,
+    sample: Optional[int],
+    stratify: bool,
+    seed: int,
+) -> tuple[Optional[np.ndarray], np.ndarray, np.ndarray]:
+    """
+    Строки для обучения: выборка размера sample (None — все строки, см. sample_rows)
+    и её разбиение на обучающую и тестовую части (split_rows).
+    """
+    rows = None if sample is None else sample_rows(y, sample, stratify, seed)
+    train_rows, test_rows = split_rows(np.arange(len(y)) if rows is None else rows)
+    logger.debug(
+        "Разбиение: обучающая выборка %d, тестовая %d%s",
+        len(train_rows),
+        len(test_rows),
+        "" if rows is None else f" (выборка {len(rows)} из {len(y)} строк)",
+    )
+    return rows, train_rows, test_rows
+
+
+def _sample_metadata(sample: Optional[int], stratify: bool, seed: int) -> dict:
+    """
+    Сведения о выборке для метаданных реестра (пустые при обучении на всех строках).
+    """
+    if sample is None:
+        return {}
+    return {"sample": {"size": sample, "stratify": stratify, "seed": seed}}
+
+
+def update(
+    data_dir: Path,
+    n_stages: int = UPDATE_STAGES,
+    sample: Optional[int] = None,
+    stratify: bool = False,
+    seed: int = SPLIT_SEED,
+) -> dict:
+    """
+    Дообучает сохранённую модель на новой порции данных и сохраняет её.
+
+    Загружает regression/resources/salary_model.joblib и добавляет n_stages стадий
+    бустинга (warm_start), обученных только на данных из data_dir (x_data.npy, y_data.npy).
+    Метрики старой и дообученной модели сравниваются на тестовой части новых данных;
+    затем стадии добавляются к исходной модели по всем новым данным.
+    Данные отображаются в память, как в train; sample, stratify и seed — тоже как в train.
+
+    Возвращает отчёт: время обучения и строк в секунду на обучающей части,
+    метрики старой ("old") и новой ("new") модели на тестовой части, версию в реестре,
+    пиковый объём памяти процесса ("peak_memory_bytes", см. peak_memory_bytes).
+    Генерирует исключение при отсутствии модели или данных, неподдерживаемом
+    регрессоре или сбое сохранения.
+    """
+    X, y = load_data(data_dir, memory_map=True)
+    rows, train_rows, test_rows = _select_rows(y, sample, stratify, seed)
+    pipeline = load_model(cache=False)
+    metrics_old = evaluate(pipeline, X, y, test_rows)
+    timing = add_stages(pipeline, take_rows(X, train_rows), y[train_rows], n_stages)
+    metrics_new = evaluate(pipeline, X, y, test_rows)
+    log_timing(timing, prefix="Дообучение: ")
+    log_metrics(metrics_old, prefix="Метрики старой модели на новых данных: ")
+    log_metrics(metrics_new, prefix="Метрики дообученной модели на новых данных: ")
+    pipeline = load_model(cache=False)
+    if rows is None:
+        X_all, y_all = as_model_input(X), y
+    else:
+        X_all, y_all = take_rows(X, rows), y[rows]
+    log_timing(add_stages(pipeline, X_all, y_all, n_stages), prefix="Дообучение на всех новых данных: ")
+    del X_all
+    version = save_trained(
+        pipeline,
+        {
+            "backend": "update",
+            "stages_added": n_stages,
+            "data_fingerprint": data_fingerprint(data_dir),
+            "rows": len(y_all),
+            **_sample_metadata(sample, stratify, seed),
+            "metrics": {"old": metrics_old, "new": metrics_new},
+        },
+    )
+    logger.debug("Дообучение завершено, модель сохранена в regression/resources (версия %s)", version)
+    return {
+        **timing,
+        "old": metrics_old,
+        "new": metrics_new,
+        "version": version,
+        "peak_memory_bytes": log_peak_memory(),
+    }
+
+
+def train(
+    data_dir: Path,
+    backend: str = "gbr",
+    sample: Optional[int] = None,
+    stratify: bool = False,
+    seed: int = SPLIT_SEED,
+) -> dict:
+    """
+    Обучает регрессионный пайплайн и сохраняет его в папку regression/resources.
+
+    Пайплайн: StandardScaler + регрессор выбранного способа обучения (см. BACKENDS),
+    по умолчанию GradientBoostingRegressor.
+    Использует данные из указанной папки (x_data.npy, y_data.npy).
+    Сохраняется в regression/resources/salary_model.joblib, скомпилированная
+    версия (см. regression.compiled) — в regression/resources/salary_model.npz,
+    и новой версией реестра моделей (см. model_io.register_model).
+
+    Данные отображаются в память (load_data с memory_map), разбиение выполняется по номерам
+    строк (split_rows): в память копируются только строки обучающей части, тестовая
+    часть оценивается блоками (evaluate). Без выборки итоговая модель обучается на всей
+    матрице, и её копия для sklearn (float64) должна поместиться в память; для данных
+    больше памяти задаётся sample.
+
+    data_dir — путь к папке с выходом пайплайна chain_pattern.
+    backend — способ обучения (ключ BACKENDS).
+    sample — обучать только на воспроизводимой выборке из sample строк (см. sample_rows);
+    разбиение и итоговое обучение выполняются внутри неё.
+    stratify — выборка с сохранением долей квантильных интервалов зарплат.
+    seed — зерно выборки.
+
+    Возвращает отчёт: способ обучения, время обучения и строк в секунду на обучающей
+    выборке, метрики на обучающей и тестовой выборках, версию в реестре, пиковый
+    объём памяти процесса ("peak_memory_bytes", см. peak_memory_bytes).
+    Генерирует исключение при отсутствии данных, ошибке формата, неверном размере
+    выборки или сбое сохранения.
+    """
+    X, y = load_data(data_dir, memory_map=True)
+    pipeline = build_regression_pipeline(backend, sparse.issparse(X))
+    rows, train_rows, test_rows = _select_rows(y, sample, stratify, seed)
+    logger.debug(
+        "Запуск обучения пайплайна (%s): %s",
+        backend,
+        " + ".join(type(step).__name__ for _, step in pipeline.steps),
+    )
+    X_train, y_train = take_rows(X, train_rows), y[train_rows]
+    timing = fit_timed(pipeline, X_train, y_train)
+    metrics_train = evaluate(pipeline, X_train, y_train)
+    del X_train
+    metrics_test = evaluate(pipeline, X, y, test_rows)
+    log_timing(timing, prefix=f"Способ обучения {backend}: ")
     log_metrics(metrics_train, prefix="Метрики на обучающей выборке: ")
     log_metrics(metrics_test, prefix="Метрики на тестовой выборке: ")
-    pipeline.fit(X, y)
-    save_model(pipeline)
-    logger.debug("Обучение завершено, модель сохранена в regression/resources")
+    if rows is None:
+        X_all, y_all = as_model_input(X), y
+    else:
+        X_all, y_all = take_rows(X, rows), y[rows]
+    log_timing(fit_timed(pipeline, X_all, y_all), prefix="Обучение на всех данных: ")
+    del X_all
+    version = save_trained(
+        pipeline,
+        {
+            "backend": backend,
+            "data_fingerprint": data_fingerprint(data_dir),
+            "rows": len(y_all),
+            **_sample_metadata(sample, stratify, seed),
+            "metrics": {"train": metrics_train, "test": metrics_test},
+        },
+        data_vocabularies(data_dir),
+    )
+    logger.debug("Обучение завершено, модель сохранена в regression/resources (версия %s)", version)
+    return {
+        "backend": backend,
+        **timing,
+        "train": metrics_train,
+        "test": metrics_test,
+        "version": version,
+        "peak_memory_bytes": log_peak_memory(),
+    }
 
 
 def main() -> None:
     """
     Точка входа CLI для обучения модели.
 
-    Ожидает один аргумент — путь к папке с x_data.npy и y_data.npy.
+    Ожидает путь к папке с x_data.npy и y_data.npy и необязательный --backend;
+    с --update дообучает сохранённую модель на этих данных, с --sample обучает
+    на выборке строк (--stratify, --seed).
     Завершает работу с кодом 1 при ошибке.
     """
-    if len(sys.argv) != 2:
-        print(
-            "Использование: python -m regression.train <путь_к_папке_с_x_data_и_y_data>",
-            file=sys.stderr,
-        )
-        sys.exit(1)
-    path_arg = sys.argv[1]
+    parser = ArgumentParser(
+        prog="python -m regression.train",
+        description="Обучение модели предсказания зарплат.",
+    )
+    parser.add_argument(
+        "data_dir", help="путь к папке с features.hfs или x_data.npy (x_data.npz) и y_data.npy"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=list(BACKENDS),
+        default="gbr",
+        help="способ обучения: gbr (по умолчанию), hist (многопоточный) или linear",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="дообучить сохранённую модель на новых данных вместо обучения с нуля",
+    )
+    parser.add_argument(
+        "--stages",
+        type=int,
+        default=UPDATE_STAGES,
+        help=f"число добавляемых стадий бустинга при --update (по умолчанию {UPDATE_STAGES})",
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=None,
+        help="обучать на воспроизводимой случайной выборке из указанного числа строк",
+    )
+    parser.add_argument(
+        "--stratify",
+        action="store_true",
+        help="выборка --sample с сохранением долей квантильных интервалов зарплат",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=SPLIT_SEED,
+        help=f"зерно выборки --sample (по умолчанию {SPLIT_SEED})",
+    )
+    args = parser.parse_args()
+    if args.stages < 1:
+        parser.error("--stages должен быть положительным")
+    if args.sample is not None and args.sample < 1:
+        parser.error("--sample должен быть положительным")
+    if args.stratify and args.sample is None:
+        parser.error("--stratify задаётся вместе с --sample")
     try:
-        data_dir = Path(path_arg).resolve()
+        data_dir = Path(args.data_dir).resolve()
         if not data_dir.is_dir():
             raise NotADirectoryError(f"Указанный путь не является папкой: {data_dir}")
-        train(data_dir)
+        if args.update:
+            update(data_dir, args.stages, args.sample, args.stratify, args.seed)
+        else:
+            train(data_dir, args.backend, args.sample, args.stratify, args.seed)
     except (ValueError, OSError) as exc:
         logger.debug("Ошибка при обучении: %s", exc)
         print(f"Ошибка: {exc}", file=sys.stderr)
@@ -0,0 +1,57 @@
+"""
+CLI regression.app: вывод по умолчанию совпадает с пайплайном sklearn, матрица читается один раз.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from regression import app, model_io
+from regression.compiled import compile_pipeline
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """
+    Небольшой обученный пайплайн и его скомпилированная версия в папке resources во временном каталоге.
+    """
+    monkeypatch.setattr(model_io, "_resources_dir", lambda: tmp_path / "resources")
+    model_io.clear_model_cache()
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 50, size=(300, 4)).astype(np.float64)
+    y = X @ [1000.0, 250.0, 0.0, 40.0] + rng.normal(0, 100, 300)
+    fitted = make_pipeline(StandardScaler(), GradientBoostingRegressor(n_estimators=20, random_state=0))
+    fitted.fit(X, y)
+    model_io.save_model(fitted)
+    model_io.save_compiled_model(compile_pipeline(fitted))
+    np.save(tmp_path / "x_data.npy", X)
+    yield fitted, X, tmp_path
+    model_io.clear_model_cache()
+
+
+def _run(monkeypatch, *argv: str) -> None:
+    monkeypatch.setattr(sys, "argv", ["regression.app", *argv])
+    app.main()
+
+
+def test_default_output_matches_sklearn(pipeline, monkeypatch, capfdbinary):
+    fitted, X, tmp_path = pipeline
+    _run(monkeypatch, str(tmp_path / "x_data.npy"))
+    expected = "".join(f"{value}\n" for value in fitted.predict(X).tolist())
+    assert capfdbinary.readouterr().out.decode("ascii") == expected
+
+
+def test_npy_output_loads_matrix_once(pipeline, monkeypatch):
+    fitted, X, tmp_path = pipeline
+    calls = []
+    load = app.load_x_data
+    monkeypatch.setattr(app, "load_x_data", lambda path: calls.append(path) or load(path))
+    out = tmp_path / "pred.npy"
+    _run(monkeypatch, str(tmp_path / "x_data.npy"), "--output", str(out), "--backend", "compiled")
+    assert len(calls) == 1
+    assert np.allclose(np.load(out), fitted.predict(X))
@@ -0,0 +1,54 @@
+"""
+Запись матриц по частям: часть более широкого типа переводит в него уже записанные строки.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import numpy as np
+import pytest
+
+from chain_pattern.handlers.build_matrices import NpyAppender
+from chain_pattern.handlers.feature_store import FeatureStore, FeatureStoreWriter
+
+
+def _parts() -> list[np.ndarray]:
+    """
+    Части экономного режима: float32, затем float64 (значение больше 2**24), затем снова float32.
+    """
+    first = np.asfortranarray(np.arange(12, dtype=np.float32).reshape(4, 3))
+    second = np.asfortranarray(np.array([[2.0 ** 24 + 1, 1.0, 2.0]]))
+    third = np.asfortranarray(np.full((2, 3), 7, dtype=np.float32))
+    return [first, second, third]
+
+
+def test_npy_appender_upcasts_written_parts(tmp_path):
+    path = tmp_path / "x_data.npy"
+    appender = NpyAppender(path)
+    for part in _parts():
+        appender.append(part)
+    appender.close()
+    expected = np.concatenate([part.astype(np.float64) for part in _parts()])
+    np.save(tmp_path / "expected.npy", np.asfortranarray(expected))
+    assert path.read_bytes() == (tmp_path / "expected.npy").read_bytes()
+
+
+def test_npy_appender_rejects_incompatible_type(tmp_path):
+    appender = NpyAppender(tmp_path / "x_data.npy")
+    appender.append(np.zeros((2, 2)))
+    with pytest.raises(ValueError):
+        appender.append(np.array([["a", "b"]]))
+    appender.discard()
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_feature_store_writer_upcasts_written_parts(tmp_path, compression):
+    path = tmp_path / "features.hfs"
+    writer = FeatureStoreWriter(path, ["a", "b", "c"], compression=compression, chunk_rows=3)
+    for part in _parts():
+        writer.append(part, np.ones(len(part), dtype=np.float32))
+    writer.close()
+    expected = np.concatenate([part.astype(np.float64) for part in _parts()])
+    with FeatureStore(path) as store:
+        assert store.read().dtype == np.float64
+        np.testing.assert_array_equal(store.read(), expected)
+        np.testing.assert_array_equal(store.read_target(), np.ones(len(expected)))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["features.hfs"]
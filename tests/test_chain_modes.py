@@ -0,0 +1,147 @@
+"""
+Потоковая, параллельная (по диапазонам байтов) и инкрементальная обработка CSV
+дают те же x_data.npy, y_data.npy и словари, что и обработка файла целиком.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import csv
+import io
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from benchmarks.generate import COLUMNS, _Pools, generate_block
+
+ROOT = Path(__file__).resolve().parent.parent
+CHAIN_DIR = ROOT / "chain_pattern"
+OUTPUTS = ("x_data.npy", "y_data.npy", "vocabularies.json")
+# Число строк даёт остаток 1 от деления на 6: при строках равной длины границы двух
+# и трёх частей файла приходятся на середину и на трети строки, а не на её начало.
+ROWS = 601
+COMPANY_COLUMN = COLUMNS.index("Последенее/нынешнее место работы")
+
+
+def _row(record: list[str]) -> bytes:
+    out = io.StringIO()
+    csv.writer(out, lineterminator="\n").writerow(record)
+    return out.getvalue().encode("utf-8")
+
+
+def _csv_text(rows: int, seed: int = 0) -> bytes:
+    """
+    Синтетическая выгрузка со строками одинаковой длины в байтах. Место работы —
+    значение в кавычках, занимающее середину строки и оканчивающееся переводом строки,
+    поэтому границы частей попадают внутрь него, а ближайший за ними перевод строки
+    не завершает запись.
+    """
+    block = generate_block(np.random.default_rng(seed), _Pools(), 0, rows)
+    records = list(csv.reader(io.StringIO(block)))
+    for i, record in enumerate(records):
+        record[COMPANY_COLUMN] = f"{record[COMPANY_COLUMN]}, отдел {i}"
+    edges = []
+    for record in records:
+        before = _row(record[:COMPANY_COLUMN] + [""])
+        after = _row([""] + record[COMPANY_COLUMN + 1:])
+        edges.append(max(len(before), len(after)))
+    length = 3 * max(edges) + 3 * max(len(_row(record)) for record in records)
+    lines = [_row(COLUMNS)]
+    for record in records:
+        record[COMPANY_COLUMN] += "\n"
+        padding = length - len(_row(record))
+        record[COMPANY_COLUMN] = record[COMPANY_COLUMN][:-1] + " " * padding + "\n"
+        lines.append(_row(record))
+        assert len(lines[-1]) == length
+    return b"".join(lines)
+
+
+def _inside_quotes(data: bytes, offset: int) -> bool:
+    return data.count(b'"', 0, offset) % 2 == 1
+
+
+def _run(csv_path: Path, *options: str) -> None:
+    subprocess.run(
+        [sys.executable, "main.py", str(csv_path), *options],
+        cwd=CHAIN_DIR,
+        check=True,
+        capture_output=True,
+    )
+
+
+def _outputs(directory: Path) -> dict[str, bytes]:
+    return {name: (directory / name).read_bytes() for name in OUTPUTS}
+
+
+@pytest.fixture(scope="module")
+def source(tmp_path_factory) -> Path:
+    directory = tmp_path_factory.mktemp("source")
+    path = directory / "data.csv"
+    path.write_bytes(_csv_text(ROWS))
+    return path
+
+
+@pytest.fixture(scope="module")
+def whole(source, tmp_path_factory) -> dict[str, bytes]:
+    directory = tmp_path_factory.mktemp("whole")
+    shutil.copy(source, directory / source.name)
+    _run(directory / source.name)
+    return _outputs(directory)
+
+
+def test_shard_boundaries_fall_inside_quoted_newlines(source):
+    data = source.read_bytes()
+    header_end = data.index(b"\n") + 1
+    body = len(data) - header_end
+    for parts in (2, 3):
+        offsets = [header_end + body * k // parts for k in range(1, parts)]
+        assert all(_inside_quotes(data, offset) for offset in offsets)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ("--chunksize", "97"),
+        ("--workers", "2"),
+        ("--workers", "3"),
+        ("--workers", "3", "--chunksize", "97"),
+    ],
+    ids=["chunked", "workers2", "workers3", "workers3-chunked"],
+)
+def test_mode_matches_whole_file(source, whole, tmp_path, options):
+    path = tmp_path / source.name
+    shutil.copy(source, path)
+    _run(path, *options)
+    assert _outputs(tmp_path) == whole
+
+
+def test_incremental_appends_match_whole_file(source, whole, tmp_path):
+    data = source.read_bytes()
+    path = tmp_path / source.name
+    # Первый запуск видит незавершённую запись, оборванную внутри значения в кавычках.
+    cut = data.index(b"\n", len(data) // 3)
+    assert _inside_quotes(data, cut)
+    for end in (cut, 2 * len(data) // 3, len(data)):
+        with open(path, "ab") as file:
+            file.write(data[path.stat().st_size if path.exists() else 0:end])
+        _run(path, "--incremental", "--chunksize", "97")
+    assert _outputs(tmp_path) == whole
+    # Повторный запуск без новых записей ничего не меняет.
+    _run(path, "--incremental")
+    assert _outputs(tmp_path) == whole
+
+
+def test_incremental_rebuilds_after_rotation(source, tmp_path):
+    path = tmp_path / source.name
+    shutil.copy(source, path)
+    _run(path, "--incremental")
+    # Ротация: файл заменён другой, более короткой выгрузкой.
+    path.write_bytes(_csv_text(ROWS // 2, seed=1))
+    _run(path, "--incremental")
+    expected_dir = tmp_path / "expected"
+    expected_dir.mkdir()
+    shutil.copy(path, expected_dir / source.name)
+    _run(expected_dir / source.name)
+    assert _outputs(tmp_path) == _outputs(expected_dir)
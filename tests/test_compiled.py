@@ -0,0 +1,84 @@
+"""
+Скомпилированная модель совпадает с пайплайном sklearn, в том числе на значениях,
+совпадающих с порогами деревьев после свёртки масштабирования.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from regression.compiled import CompiledModel, compile_pipeline
+
+
+def _data(rows: int = 400) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Целочисленные признаки (как коды категорий и возраст) с нулями для разреженного вида.
+    """
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 30, size=(rows, 5)).astype(np.float64)
+    X[rng.random(X.shape) < 0.5] = 0
+    y = X @ [900.0, -300.0, 50.0, 0.0, 700.0] + rng.normal(0, 200, rows)
+    return X, y
+
+
+def _edge_rows(compiled: CompiledModel, X: np.ndarray) -> np.ndarray:
+    """
+    Строки, в которых один признак равен порогу в исходных единицах или ближайшему
+    большему числу: на таких значениях ветвление решается точным сравнением.
+    """
+    rows = []
+    base = np.median(X, axis=0)
+    for f in range(compiled.n_features_in_):
+        lo, hi = compiled.threshold_offsets[f], compiled.threshold_offsets[f + 1]
+        for threshold in compiled.thresholds[lo:hi]:
+            for value in (threshold, np.nextafter(threshold, np.inf)):
+                row = base.copy()
+                row[f] = value
+                rows.append(row)
+    return np.array(rows)
+
+
+def _fit(with_mean: bool):
+    X, y = _data()
+    pipeline = make_pipeline(
+        StandardScaler(with_mean=with_mean),
+        GradientBoostingRegressor(n_estimators=30, max_depth=4, random_state=0),
+    )
+    return pipeline.fit(X, y), X
+
+
+def test_dense_predictions_match_pipeline():
+    pipeline, X = _fit(with_mean=True)
+    compiled = compile_pipeline(pipeline)
+    edges = _edge_rows(compiled, X)
+    assert len(edges)
+    for data in (X, edges):
+        assert np.allclose(compiled.predict(data), pipeline.predict(data))
+
+
+def test_sparse_predictions_match_pipeline():
+    # Без центрирования пайплайн обучается на разреженной матрице, и скомпилированная
+    # модель повторяет масштабирование разреженного входа для матриц обоих видов.
+    pipeline, X = _fit(with_mean=False)
+    compiled = compile_pipeline(pipeline)
+    for data in (X, _edge_rows(compiled, X)):
+        expected = pipeline.predict(sparse.csr_matrix(data))
+        assert np.allclose(compiled.predict(sparse.csr_matrix(data)), expected)
+        assert np.allclose(compiled.predict(data), expected)
+
+
+def test_round_trip_through_arrays():
+    pipeline, X = _fit(with_mean=True)
+    compiled = compile_pipeline(pipeline)
+    restored = CompiledModel.from_arrays(compiled.to_arrays())
+    assert np.array_equal(restored.predict(X), compiled.predict(X))
+
+
+def test_rejects_wrong_number_of_features():
+    pipeline, X = _fit(with_mean=True)
+    with pytest.raises(ValueError):
+        compile_pipeline(pipeline).predict(X[:, :3])
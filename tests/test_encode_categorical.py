@@ -0,0 +1,52 @@
+"""
+Словари top:N, собранные по частям: совпадение с обработкой файла целиком и число значений.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+
+from chain_pattern.handlers.encode_categorical import EncodeCategoricalHandler
+
+COLUMN = "ищет_работу_на_должность:"
+TOP = 50
+
+
+def _vocabulary(values: list[str], chunk_rows: int) -> list[str]:
+    encoder = EncodeCategoricalHandler(encodings={COLUMN: ("top", TOP)})
+    for start in range(0, len(values), chunk_rows):
+        encoder.partial_fit(pd.DataFrame({COLUMN: values[start:start + chunk_rows]}))
+    return encoder.vocabularies[COLUMN]
+
+
+def _titles(frequent: int, tail: int, tail_count: int) -> list[str]:
+    """
+    TOP значений по frequent раз и плоский хвост из tail значений по tail_count раз
+    в случайном порядке: разных значений больше, чем счётчиков.
+    """
+    values = [f"частое {i}" for i in range(TOP) for _ in range(frequent)]
+    values += [f"редкое {i}" for i in range(tail) for _ in range(tail_count)]
+    np.random.default_rng(0).shuffle(values)
+    return values
+
+
+def test_chunked_top_matches_whole_file_within_capacity():
+    values = [f"должность {i % 300}" for i in range(30 * 300)] + ["редкая"]
+    whole = _vocabulary(values, chunk_rows=len(values))
+    assert len(whole) == TOP
+    assert _vocabulary(values, chunk_rows=700) == whole
+
+
+def test_chunked_top_keeps_frequent_values():
+    # Частота 100 больше доли 1 / (TOP · TOP_COUNTERS_FACTOR) от 30000 строк.
+    values = _titles(frequent=100, tail=5000, tail_count=5)
+    whole = _vocabulary(values, chunk_rows=len(values))
+    assert whole == sorted(f"частое {i}" for i in range(TOP))
+    for chunk_rows in (3000, 500):
+        assert _vocabulary(values, chunk_rows=chunk_rows) == whole
+
+
+def test_chunked_top_keeps_n_values_with_flat_tail():
+    values = _titles(frequent=20, tail=5000, tail_count=5)
+    for chunk_rows in (3000, 500):
+        assert len(_vocabulary(values, chunk_rows=chunk_rows)) == TOP
@@ -0,0 +1,129 @@
+"""
+Хранилище признаков: чтение срезов строк и столбцов без сжатия (представлением
+отображённого файла) и со сжатием zlib, понятные ошибки для обрезанного или повреждённого файла.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import json
+import mmap
+
+import numpy as np
+import pytest
+
+from chain_pattern.handlers.feature_store import _TAIL, ALIGNMENT, FeatureStore, FeatureStoreWriter
+
+NAMES = ["a", "b", "c", "d"]
+
+
+def _matrix() -> tuple[np.ndarray, np.ndarray]:
+    x = np.arange(40, dtype=np.float32).reshape(10, 4) / 4
+    y = np.linspace(10_000.0, 90_000.0, 10)
+    return x, y
+
+
+def _write(path, compression) -> None:
+    x, y = _matrix()
+    writer = FeatureStoreWriter(path, NAMES, compression=compression, chunk_rows=3, fingerprint="f")
+    for start in range(0, len(x), 4):
+        writer.append(x[start:start + 4], y[start:start + 4])
+    writer.close()
+
+
+def _maps_file(array: np.ndarray) -> bool:
+    """
+    Массив — представление отображённого в память файла, а не копия.
+    """
+    base = array
+    while isinstance(base, np.ndarray):
+        base = base.base
+    if isinstance(base, memoryview):
+        base = base.obj
+    return isinstance(base, mmap.mmap)
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_round_trip_with_slices(tmp_path, compression):
+    path = tmp_path / "features.hfs"
+    _write(path, compression)
+    x, y = _matrix()
+    with FeatureStore(path) as store:
+        assert store.shape == (10, 4)
+        assert (store.feature_names, store.fingerprint, store.compression) == (NAMES, "f", compression)
+        assert store.dtype == np.float32 and store.target_dtype == np.float64
+        np.testing.assert_array_equal(store.read(), x)
+        np.testing.assert_array_equal(store.read_target(), y)
+        np.testing.assert_array_equal(store[2:7], x[2:7])
+        np.testing.assert_array_equal(store[2:7, 1:3], x[2:7, 1:3])
+        np.testing.assert_array_equal(store.read(8, columns=["d", "b"]), x[8:, [3, 1]])
+        np.testing.assert_array_equal(store.read(-3), x[-3:])
+        np.testing.assert_array_equal(store.read_target(2, 7), y[2:7])
+        assert store.read(5, 5).shape == (0, 4)
+        assert store.read_target(5, 5).shape == (0,)
+        with pytest.raises(KeyError):
+            store.read(columns=["e"])
+        if compression is None:
+            assert _maps_file(store[2:7])
+            assert _maps_file(store[2:7, 1:3])
+            assert _maps_file(store.read_target(2, 7))
+
+
+def _header_bounds(data: bytes) -> tuple[int, int]:
+    """
+    Начало и конец JSON-заголовка в байтах файла.
+    """
+    length, _ = _TAIL.unpack(data[-_TAIL.size:])
+    end = len(data) - _TAIL.size
+    return end - length, end
+
+
+def _cut_data(data: bytes) -> bytes:
+    start, _ = _header_bounds(data)
+    return data[:start - ALIGNMENT] + data[start:]
+
+
+def _break_header(data: bytes) -> bytes:
+    start, _ = _header_bounds(data)
+    return data[:start] + b"[" + data[start + 1:]
+
+
+def _miscount_rows(data: bytes) -> bytes:
+    start, end = _header_bounds(data)
+    header = json.loads(data[start:end])
+    header["rows"] += 1
+    encoded = json.dumps(header).encode("utf-8")
+    return data[:start] + encoded + _TAIL.pack(len(encoded), data[-8:])
+
+
+@pytest.mark.parametrize(
+    "corrupt, message",
+    [
+        (lambda data: b"", "пуст"),
+        (lambda data: data[:-3], "не является хранилищем"),
+        (lambda data: data[:len(data) // 2], "не является хранилищем"),
+        (_cut_data, "обрезан или повреждён"),
+        (_miscount_rows, "обрезан или повреждён"),
+        (_break_header, "Заголовок хранилища признаков повреждён"),
+    ],
+    ids=["empty", "tail", "half", "data", "rows", "header"],
+)
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_corrupted_file_raises(tmp_path, compression, corrupt, message):
+    path = tmp_path / "features.hfs"
+    _write(path, compression)
+    path.write_bytes(corrupt(path.read_bytes()))
+    with pytest.raises(ValueError, match=message):
+        FeatureStore(path)
+
+
+def test_corrupted_compressed_column_raises(tmp_path):
+    path = tmp_path / "features.hfs"
+    _write(path, "zlib")
+    data = bytearray(path.read_bytes())
+    start, end = _header_bounds(bytes(data))
+    offset, nbytes = json.loads(data[start:end])["chunks"][1]["features"][2]
+    data[offset:offset + nbytes] = bytes(nbytes)
+    path.write_bytes(bytes(data))
+    with FeatureStore(path) as store:
+        np.testing.assert_array_equal(store[0:3], _matrix()[0][0:3])
+        with pytest.raises(ValueError, match="Сжатый столбец"):
+            store[0:6]
@@ -0,0 +1,70 @@
+"""
+Метрики по группам: строковые коды групп и пропуски, сводка в JSON.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from regression.infer import _group_values, metrics_report
+from regression.metrics import MetricsAccumulator, compute_metrics
+
+
+def _accumulate(groups: np.ndarray, split: int = 3) -> MetricsAccumulator:
+    """
+    Накопитель по двум пакетам; во втором пакете появляются новые группы.
+    """
+    y_true = np.arange(1.0, len(groups) + 1)
+    y_pred = y_true + np.tile([1.0, -2.0], len(groups))[:len(groups)]
+    metrics = MetricsAccumulator()
+    metrics.update(y_true[:split], y_pred[:split], groups[:split])
+    metrics.update(y_true[split:], y_pred[split:], groups[split:])
+    return metrics
+
+
+def test_string_groups():
+    column = pd.Series(["МГУ", None, "МГУ", "СПбГУ", np.nan, "МГУ"], dtype=object)
+    groups = _group_values(column)
+    result = _accumulate(groups).group_metrics()
+    assert list(result) == ["", "МГУ", "СПбГУ"]
+    assert all(type(key) is str for key in result)
+    assert [values["rows"] for values in result.values()] == [2, 3, 1]
+    y_true = np.array([1.0, 3.0, 6.0])
+    expected = compute_metrics(y_true, y_true + np.array([1.0, 1.0, -2.0]))
+    assert result["МГУ"]["mae"] == pytest.approx(expected["mae"])
+
+    report = metrics_report(_accumulate(groups), {}, "образование_и_вуз")
+    assert list(report["groups"]) == ["неизвестно", "МГУ", "СПбГУ"]
+    json.dumps(report, ensure_ascii=False)
+
+
+def test_categorical_string_groups():
+    column = pd.Series(["a", "b", None, "a"], dtype="category")
+    groups = _group_values(column)
+    result = _accumulate(groups, split=2).group_metrics()
+    assert {key: values["rows"] for key, values in result.items()} == {"": 1, "a": 2, "b": 1}
+
+
+def test_nan_groups():
+    groups = np.array([1.0, np.nan, 2.0, np.nan, 1.0])
+    result = _accumulate(groups).group_metrics()
+    keys = list(result)
+    assert keys[:2] == [1.0, 2.0] and np.isnan(keys[2])
+    assert [values["rows"] for values in result.values()] == [2, 1, 2]
+
+    report = metrics_report(_accumulate(groups), {}, "age")
+    assert list(report["groups"]) == ["1.0", "2.0", "неизвестно"]
+    json.loads(json.dumps(report))
+
+
+def test_code_groups_use_vocabulary_labels():
+    groups = np.array([0, 1, -1, 0], dtype=np.int16)
+    report = metrics_report(_accumulate(groups, split=2), {"city": ["Москва", "Казань"]}, "city")
+    assert {key: values["rows"] for key, values in report["groups"].items()} == {
+        "неизвестно": 1,
+        "Москва": 2,
+        "Казань": 1,
+    }
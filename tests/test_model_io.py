@@ -0,0 +1,52 @@
+"""
+Реестр версий модели: словари категорий хранятся с версией и становятся текущими вместе с ней.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import numpy as np
+import pytest
+from sklearn.dummy import DummyRegressor
+
+from regression import model_io
+from regression.infer import model_vocabularies
+
+
+@pytest.fixture
+def resources(tmp_path, monkeypatch):
+    """
+    Папка resources во временном каталоге вместо папки пакета.
+    """
+    monkeypatch.setattr(model_io, "_resources_dir", lambda: tmp_path)
+    model_io.clear_model_cache()
+    yield tmp_path
+    model_io.clear_model_cache()
+
+
+def _model() -> DummyRegressor:
+    return DummyRegressor().fit(np.zeros((4, 2)), np.arange(4.0))
+
+
+def test_version_keeps_its_vocabularies(resources, tmp_path):
+    first = tmp_path / "first.json"
+    first.write_text('{"city": ["Москва"]}', encoding="utf-8")
+    second = tmp_path / "second.json"
+    second.write_text('{"city": ["Казань"]}', encoding="utf-8")
+    v1 = model_io.register_model(_model(), vocabularies=first)
+    v2 = model_io.register_model(_model(), vocabularies=second)
+
+    assert model_vocabularies(v1).read_bytes() == first.read_bytes()
+    assert model_vocabularies(v2).read_bytes() == second.read_bytes()
+
+    model_io.activate_version(v1)
+    assert model_io.get_vocabularies_path().read_bytes() == first.read_bytes()
+    assert model_vocabularies().read_bytes() == first.read_bytes()
+
+
+def test_version_without_vocabularies_uses_current(resources):
+    current = model_io.get_vocabularies_path()
+    current.write_text('{"city": ["Москва"]}', encoding="utf-8")
+    version = model_io.register_model(_model())
+
+    assert model_vocabularies(version) == current
+    model_io.activate_version(version)
+    assert current.read_text(encoding="utf-8") == '{"city": ["Москва"]}'
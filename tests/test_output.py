@@ -0,0 +1,83 @@
+"""
+Запись предсказаний в форматах --output (text, npy, f32, csv), граница записи CSV
+и файлы результатов пакетного предсказания.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from regression import batch
+from regression.output import CSV_MAX_ABS, format_csv, format_text, output_format, write_predictions
+
+PRED = np.array([0.0, 1.0, -2.5, 123456.789, -1234.5678, 1e-3, 89999999999999.98])
+
+
+def _batches() -> list[np.ndarray]:
+    return [PRED[:3], PRED[3:3], PRED[3:]]
+
+
+@pytest.mark.parametrize("fmt", ["text", "npy", "f32", "csv"])
+def test_format_round_trip(tmp_path, fmt):
+    path = tmp_path / "pred.out"
+    assert write_predictions(_batches(), path, fmt, rows=len(PRED)) == len(PRED)
+    if fmt == "npy":
+        np.testing.assert_array_equal(np.load(path), PRED)
+    elif fmt == "f32":
+        np.testing.assert_array_equal(np.fromfile(path, dtype="<f4"), PRED.astype(np.float32))
+    else:
+        lines = path.read_text(encoding="ascii").splitlines()
+        if fmt == "csv":
+            assert lines == ["salary"] + [f"{value:.2f}" for value in PRED]
+        else:
+            assert lines == [str(value) for value in PRED.tolist()]
+    assert [p.name for p in tmp_path.iterdir()] == ["pred.out"]
+
+
+def test_output_format_by_suffix():
+    assert output_format("pred.NPY") == "npy"
+    assert output_format("pred.f32") == "f32"
+    assert output_format("pred.csv") == "csv"
+    assert output_format("pred.txt") == "text"
+    assert output_format("-") == "text"
+    assert output_format("pred.csv", "text") == "text"
+
+
+def test_npy_row_count_mismatch_keeps_previous_file(tmp_path):
+    path = tmp_path / "pred.npy"
+    path.write_bytes(b"old")
+    with pytest.raises(ValueError):
+        write_predictions(_batches(), path, "npy", rows=len(PRED) + 1)
+    assert [p.name for p in tmp_path.iterdir()] == ["pred.npy"]
+    assert path.read_bytes() == b"old"
+
+
+def test_csv_boundary():
+    below = np.nextafter(CSV_MAX_ABS, 0)
+    values = np.array([below, -below, CSV_MAX_ABS - 0.01, 2.0 ** 46 + 0.25, -(2.0 ** 40) - 0.75])
+    expected = "".join(f"{value:.2f}\n" for value in values)
+    assert format_csv(values).decode("ascii") == expected
+    for value in (CSV_MAX_ABS, -CSV_MAX_ABS, 1e15 + 0.25, np.nan, np.inf):
+        with pytest.raises(ValueError):
+            format_csv(np.array([1.0, value]))
+
+
+def test_csv_boundary_scales_with_decimals():
+    assert format_csv(np.array([8.9e12 + 0.5]), decimals=3) == b"8900000000000.500\n"
+    with pytest.raises(ValueError):
+        format_csv(np.array([9e12]), decimals=3)
+
+
+def test_score_file_writes_text_format(tmp_path):
+    X = np.arange(20, dtype=np.float64).reshape(10, 2)
+    model = LinearRegression().fit(X, X @ [1000.0, 0.5] + 0.1)
+    x_path = tmp_path / "x_data.npy"
+    np.save(x_path, X)
+    report = batch.score_file(model, x_path, batch_size=3)
+    assert report["rows"] == 10
+    output = tmp_path / "x_data.predictions.txt"
+    assert report["output"] == str(output)
+    expected = b"".join(format_text(model.predict(X[start:start + 3])) for start in range(0, 10, 3))
+    assert output.read_bytes() == expected
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["x_data.npy", "x_data.predictions.txt"]
@@ -0,0 +1,30 @@
+"""
+Подбор гиперпараметров: проверка аргументов ранней остановки.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from regression.search import STEP, evaluate_fold
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_evaluate_fold_rejects_max_estimators_below_step(tmp_path):
+    with pytest.raises(ValueError):
+        evaluate_fold(tmp_path, "gbr", {}, fold=0, n_folds=2, max_estimators=STEP - 1)
+
+
+def test_cli_rejects_max_estimators_below_step(tmp_path):
+    result = subprocess.run(
+        [sys.executable, "-m", "regression.search", str(tmp_path), "--max-estimators", "5"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 1
+    assert "--max-estimators" in result.stderr
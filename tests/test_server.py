@@ -0,0 +1,125 @@
+"""
+Сервер предсказаний: HTTP-интерфейс, микропакеты одновременных запросов, остановка.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import http.client
+import json
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from regression.server import MicroBatcher, make_server
+
+N_FEATURES = 3
+
+
+class _SumModel:
+    """
+    Модель-заглушка: предсказание — сумма признаков; запоминает размеры пакетов.
+    """
+
+    n_features_in_ = N_FEATURES
+
+    def __init__(self) -> None:
+        self.batches: list[int] = []
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        self.batches.append(len(X))
+        return X.sum(axis=1)
+
+
+@pytest.fixture
+def server():
+    """
+    Сервер на свободном TCP-порту в отдельном потоке; модель набирает пакет из 4 строк.
+    """
+    model = _SumModel()
+    batcher = MicroBatcher(model, max_batch_rows=4, max_wait_ms=5000)
+    httpd = make_server(batcher, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, model
+    httpd.shutdown()
+    httpd.server_close()
+    batcher.close()
+    thread.join()
+
+
+def _request(httpd, method: str, path: str, payload=None) -> tuple[int, dict]:
+    connection = http.client.HTTPConnection(*httpd.server_address, timeout=10)
+    try:
+        body = None if payload is None else json.dumps(payload)
+        connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_health(server):
+    httpd, _ = server
+    assert _request(httpd, "GET", "/health") == (200, {"status": "ok"})
+
+
+def test_predict_batches_concurrent_requests(server):
+    httpd, model = server
+    rows = [[[float(i), 1.0, 2.0]] for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(lambda r: _request(httpd, "POST", "/predict", {"rows": r}), rows))
+    assert [status for status, _ in responses] == [200] * 4
+    assert [body["salaries"] for _, body in responses] == [[i + 3.0] for i in range(4)]
+    # Четыре запроса по строке дожидаются друг друга и предсказываются одним вызовом.
+    assert model.batches == [4]
+
+    status, stats = _request(httpd, "GET", "/stats")
+    assert status == 200
+    assert (stats["requests"], stats["rows"], stats["batches"]) == (4, 4, 1)
+    assert stats["latency_p99_ms"] >= stats["latency_p50_ms"] >= 0
+
+
+def test_predict_rejects_bad_requests(server):
+    httpd, _ = server
+    assert _request(httpd, "POST", "/predict", {"rows": [[1.0, 2.0]]})[0] == 400
+    assert _request(httpd, "POST", "/predict", {"values": []})[0] == 400
+    assert _request(httpd, "GET", "/unknown")[0] == 404
+
+
+def test_submit_after_close_fails():
+    batcher = MicroBatcher(_SumModel(), max_batch_rows=1)
+    assert batcher.predict(np.ones((2, N_FEATURES))).tolist() == [3.0, 3.0]
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit(np.ones((1, N_FEATURES)))
+    batcher.close()
+
+
+def test_unix_socket_replaces_stale_file(tmp_path):
+    path = str(tmp_path / "predict.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    batcher = MicroBatcher(_SumModel(), max_batch_rows=1)
+    httpd = make_server(batcher, unix_path=path)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with pytest.raises(OSError):
+            make_server(batcher, unix_path=path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(10)
+            client.connect(path)
+            client.sendall(b"GET /health HTTP/1.1\r\nHost: unix\r\nConnection: close\r\n\r\n")
+            response = b""
+            while chunk := client.recv(4096):
+                response += chunk
+        assert response.startswith(b"HTTP/1.1 200")
+        assert response.endswith(b'{"status": "ok"}')
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        batcher.close()
+        thread.join()
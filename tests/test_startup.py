@@ -0,0 +1,24 @@
+"""
+Холодный старт regression.app: импорт не загружает pandas, scipy и sklearn.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.mark.parametrize("module", ["regression.app", "regression.compiled", "regression.predict"])
+def test_import_does_not_load_heavy_packages(module):
+    code = (
+        f"import sys, {module}\n"
+        "print(' '.join(m for m in ('pandas', 'scipy', 'sklearn') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
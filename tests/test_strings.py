@@ -0,0 +1,120 @@
+"""
+Векторизованные обработчики разбора совпадают с построчными функциями исходной версии.
+
+Запуск из корня проекта: python -m pytest tests
+"""
+import re
+
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from chain_pattern.handlers.parse_city import ParseCityHandler
+from chain_pattern.handlers.parse_gender_age import ParseGenderAgeHandler
+from chain_pattern.handlers.parse_salary import ParseSalaryHandler
+from chain_pattern.handlers.strings import map_unique
+
+SALARIES = [
+    "50 000 руб.",
+    "",
+    "по договорённости",
+    "50 000 руб.",
+    "от 120000 до 150 000 руб.",
+    "1 500 USD",
+    " ",
+]
+GENDER_AGE = [
+    "Мужчина ,  42 года , родился 6 октября 1976",
+    "Женщина ,  25 лет , родилась 1 мая 1999",
+    "Женщина",
+    "",
+    "МУЖЧИНА , 30 года",
+    "Мужчина ,  42 года , родился 6 октября 1976",
+    "Не указан , 19 года",
+]
+CITIES = [
+    "Москва , не готов к переезду , готов к командировкам",
+    "Санкт-Петербург",
+    "",
+    "Неизвестный город",
+    "  Казань  , готов к переезду",
+    ",Москва",
+    "Москва , не готов к переезду , готов к командировкам",
+]
+
+
+def _baseline_salary(value: str) -> int:
+    digits = re.sub(r"[^\d]", "", value)
+    return int(digits) if digits else 0
+
+
+def _baseline_gender(value: str) -> int:
+    return 1 if "муж" in value.lower() else 0
+
+
+def _baseline_age(value: str) -> int:
+    match = re.search(r"(\d+)\s*года", value)
+    return int(match.group(1)) if match else -1
+
+
+def _baseline_city(value: str) -> str:
+    return value.split(",")[0].strip()
+
+
+def _column(values: list[str], categorical: bool) -> pd.Series:
+    """
+    Столбец из values со сдвинутым индексом (как у части файла); categorical — как в режиме lean.
+    """
+    return pd.Series(values, index=range(10, 10 + len(values)), dtype="category" if categorical else object)
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_parse_salary_matches_baseline(categorical):
+    column = _column(SALARIES, categorical)
+    df = ParseSalaryHandler().process(pd.DataFrame({"зп": column}))
+    expected = column.astype(str).apply(_baseline_salary)
+    tm.assert_series_equal(df["salary"], expected, check_names=False)
+    assert df["salary"].tolist()[1:3] == [0, 0]
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_parse_gender_age_matches_baseline(categorical):
+    column = _column(GENDER_AGE, categorical)
+    df = ParseGenderAgeHandler().process(pd.DataFrame({"пол_возраст": column}))
+    values = column.astype(str)
+    tm.assert_series_equal(df["gender"], values.apply(_baseline_gender), check_names=False)
+    tm.assert_series_equal(df["age"], values.apply(_baseline_age), check_names=False)
+    assert df["age"].tolist()[1:4] == [-1, -1, -1]
+    assert "пол_возраст" not in df.columns
+
+
+def test_parse_gender_age_lean_keeps_values():
+    column = _column(GENDER_AGE, categorical=True)
+    df = ParseGenderAgeHandler(lean=True).process(pd.DataFrame({"пол_возраст": column}))
+    values = column.astype(str)
+    assert df["gender"].tolist() == values.apply(_baseline_gender).tolist()
+    assert df["age"].tolist() == values.apply(_baseline_age).tolist()
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_parse_city_matches_baseline(categorical):
+    column = _column(CITIES, categorical)
+    df = ParseCityHandler().process(pd.DataFrame({"город": column}))
+    expected = column.astype(str).apply(_baseline_city)
+    assert df["city"].index.equals(expected.index)
+    assert df["city"].astype(str).tolist() == expected.tolist()
+    assert df["city"].tolist()[2:4] == ["", "Неизвестный город"]
+    assert "город" not in df.columns
+
+
+def test_map_unique_transforms_each_value_once():
+    seen = []
+
+    def transform(values):
+        seen.extend(values)
+        return values.str.upper()
+
+    column = pd.Series(["a", "b", "a", "a", "b"], index=[5, 6, 7, 8, 9])
+    result = map_unique(column, transform)
+    assert sorted(seen) == ["a", "b"]
+    tm.assert_series_equal(result, column.str.upper())